@@ -0,0 +1,120 @@
+import multiprocessing
+import threading
+from multiprocessing.connection import Connection
+
+from .buffers import SharedSampleRing
+from .device import SerialThread, SerialInterface
+
+RING_CAPACITY = 262144
+RING_CHANNELS = 32
+
+
+class ProcessInterface(SerialInterface):
+    """
+    Interface of the serial thread inside the acquisition process.
+    Samples are written into the shared ring buffer, everything else
+    is sent through the pipe to the main process.
+    """
+
+    def __init__(self, ring: SharedSampleRing, connection: Connection):
+        super().__init__(ring)
+        self.connection = connection
+
+    def queue_frame(self, name: str, frame, times=None):
+        if name == 'data':
+            self.write_samples(frame, times)
+            return
+        self.connection.send(('frame', name, frame))
+
+    def queue_item(self, name: str, item):
+        self.connection.send(('item', name, item))
+
+
+def run_acquisition(name: str, capacity: int, channels: int, lock, connection: Connection):
+    """
+    Entry point of the acquisition process. Runs the serial thread and
+    passes the requests from the pipe into its queues until the main
+    process asks to exit.
+    """
+    ring = SharedSampleRing(capacity, channels, name, lock)
+    running = threading.Event()
+    thread = SerialThread(running, ProcessInterface(ring, connection))
+    requests = {topic: thread.interface.create_queue(topic) for topic in thread.interface.requests}
+    thread.start()
+    while True:
+        try:
+            topic, items = connection.recv()
+        except (EOFError, OSError):
+            break
+        if topic == 'exit':
+            break
+        for item in items:
+            requests[topic].put(item)
+    running.clear()
+    thread.join()
+    ring.close()
+    connection.close()
+
+
+class SerialProcess(threading.Thread):
+    """
+    Runs the serial thread in a child process. This thread starts and
+    stops the process and moves requests and text between the pipe and
+    the interface, samples arrive through the shared ring buffer.
+    """
+    is_running: threading.Event
+
+    def __init__(self, event):
+        super().__init__(daemon=False, name='Serial')
+        self.is_running = event
+        self.ring = SharedSampleRing(RING_CAPACITY, RING_CHANNELS)
+        self.interface = SerialInterface(self.ring)
+        self.connection, connection = multiprocessing.Pipe()
+        self.lock = threading.Lock()
+        self.process = multiprocessing.Process(
+            target=run_acquisition, name='Acquisition', daemon=True,
+            args=(self.ring.name, self.ring.capacity, self.ring.channels, self.ring.lock, connection))
+
+    def run(self):
+        self.is_running.set()
+        self.process.start()
+        self.interface.on_wakeup = self.update_request_queues
+        while self.is_running.is_set():
+            self.update_request_queues()
+            self.update_response_queues()
+        self.interface.on_wakeup = None
+        self.exit()
+
+    def exit(self):
+        try:
+            self.connection.send(('exit', None))
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(1)
+        with self.lock:
+            self.connection.close()
+        self.ring.close()
+        self.ring.unlink()
+
+    def update_request_queues(self):
+        # Called by this thread and by the threads which queue requests
+        with self.lock:
+            if self.connection.closed:
+                return
+            for topic in self.interface.requests:
+                items = self.interface.get_items(topic)
+                if len(items) > 0:
+                    self.connection.send((topic, items))
+
+    def update_response_queues(self):
+        if not self.connection.poll(0.05):
+            return
+        while self.connection.poll():
+            kind, name, frame = self.connection.recv()
+            if kind == 'frame':
+                self.interface.queue_frame(name, frame)
+            else:
+                self.interface.queue_item(name, frame)
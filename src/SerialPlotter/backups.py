@@ -0,0 +1,223 @@
+import gzip
+import json
+import lzma
+import os
+import shutil
+import threading
+import time
+from typing import List, Dict
+
+BACKUP_MANIFEST = 'manifest.json'
+COMPRESSIONS = {
+    'none': None,
+    'gzip': ('.gz', gzip.open),
+    'lzma': ('.xz', lzma.open),
+}
+
+
+def compress_file(file_path, compression):
+    """
+    Compresses a file next to the original and removes the original.
+
+    :param file_path: Path of the file
+    :param compression: Either 'gzip' or 'lzma'
+    :return: Path of the compressed file
+    """
+    extension, opener = COMPRESSIONS[compression]
+    compressed_path = file_path + extension
+    with open(file_path, 'rb') as source, opener(compressed_path, 'wb') as target:
+        shutil.copyfileobj(source, target, 1 << 20)
+    os.remove(file_path)
+    return compressed_path
+
+
+class BackupRotation:
+    """
+    Splits the backup into numbered segments. A segment ends once it
+    reaches max_size bytes or max_duration seconds. Ended segments are
+    compressed by the worker and the oldest segments are removed while
+    the backups use more than retention bytes. The manifest in the
+    backup folder lists every segment with its samples and time range.
+    """
+    segments: List[Dict[str, any]]
+
+    def __init__(self, max_size=64 << 20, max_duration=3600.0, compression='gzip', retention=0, worker=None):
+        """
+        :param max_size: Bytes per segment, 0 is unlimited
+        :param max_duration: Seconds per segment, 0 is unlimited
+        :param compression: Compression of ended segments, none, gzip or lzma
+        :param retention: Bytes of all segments together, 0 is unlimited
+        :param worker: StorageWriter which compresses, without a worker
+            segments are compressed directly
+        """
+        if compression not in COMPRESSIONS:
+            raise ValueError(f'Unknown compression {compression}')
+        self.max_size = max_size
+        self.max_duration = max_duration
+        self.compression = compression
+        self.retention = retention
+        self.worker = worker
+        self.lock = threading.Lock()
+        self.folder = None
+        self.extension = None
+        self.segments = []
+        self.segment = None
+
+    def load(self, folder):
+        """
+        Reads the manifest of a backup folder.
+
+        :param folder: Path of the backup folder
+        """
+        self.folder = folder
+        self.segments = []
+        try:
+            with open(os.path.join(folder, BACKUP_MANIFEST)) as manifest_file:
+                self.segments = json.load(manifest_file)['segments']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def save(self):
+        # Replaces the manifest at once, so readers never see half a file
+        with self.lock:
+            text = json.dumps({'segments': self.segments}, indent=1)
+        file_path = os.path.join(self.folder, BACKUP_MANIFEST)
+        with open(file_path + '.tmp', 'w') as manifest_file:
+            manifest_file.write(text)
+        os.replace(file_path + '.tmp', file_path)
+
+    def matches(self, folder, extension):
+        return self.segment is not None and self.folder == folder and self.extension == extension
+
+    def is_due(self, size):
+        """
+        Checks if the current segment should end.
+
+        :param size: Bytes of the current segment
+        :return: True when the size or the duration is reached
+        """
+        if self.segment is None:
+            return False
+        if 0 < self.max_size <= size:
+            return True
+        return 0 < self.max_duration <= time.time() - self.segment['opened']
+
+    def start(self, folder, extension, prefix):
+        """
+        Starts a new segment with the next free number.
+
+        :param folder: Path of the backup folder
+        :param extension: Extension of the segment files
+        :param prefix: Start of the file names
+        :return: Number of the segment
+        """
+        if folder != self.folder:
+            self.load(folder)
+        os.makedirs(folder, exist_ok=True)
+        self.extension = extension
+        numbers = [segment['number'] for segment in self.segments if segment['file'].startswith(prefix)]
+        number = max(numbers, default=0) + 1
+        while any(name.startswith(f'{prefix}_{number:04d}') for name in os.listdir(folder)):
+            number += 1
+        self.segment = {
+            'number': number,
+            'file': f'{prefix}_{number:04d}{extension}',
+            'opened': time.time(),
+            'start': None,
+            'stop': None,
+            'samples': 0,
+            'bytes': 0,
+            'compression': 'none',
+            'closed': False,
+        }
+        with self.lock:
+            self.segments.append(self.segment)
+        return number
+
+    def add(self, samples, start, stop):
+        """
+        Adds samples to the current segment.
+
+        :param samples: Amount of samples
+        :param start: Unix time of the first sample
+        :param stop: Unix time of the last sample
+        """
+        segment = self.segment
+        with self.lock:
+            if segment['start'] is None:
+                segment['start'] = start
+            segment['stop'] = stop
+            segment['samples'] += samples
+
+    def update(self, stream, segment):
+        """
+        Takes the size of the current segment into the retention, so the
+        backups stay below the limit while the segment grows. Runs on the
+        writer after samples of the segment are written.
+
+        :param stream: Open file of the segment
+        :param segment: The current segment
+        """
+        with self.lock:
+            segment['bytes'] = stream.size
+        if self.retain():
+            self.save()
+
+    def end(self):
+        segment, self.segment = self.segment, None
+        return segment
+
+    def finish(self, stream, segment, compress=True):
+        """
+        Closes the file of an ended segment and updates the manifest.
+        Runs on the writer after the last samples of the segment.
+
+        :param stream: Open file of the segment
+        :param segment: The ended segment
+        :param compress: True to compress the segment
+        """
+        stream.close()
+        with self.lock:
+            segment['bytes'] = os.path.getsize(stream.file_path)
+        if compress and self.compression != 'none':
+            folder = os.path.dirname(stream.file_path)
+            if self.worker is None:
+                self.compress(segment, folder)
+            else:
+                self.worker.submit(self.compress, segment, folder)
+            return
+        with self.lock:
+            segment['closed'] = True
+        self.retain()
+        self.save()
+
+    def compress(self, segment, folder):
+        file_path = os.path.join(folder, segment['file'])
+        compressed_path = compress_file(file_path, self.compression)
+        with self.lock:
+            segment['file'] = os.path.basename(compressed_path)
+            segment['bytes'] = os.path.getsize(compressed_path)
+            segment['compression'] = self.compression
+            segment['closed'] = True
+        self.retain()
+        self.save()
+
+    def retain(self):
+        # Removes the oldest ended segments until the backups fit, True when a segment was removed
+        if self.retention <= 0:
+            return False
+        with self.lock:
+            count = len(self.segments)
+            total = sum(segment['bytes'] for segment in self.segments)
+            for segment in list(self.segments):
+                if total <= self.retention:
+                    break
+                if not segment.get('closed', True):
+                    continue
+                try:
+                    os.remove(os.path.join(self.folder, segment['file']))
+                except FileNotFoundError:
+                    pass
+                total -= segment['bytes']
+                self.segments.remove(segment)
+        return len(self.segments) < count
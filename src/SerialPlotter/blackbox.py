@@ -0,0 +1,128 @@
+import os
+import time
+
+import numpy as np
+
+from .buffers import SampleRing
+
+BLACKBOX_FILE = 'blackbox.ring'
+# Capacity and channels in front of the ring buffer
+BLACKBOX_HEADER = 16
+
+
+class BlackBox:
+    """
+    Ring buffer inside a memory mapped file, which keeps the newest
+    samples with their Unix time. The file has a fixed size, so the
+    black box can stay on permanently, and it survives a restart of the
+    application. A dump takes the samples of the last minutes.
+    """
+
+    def __init__(self, file_path, max_size=64 << 20, minutes=5.0):
+        """
+        :param file_path: Path of the ring file
+        :param max_size: Bytes of the ring file
+        :param minutes: Minutes which a dump reaches back
+        """
+        self.file_path = file_path
+        self.max_size = max_size
+        self.minutes = minutes
+        self.file = None
+        self.ring = None
+
+    @property
+    def capacity(self):
+        return 0 if self.ring is None else self.ring.capacity
+
+    def stored_channels(self):
+        """
+        Gets the amount of channels in the header of the ring file.
+
+        :return: Amount of channels, 0 without a ring file
+        """
+        try:
+            with open(self.file_path, 'rb') as ring_file:
+                header = np.frombuffer(ring_file.read(BLACKBOX_HEADER), np.int64)
+        except OSError:
+            return 0
+        return int(header[1]) if len(header) == 2 else 0
+
+    def open(self, channels=0):
+        """
+        Maps the ring file, an existing file with the same layout keeps
+        its samples and any other file is replaced. An existing file
+        with more channels keeps its channels.
+
+        :param channels: Least amount of channels of the ring buffer
+        """
+        self.close()
+        channels = max(channels, self.stored_channels(), 1)
+        # The widths of the rows are padded to 8 bytes behind the header of the ring
+        row = (channels + 1) * 8 + 2
+        capacity = max((self.max_size - BLACKBOX_HEADER - SampleRing.nbytes(0, channels) - 6) // row, 1)
+        size = BLACKBOX_HEADER + SampleRing.nbytes(capacity, channels)
+        layout = np.array([capacity, channels], np.int64)
+        if os.path.exists(self.file_path) and os.path.getsize(self.file_path) == size:
+            self.file = np.memmap(self.file_path, np.uint8, 'r+')
+            if not np.array_equal(self.file[:BLACKBOX_HEADER].view(np.int64), layout):
+                self.file[:] = 0
+        else:
+            os.makedirs(os.path.dirname(self.file_path) or '.', exist_ok=True)
+            self.file = np.memmap(self.file_path, np.uint8, 'w+', shape=(size,))
+        self.file[:BLACKBOX_HEADER].view(np.int64)[:] = layout
+        self.ring = SampleRing(capacity, channels, self.file[BLACKBOX_HEADER:])
+
+    def write(self, block: np.ndarray, times: np.ndarray = None):
+        """
+        Adds samples, the oldest samples are overwritten once the file
+        is full. The file is reopened when a block has more channels.
+
+        :param block: Array with shape (rows, channels)
+        :param times: Unix time of the rows in nanoseconds
+        """
+        if self.ring is None or block.shape[1] > self.ring.channels:
+            self.open(block.shape[1])
+        if times is None:
+            times = np.full(len(block), time.time_ns(), np.int64)
+        self.ring.write(block, times)
+
+    def read(self, minutes=None):
+        """
+        Gets the samples of the last minutes.
+
+        :param minutes: Minutes before the newest sample, by default
+            the minutes of the black box
+        :return: Pair of the times in nanoseconds and the samples
+        """
+        ring = self.ring
+        if ring is None:
+            return np.empty(0, np.int64), np.empty((0, 0))
+        if minutes is None:
+            minutes = self.minutes
+        with ring.lock:
+            head = ring.position
+            rows = min(head, ring.capacity)
+            index = np.arange(head - rows, head) % ring.capacity
+            times = ring.times[index]
+            widths = ring.widths[index]
+            values = ring.values[index]
+        if rows == 0:
+            return times, values[:, :0]
+        first = np.searchsorted(times, times[-1] - int(minutes * 60e9), 'left')
+        times, widths, values = times[first:], widths[first:], values[first:]
+        width = int(widths.max())
+        values = values[:, :width]
+        # Narrower rows keep old values in the columns behind their width
+        values[np.arange(width) >= widths[:, None]] = np.nan
+        return times, values
+
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+
+    def close(self):
+        if self.file is None:
+            return
+        self.file.flush()
+        self.ring = None
+        self.file = None
@@ -0,0 +1,408 @@
+import multiprocessing
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+RING_READERS = 8
+RING_HEADER = 3 + RING_READERS
+
+
+class SampleRing:
+    """
+    Preallocated ring buffer for samples with a single writer. Every
+    subscriber reads with its own cursor, so a slow subscriber only
+    loses its own samples and the lost samples are counted. A ring
+    which owns its buffer grows when a block has more channels. The read
+    positions of the first RING_READERS cursors are kept in the buffer,
+    so a writer in another process knows the lag of the subscribers.
+    """
+    cursors: Dict[str, 'RingCursor']
+
+    def __init__(self, capacity=65536, channels=32, buffer=None, lock=None):
+        self.capacity = capacity
+        self.lock = threading.Lock() if lock is None else lock
+        self.is_growing = buffer is None
+        self.is_closed = False
+        if buffer is None:
+            buffer = bytearray(self.nbytes(capacity, channels))
+        self.map(buffer, channels)
+        self.cursors = {}
+
+    def map(self, buffer, channels):
+        # The state lives inside the buffer, so it can be shared memory
+        capacity = self.capacity
+        offset = RING_HEADER * 8 + -(-capacity * 2 // 8) * 8
+        self.channels = channels
+        self.header = np.ndarray(RING_HEADER, np.int64, buffer, 0)
+        self.readers = self.header[3:]
+        self.widths = np.ndarray(capacity, np.int16, buffer, RING_HEADER * 8)
+        self.times = np.ndarray(capacity, np.int64, buffer, offset)
+        self.values = np.ndarray((capacity, channels), np.float64, buffer, offset + capacity * 8)
+
+    @staticmethod
+    def nbytes(capacity, channels):
+        """
+        Gets the size of the buffer which holds a ring buffer.
+
+        :param capacity: Amount of samples
+        :param channels: Maximum amount of channels
+        :return: Size in bytes
+        """
+        return RING_HEADER * 8 + -(-capacity * 2 // 8) * 8 + capacity * (channels + 1) * 8
+
+    @property
+    def position(self):
+        return int(self.header[0])
+
+    @property
+    def truncated(self):
+        return int(self.header[1])
+
+    @property
+    def reader_count(self):
+        return int(self.header[2])
+
+    def grow(self, channels: int):
+        """
+        Moves the samples into a buffer with more channels.
+
+        :param channels: Amount of channels of the new buffer
+        """
+        with self.lock:
+            header, widths, times, values = self.header, self.widths, self.times, self.values
+            self.map(bytearray(self.nbytes(self.capacity, channels)), channels)
+            self.header[:] = header
+            self.widths[:] = widths
+            self.times[:] = times
+            self.values[:, :values.shape[1]] = values
+
+    def write(self, block: np.ndarray, times: np.ndarray = None):
+        """
+        Copies the rows of the block into the ring buffer. A ring inside
+        a buffer of the caller has a fixed size, values of channels above
+        its channels are counted as truncated.
+
+        :param block: Array with shape (rows, channels)
+        :param times: Timestamps of the rows, by default the current time
+        """
+        rows, width = block.shape
+        if rows == 0:
+            return
+        if times is None:
+            times = np.full(rows, time.monotonic_ns(), np.int64)
+        if width > self.channels and self.is_growing:
+            self.grow(width)
+        if width > self.channels:
+            self.header[1] += rows * (width - self.channels)
+            block = block[:, :self.channels]
+            width = self.channels
+        # Only the newest rows fit when the block is larger than the ring
+        skip = max(0, rows - self.capacity)
+        block = block[skip:]
+        times = times[skip:]
+        with self.lock:
+            position = self.position
+            start = (position + skip) % self.capacity
+            first = min(len(block), self.capacity - start)
+            rest = len(block) - first
+            self.values[start:start + first, :width] = block[:first]
+            self.widths[start:start + first] = width
+            self.times[start:start + first] = times[:first]
+            self.values[:rest, :width] = block[first:]
+            self.widths[:rest] = width
+            self.times[:rest] = times[first:]
+            self.header[0] = position + rows
+
+    def subscribe(self, name: str):
+        """
+        Creates a cursor which starts reading at the newest sample.
+
+        :param name: Name of the subscriber
+        :return: The cursor of the subscriber
+        """
+        with self.lock:
+            cursor = RingCursor(self, name)
+            previous = self.cursors.get(name)
+            if previous is not None:
+                # A subscriber which subscribes again takes over its slot
+                cursor.slot = previous.slot
+            elif self.reader_count < RING_READERS:
+                cursor.slot = self.reader_count
+                self.header[2] += 1
+            if cursor.slot is not None:
+                self.readers[cursor.slot] = cursor.position
+            self.cursors[name] = cursor
+        return cursor
+
+    def lag(self):
+        """
+        Gets the samples which the slowest subscriber has not read yet,
+        also when the cursors belong to another process.
+
+        :return: Amount of samples, 0 without subscribers
+        """
+        with self.lock:
+            if self.is_closed or self.reader_count == 0:
+                return 0
+            return min(self.position - int(self.readers[:self.reader_count].min()), self.capacity)
+
+    def statistics(self):
+        """
+        Gets the lag and the dropped samples of every subscriber.
+
+        :return: Dictionary with subscriber names and (lag, drops)
+        """
+        return {name: (cursor.lag(), cursor.drops) for name, cursor in self.cursors.items()}
+
+
+class SampleBlock:
+    """
+    Growing block of samples with a fill pointer. The array is reused
+    after a clear, so buffering samples does not create an object per
+    value. Rows with fewer channels than the block are filled with NaN.
+    """
+
+    def __init__(self, rows=1024, channels=0):
+        self.values = np.empty((rows, channels), np.float64)
+        self.rows = 0
+        self.width = 0
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+    def reserve(self, rows: int, channels: int):
+        """
+        Grows the array so the desired shape fits, the size is doubled
+        to keep the amount of copies low.
+
+        :param rows: Amount of rows
+        :param channels: Amount of channels
+        """
+        capacity, width = self.values.shape
+        if rows <= capacity and channels <= width:
+            return
+        if rows > capacity:
+            capacity = max(rows, capacity * 2)
+        width = max(channels, width)
+        values = np.empty((capacity, width), np.float64)
+        values[:self.rows, :self.width] = self.values[:self.rows, :self.width]
+        values[:self.rows, self.width:] = np.nan
+        self.values = values
+
+    def append(self, block: np.ndarray):
+        """
+        Copies the rows of the block behind the previous rows.
+
+        :param block: Array with shape (rows, channels)
+        """
+        rows, width = block.shape
+        if rows == 0:
+            return
+        self.reserve(self.rows + rows, width)
+        if width > self.width:
+            self.values[:self.rows, self.width:width] = np.nan
+            self.width = width
+        end = self.rows + rows
+        self.values[self.rows:end, :width] = block
+        self.values[self.rows:end, width:self.width] = np.nan
+        self.rows = end
+
+    def view(self):
+        """
+        Gets the filled part of the block without a copy. The view is
+        only valid until the next append after a clear.
+
+        :return: Array with shape (rows, width)
+        """
+        return self.values[:self.rows, :self.width]
+
+    def clear(self):
+        self.rows = 0
+        self.width = 0
+
+
+class LineBuffer:
+    """
+    Ring buffer of the newest samples for the lines of a graph. The
+    values are stored channel major and twice behind each other, every
+    write goes to both halves. So the newest samples of a channel are
+    always one contiguous view and no sample is moved after its write.
+    """
+
+    def __init__(self, capacity=500, channels=0):
+        self.allocate(capacity, channels)
+
+    def __len__(self):
+        return self.size
+
+    def allocate(self, capacity: int, channels: int):
+        self.capacity = capacity
+        self.values = np.full((channels, 2 * capacity), np.nan)
+        self.times = np.zeros(2 * capacity, np.int64)
+        self.x = np.arange(capacity, dtype=np.float64)
+        self.head = 0
+        self.size = 0
+
+    @property
+    def channels(self):
+        return self.values.shape[0]
+
+    def resize(self, capacity: int, channels: int):
+        """
+        Changes the amount of samples and channels, the newest samples
+        are kept. New channels are filled with NaN.
+
+        :param capacity: Amount of samples
+        :param channels: Amount of channels
+        """
+        if capacity == self.capacity and channels == self.channels:
+            return
+        keep = min(self.size, capacity)
+        values = self.view()[:channels, self.size - keep:]
+        times = self.view_times()[self.size - keep:]
+        self.allocate(capacity, channels)
+        columns = np.full((channels, keep), np.nan)
+        columns[:len(values)] = values
+        self.write(columns, times)
+
+    def append(self, block: np.ndarray, times: np.ndarray):
+        """
+        Adds the rows of a block, the channels follow the block.
+
+        :param block: Array with shape (rows, channels)
+        :param times: Timestamps of the rows in nanoseconds
+        """
+        if block.shape[1] != self.channels:
+            self.resize(self.capacity, block.shape[1])
+        self.write(block.T, times)
+
+    def write(self, columns: np.ndarray, times: np.ndarray):
+        count = columns.shape[1]
+        if count > self.capacity:
+            columns, times = columns[:, -self.capacity:], times[-self.capacity:]
+            count = self.capacity
+        head = self.head
+        first = min(count, self.capacity - head)
+        rest = count - first
+        for offset in (0, self.capacity):
+            self.values[:, offset + head:offset + head + first] = columns[:, :first]
+            self.values[:, offset:offset + rest] = columns[:, first:]
+            self.times[offset + head:offset + head + first] = times[:first]
+            self.times[offset:offset + rest] = times[first:]
+        self.head = (head + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+
+    def view(self):
+        """
+        Gets the samples from old to new without a copy. The view shows
+        other samples after the next append.
+
+        :return: Array with shape (channels, samples)
+        """
+        end = self.head + self.capacity
+        return self.values[:, end - self.size:end]
+
+    def view_times(self):
+        end = self.head + self.capacity
+        return self.times[end - self.size:end]
+
+    def view_x(self):
+        return self.x[:self.size]
+
+
+class SharedSampleRing(SampleRing):
+    """
+    Ring buffer inside shared memory, so another process can write it.
+    The process which creates it has to unlink it when it is done.
+    """
+
+    def __init__(self, capacity=65536, channels=32, name=None, lock=None):
+        size = self.nbytes(capacity, channels)
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=size)
+            self.memory.buf[:RING_HEADER * 8] = bytes(RING_HEADER * 8)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        if lock is None:
+            lock = multiprocessing.Lock()
+        super().__init__(capacity, channels, self.memory.buf, lock)
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def close(self):
+        # The arrays have to be released before the memory can be closed.
+        # Cursors check the flag under the lock, a lock which was left by
+        # a terminated process is taken over after the timeout
+        is_locked = self.lock.acquire(timeout=1)
+        self.is_closed = True
+        del self.header, self.readers, self.widths, self.times, self.values
+        if is_locked:
+            self.lock.release()
+        self.memory.close()
+
+    def unlink(self):
+        self.memory.unlink()
+
+
+class RingCursor:
+    """Read position of a single subscriber inside a SampleRing"""
+
+    def __init__(self, ring: SampleRing, name: str):
+        self.ring = ring
+        self.name = name
+        self.position = ring.position
+        self.slot = None
+        self.drops = 0
+
+    def lag(self):
+        """
+        Gets the amount of samples which are not read yet.
+
+        :return: Amount of samples, 0 after the ring buffer is closed
+        """
+        ring = self.ring
+        with ring.lock:
+            if ring.is_closed:
+                return 0
+            return min(ring.position - self.position, ring.capacity)
+
+    def read(self) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Reads all samples since the previous read. Samples which were
+        overwritten before they were read are added to drops.
+
+        :return: Pairs of timestamps and samples, split where the
+            channel count changes, nothing after the ring buffer is closed
+        """
+        ring = self.ring
+        capacity = ring.capacity
+        with ring.lock:
+            if ring.is_closed:
+                return []
+            head = ring.position
+            if head - self.position > capacity:
+                self.drops += head - self.position - capacity
+                self.position = head - capacity
+            start = self.position % capacity
+            rows = head - self.position
+            index = np.arange(start, start + rows) % capacity
+            values = ring.values[index]
+            widths = ring.widths[index]
+            times = ring.times[index]
+            self.position = head
+            if self.slot is not None:
+                ring.readers[self.slot] = head
+        if rows == 0:
+            return []
+        edges = np.flatnonzero(np.diff(widths)) + 1
+        bounds = [0] + edges.tolist() + [rows]
+        return [(times[a:b], values[a:b, :widths[a]]) for a, b in zip(bounds[:-1], bounds[1:])]
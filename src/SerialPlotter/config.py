@@ -10,6 +10,12 @@ filters = {
 connection = {
     'device': 'None',
     'keep': 0,
+    'acquisition': 'thread',
+    'protocol': 'text',
+    'layout': '<fff',
+    'framing': 'sync',
+    'checksum': 'none',
+    'sync': 'aa55',
 }
 
 communication = {
@@ -23,8 +29,24 @@ recorder = {
     'auto_save': 0,
     'file_append': 0,
     'file_overwrite': 0,
+    'timestamp': 0,
+    'binary': 0,
     'data_dir': './data/',
     'backup_dir': './backup/',
+    'backup_size': 64,
+    'backup_minutes': 60,
+    'backup_retention': 0,
+    'backup_compress': 1,
+    'journal': 0,
+    'journal_interval': 50,
+    'journal_size': 256,
+    'database': 0,
+    'pyramid': 0,
+    'blackbox': 0,
+    'blackbox_minutes': 5,
+    'blackbox_size': 64,
+    'blackbox_after': 60,
+    'trigger': '',
 }
 
 formatter = {
@@ -0,0 +1,48 @@
+import numpy as np
+
+
+def visible_range(x: np.ndarray, x_min: float, x_max: float):
+    """
+    Gets the samples inside the axis limits, with one sample on both
+    sides so the line continues to the edges.
+
+    :param x: Increasing x values
+    :param x_min: Left axis limit
+    :param x_max: Right axis limit
+    :return: Start and stop index
+    """
+    start = max(int(np.searchsorted(x, x_min, 'left')) - 1, 0)
+    stop = min(int(np.searchsorted(x, x_max, 'right')) + 1, len(x))
+    return start, max(start, stop)
+
+
+def decimate_minmax(x: np.ndarray, y: np.ndarray, x_min: float, x_max: float, pixels: int):
+    """
+    Reduces lines to the minimum and maximum of every pixel column, so
+    the amount of points depends on the width of the axes instead of the
+    amount of samples. Spikes stay visible, because the extremes of
+    every column are kept.
+
+    :param x: Increasing x values with shape (samples,)
+    :param y: Values of the lines with shape (lines, samples)
+    :param x_min: Left axis limit
+    :param x_max: Right axis limit
+    :param pixels: Width of the axes in pixels
+    :return: Pair of x with shape (points,) and y with shape (lines, points)
+    """
+    start, stop = visible_range(x, x_min, x_max)
+    count = stop - start
+    if pixels <= 0 or count <= 2 * pixels:
+        return x[start:stop], y[:, start:stop]
+    # Samples per column, the last column can have fewer samples
+    size = -(-count // pixels)
+    columns = -(-count // size)
+    padded = np.full((len(y), columns * size), np.nan)
+    padded[:, :count] = y[:, start:stop]
+    padded = padded.reshape(len(y), columns, size)
+    points = np.empty((len(y), columns, 2))
+    points[:, :, 0] = np.fmin.reduce(padded, axis=2)
+    points[:, :, 1] = np.fmax.reduce(padded, axis=2)
+    # The first and the middle sample of a column carry its two points
+    index = np.minimum(start + np.arange(columns * 2) * size // 2, stop - 1)
+    return x[index], points.reshape(len(y), columns * 2)
@@ -1,11 +1,20 @@
+import binascii
+import os
 import queue
-import random
+import re
 import threading
-from time import sleep
+import time
+import zlib
+from operator import methodcaller
 from typing import List, Dict
 
+import numpy as np
 import serial.tools.list_ports
 
+from .buffers import SampleRing
+from .replay import Replayer, SEPARATORS
+from .simulator import DeviceSimulator, PtySimulator, parse_options
+
 test_count = 0
 
 
@@ -19,6 +28,41 @@ def test_print():
         test_count = 0
 
 
+def interpolate_times(start: int, stop: int, count: int):
+    """
+    Spreads count timestamps evenly after start, the last one is stop.
+
+    :param start: Timestamp of the previous chunk in nanoseconds
+    :param stop: Timestamp of the current chunk in nanoseconds
+    :param count: Amount of samples in the current chunk
+    :return: Array with int64 timestamps
+    """
+    steps = np.arange(1, count + 1, dtype=np.int64)
+    return start + (stop - start) * steps // max(count, 1)
+
+
+class RateCounter:
+    """Counts events and reports the rate over the last measuring window"""
+
+    def __init__(self, window=1.0):
+        self.window = window
+        self.total = 0
+        self.rate = 0.0
+        self._count = 0
+        self._time = time.perf_counter()
+
+    def add(self, amount: int):
+        self.total += amount
+        self._count += amount
+        now = time.perf_counter()
+        elapsed = now - self._time
+        if elapsed < self.window:
+            return
+        self.rate = self._count / elapsed
+        self._count = 0
+        self._time = now
+
+
 class BufferConverter:
     """This is another model"""
 
@@ -32,15 +76,54 @@ class BufferConverter:
         self.messages = []
         self.lines = []
         self.data = []
+        self.blocks: List[np.ndarray] = []
+        self.times: List[np.ndarray] = []
 
         self.buffer_lines = []
-        self.buffer_text = ''
+        self.buffer_tail = bytearray()
+        self.time_previous = None
+        self.time_latest = None
+        self.line_counter = RateCounter()
+        self.pattern_other = self.compile_pattern()
+        self.pattern_digit = re.compile('[0-9]')
+
+    def add(self, buffer: bytes, timestamp: int = None):
+        """
+        Frames the incoming chunk into complete lines. Incomplete data
+        at the end of the chunk is kept until the next chunk arrives.
 
-    def add(self, buffer: str):
-        for char in buffer:
-            self.buffer_text += char
-            if char in self.new_line:
-                self.collect_buffer()
+        :param buffer: Chunk of bytes (or text) from the serial device
+        :param timestamp: Time of the read in nanoseconds (time.monotonic_ns)
+        """
+        if isinstance(buffer, str):
+            buffer = buffer.encode()
+        self.time_latest = time.monotonic_ns() if timestamp is None else timestamp
+        new_line = self.new_line.encode()
+        end = buffer.rfind(new_line)
+        if end < 0:
+            self.buffer_tail += buffer
+            return
+        end += len(new_line)
+        self.buffer_tail += buffer[:end]
+        text = self.buffer_tail.decode(errors='replace')
+        self.buffer_tail = bytearray(buffer[end:])
+        lines = text.split(self.new_line)
+        # The text ends with a newline, so the last split part is empty
+        lines.pop()
+        self.buffer_lines.extend([line + self.new_line for line in lines])
+        self.line_counter.add(len(lines))
+
+    def lines_per_second(self):
+        return self.line_counter.rate
+
+    def compile_pattern(self):
+        """
+        Creates the pattern which finds any character that cannot be
+        part of a data line. Lines without a match only contain digits
+        and the symbols that analyse_line counts as symbols.
+        """
+        symbols = self.delimiter + self.new_line + self.carriage + self.decimal + self.negative
+        return re.compile('[^0-9' + re.escape(symbols) + ']')
 
     def available(self):
         return len(self.buffer_lines)
@@ -65,6 +148,108 @@ class BufferConverter:
         self.lines.append(line)
         return True
 
+    def update_batch(self):
+        """
+        Processes all framed lines at once. Numeric lines are parsed
+        together into (N, channels) arrays which are added to blocks,
+        the other lines are handled the same way as update() does.
+
+        :return: Amount of processed lines
+        """
+        lines = self.buffer_lines
+        if not len(lines) > 0:
+            return 0
+        self.buffer_lines = []
+        times = self.stamp_batch(len(lines))
+
+        # Only lines with unexpected characters need the full analysis
+        search = self.pattern_other.search
+        digit = self.pattern_digit.search
+        if search(''.join(lines)) is None and all(map(digit, lines)):
+            self.convert_to_blocks(lines, times)
+            self.lines.extend(lines)
+            return len(lines)
+        numeric = []
+        indices = []
+        for index, line in enumerate(lines):
+            if search(line) is None:
+                status = 'invalid' if digit(line) is None else 'data'
+            else:
+                # Numerals outside of 0-9 are data as well, float() parses them
+                status = self.analyse_line(line)
+            if status == 'data':
+                numeric.append(line)
+                indices.append(index)
+                continue
+            # The numeric lines in front are converted first, so the messages keep the order of the lines
+            self.convert_to_blocks(numeric, times[indices])
+            numeric = []
+            indices = []
+            if status == 'message':
+                self.convert_to_message(line)
+            elif status == 'unknown':
+                self.convert_to_unknown(line)
+            else:
+                self.convert_to_invalid(line)
+        self.convert_to_blocks(numeric, times[indices])
+        self.lines.extend(lines)
+        return len(lines)
+
+    def stamp_batch(self, count: int):
+        """
+        Gives the lines of a batch timestamps between the previous and
+        the latest chunk.
+
+        :param count: Amount of lines in the batch
+        :return: Array with int64 timestamps
+        """
+        stop = time.monotonic_ns() if self.time_latest is None else self.time_latest
+        start = stop if self.time_previous is None else self.time_previous
+        self.time_previous = stop
+        return interpolate_times(start, stop, count)
+
+    def convert_to_blocks(self, lines: List[str], times: np.ndarray = None):
+        """
+        Converts numeric lines into arrays. Consecutive lines with the
+        same amount of values are parsed with a single NumPy call.
+
+        :param lines: Lines which only contain numeric characters
+        :param times: Timestamps of the lines
+        """
+        if not len(lines) > 0:
+            return
+        if times is None:
+            times = self.stamp_batch(len(lines))
+        delimiter = self.delimiter
+        counts = np.fromiter(map(methodcaller('count', delimiter), lines), np.int64, len(lines))
+        edges = np.flatnonzero(np.diff(counts)) + 1
+        bounds = [0] + edges.tolist() + [len(lines)]
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            run = lines[start:stop]
+            # Every line ends with a newline, which becomes a delimiter
+            text = ''.join(run)[:-1].replace(self.new_line, delimiter)
+            try:
+                values = np.array(text.split(delimiter), dtype=np.float64)
+                self.blocks.append(values.reshape(len(run), counts[start] + 1))
+                self.times.append(times[start:stop])
+            except ValueError:
+                self.convert_to_rows(run, times[start:stop])
+
+    def convert_to_rows(self, lines: List[str], times: np.ndarray):
+        # Slow path which finds the invalid lines inside a run
+        rows = []
+        valid = []
+        for index, line in enumerate(lines):
+            text_list = line[:-1].split(self.delimiter)
+            try:
+                rows.append([float(text_value) for text_value in text_list])
+                valid.append(index)
+            except ValueError:
+                self.convert_to_invalid(line)
+        if len(rows) > 0:
+            self.blocks.append(np.array(rows, dtype=np.float64))
+            self.times.append(times[valid])
+
     def convert_to_message(self, line_text):
         text = 'Message: ' + line_text
         self.messages.append(text)
@@ -85,12 +270,6 @@ class BufferConverter:
         self.data.append(value_list)
         return value_list
 
-    def collect_buffer(self):
-        buffer = self.buffer_text
-        self.buffer_lines.append(buffer)
-        self.buffer_text = ''
-        return buffer
-
     def analyse_line(self, line_text: str):
         numbers = alphabets = symbols = unknown = 0
         for char in line_text:
@@ -123,46 +302,287 @@ class BufferConverter:
         return 'invalid'
 
 
+STRUCT_TYPES = {
+    'b': 'i1', 'B': 'u1', 'h': 'i2', 'H': 'u2', 'i': 'i4', 'I': 'u4', 'l': 'i4', 'L': 'u4',
+    'q': 'i8', 'Q': 'u8', 'e': 'f2', 'f': 'f4', 'd': 'f8',
+}
+
+CHECKSUMS = {
+    'none': (0, None),
+    'crc16': (2, lambda data: binascii.crc_hqx(data, 0xFFFF)),
+    'crc32': (4, zlib.crc32),
+}
+
+
+def struct_fields(layout: str):
+    """
+    Converts a struct layout, like '<Ifff', into the byte order and
+    the NumPy types of the fields. Padding bytes get the type None.
+
+    :param layout: Struct format string without alignment
+    :return: Byte order and list of types
+    """
+    order = '<'
+    if len(layout) > 0 and layout[0] in '<>!=@':
+        order = '>' if layout[0] in '>!' else '<' if layout[0] == '<' else '='
+        layout = layout[1:]
+    fields = []
+    for count, code in re.findall(r'(\d*)([a-zA-Z?])', layout):
+        if code != 'x' and code not in STRUCT_TYPES:
+            raise ValueError(f'Unsupported struct type {code}')
+        fields += [STRUCT_TYPES.get(code)] * int(count or 1)
+    return order, fields
+
+
+def cobs_decode(frame: bytes):
+    """
+    Decodes a frame with Consistent Overhead Byte Stuffing, the frame
+    is given without the zero delimiter.
+
+    :param frame: Encoded frame
+    :return: Decoded frame or None when the frame is corrupt
+    """
+    output = bytearray()
+    index = 0
+    while index < len(frame):
+        code = frame[index]
+        if code == 0 or index + code > len(frame) + 1:
+            return None
+        output += frame[index + 1:index + code]
+        index += code
+        if code < 0xFF and index < len(frame):
+            output.append(0)
+    return bytes(output)
+
+
+class BinaryConverter:
+    """
+    Converts fixed binary records into samples. The records are framed
+    with a sync word in front of them or with COBS and can end with a
+    checksum of the payload. The outputs match those of BufferConverter.
+    """
+
+    def __init__(self, layout='<fff', framing='sync', checksum='none', sync=b'\xaa\x55'):
+        if framing not in ('sync', 'cobs'):
+            raise ValueError(f'Unknown framing {framing}')
+        if checksum not in CHECKSUMS:
+            raise ValueError(f'Unknown checksum {checksum}')
+        order, fields = struct_fields(layout)
+        self.framing = framing
+        self.sync = sync if framing == 'sync' else b''
+        self.checksum_size, self.checksum = CHECKSUMS[checksum]
+
+        # Structured type of the whole record, padding becomes void
+        record = [('sync', 'u1', (len(self.sync),))]
+        self.fields = []
+        for index, field in enumerate(fields):
+            if field is None:
+                record.append((f'pad{index}', 'V1'))
+                continue
+            self.fields.append(f'f{index}')
+            record.append((f'f{index}', order + field))
+        checksum_type = {0: 'V0', 2: order + 'u2', 4: order + 'u4'}[self.checksum_size]
+        record.append(('checksum', checksum_type))
+        self.dtype = np.dtype(record)
+        self.payload = slice(len(self.sync), self.dtype.itemsize - self.checksum_size)
+
+        self.messages = []
+        self.lines = []
+        self.data = []
+        self.blocks: List[np.ndarray] = []
+        self.times: List[np.ndarray] = []
+
+        self.buffer = bytearray()
+        self.time_previous = None
+        self.time_latest = None
+        self.bad_frames = 0
+        self.record_counter = RateCounter()
+
+    def add(self, buffer: bytes, timestamp: int = None):
+        self.buffer += buffer
+        self.time_latest = time.monotonic_ns() if timestamp is None else timestamp
+
+    def available(self):
+        return len(self.buffer)
+
+    def update_batch(self):
+        """
+        Decodes all complete records in the buffer into one block.
+
+        :return: Amount of decoded records
+        """
+        bad_frames = self.bad_frames
+        if self.framing == 'sync':
+            records = self.decode_sync()
+        else:
+            records = self.decode_cobs()
+        if bad_frames < self.bad_frames:
+            self.messages.append(f'Invalid: {self.bad_frames - bad_frames} bad frames')
+        if len(records) == 0:
+            return 0
+        block = np.column_stack([records[name].astype(np.float64) for name in self.fields])
+        self.blocks.append(block)
+        self.times.append(self.stamp_batch(len(block)))
+        self.record_counter.add(len(block))
+        return len(block)
+
+    def stamp_batch(self, count: int):
+        # Records of a batch are spread between the previous and latest chunk
+        stop = time.monotonic_ns() if self.time_latest is None else self.time_latest
+        start = stop if self.time_previous is None else self.time_previous
+        self.time_previous = stop
+        return interpolate_times(start, stop, count)
+
+    def decode_sync(self):
+        buffer = bytes(self.buffer)
+        size = self.dtype.itemsize
+        sync = np.frombuffer(self.sync, np.uint8)
+        parts = []
+        position = 0
+        searching = False
+        while True:
+            start = buffer.find(self.sync, position)
+            if start < 0:
+                # Keep the bytes which could be the start of a sync word
+                position = max(position, len(buffer) - len(self.sync) + 1)
+                break
+            if start > position and not searching:
+                self.bad_frames += 1
+            searching = False
+            count = (len(buffer) - start) // size
+            if count == 0:
+                position = start
+                break
+            records = np.frombuffer(buffer, self.dtype, count, start)
+            valid = (records['sync'] == sync).all(axis=1) & self.validate(buffer, start, records)
+            invalid = np.flatnonzero(~valid)
+            good = count if len(invalid) == 0 else invalid[0]
+            parts.append(records[:good])
+            position = start + good * size
+            if good == count:
+                continue
+            # Search for the next sync word after the broken record
+            self.bad_frames += 1
+            searching = True
+            position += 1
+        del self.buffer[:position]
+        if len(parts) == 0:
+            return np.empty(0, self.dtype)
+        return np.concatenate(parts)
+
+    def decode_cobs(self):
+        frames = bytes(self.buffer).split(b'\x00')
+        self.buffer = bytearray(frames.pop())
+        size = self.dtype.itemsize
+        payload = bytearray()
+        for frame in frames:
+            if len(frame) == 0:
+                continue
+            decoded = cobs_decode(frame)
+            if decoded is None or len(decoded) != size:
+                self.bad_frames += 1
+                continue
+            payload += decoded
+        records = np.frombuffer(bytes(payload), self.dtype)
+        valid = self.validate(payload, 0, records)
+        self.bad_frames += int(np.count_nonzero(~valid))
+        return records[valid]
+
+    def validate(self, buffer, start: int, records: np.ndarray):
+        """
+        Compares the checksums of the records with their payload.
+
+        :return: Boolean array, True for every valid record
+        """
+        if self.checksum is None:
+            return np.ones(len(records), bool)
+        size = self.dtype.itemsize
+        raw = np.frombuffer(buffer, np.uint8, len(records) * size, start).reshape(-1, size)
+        payload = raw[:, self.payload]
+        expected = [self.checksum(row.tobytes()) for row in payload]
+        return records['checksum'] == np.array(expected, records['checksum'].dtype)
+
+
 class SerialThread(threading.Thread):
     """This is the controller"""
     is_running: threading.Event
 
-    def __init__(self, event):
+    def __init__(self, event, interface: 'SerialInterface' = None):
         super().__init__(daemon=False, name='Serial')
         self.is_running: threading.Event = event
         self.serial: SerialHandler = SerialHandler()
-        self.interface: SerialInterface = SerialInterface()
+        self.interface: SerialInterface = SerialInterface() if interface is None else interface
         self.converter: BufferConverter = BufferConverter()
+        self.replay: Replayer = None
+        self.replay_reported = 0
 
     def run(self):
         self.is_running.set()
+        self.interface.on_wakeup = self.serial.cancel_wait
         while self.is_running.is_set():
+            self.serial.wakeup.clear()
             self.update_request_queues()
+            if self.serial.is_connected.is_set():
+                for message in self.interface.get_items('out'):
+                    self.serial.write(message)
+            # Blocks until bytes arrive, a request is queued or timeout
+            if self.replay is None:
+                buffer = self.serial.wait_read()
+            else:
+                buffer = b''
+                self.serial.wakeup.wait(min(self.replay.next_due(), self.serial.timeout))
+            if len(buffer) > 0:
+                self.converter.add(buffer, self.serial.read_time)
+                self.converter.update_batch()
             self.update_response_queues()
-            if not self.serial.is_connected.is_set():
-                sleep(0.1)
-                continue
-            while self.serial.available() > 0:
-                buffer = self.serial.read()
-                self.converter.add(buffer)
-            while self.converter.available() > 0:
-                self.converter.update()
-            for message in self.interface.get_items('out'):
-                self.serial.write(message)
-            sleep(0.001)
+            self.update_replay()
         # Close serial connection when the main program wants to exit
+        self.interface.on_wakeup = None
         self.serial.disconnect()
 
     def update_response_queues(self):
-        while len(self.converter.messages) > 0:
-            message = self.converter.messages.pop(0)
-            self.interface.queue_item('text', message)
-        while len(self.converter.data) > 0:
-            data = self.converter.data.pop(0)
-            self.interface.queue_item('data', data)
-        while len(self.converter.lines) > 0:
-            line = self.converter.lines.pop(0)
-            self.interface.queue_item('in', line)
+        # Take the complete outputs and publish them as one frame each
+        converter = self.converter
+        messages, converter.messages = converter.messages, []
+        blocks, converter.blocks = converter.blocks, []
+        times, converter.times = converter.times, []
+        lines, converter.lines = converter.lines, []
+        if len(messages) > 0:
+            self.interface.queue_frame('text', messages)
+        for block, block_times in zip(blocks, times):
+            self.interface.queue_frame('data', block, block_times)
+        if len(lines) > 0:
+            self.interface.queue_frame('in', lines)
+
+    def update_replay(self):
+        # Replayed samples take the same path as the samples of a device
+        replay = self.replay
+        if replay is None:
+            return
+        ring = self.interface.ring
+        # The ring knows the read positions, also of cursors in the main process
+        if replay.speed <= 0 and ring.lag() > ring.capacity // 2:
+            # At maximum speed the replay waits for the slowest subscriber
+            self.serial.wakeup.wait(0.001)
+            return
+        try:
+            frames = replay.read()
+        except (OSError, ValueError) as e:
+            self.process_replay('stop')
+            self.interface.queue_item('status', 'Replay failed: ' + str(e))
+            return
+        for block_times, block in frames:
+            self.interface.queue_frame('data', block, block_times)
+        progress = int(replay.progress * 10)
+        if progress > self.replay_reported and not replay.is_done:
+            self.replay_reported = progress
+            self.interface.queue_item('status', f'Replay at {progress * 10}%')
+        if not replay.is_done:
+            return
+        seconds = (time.monotonic_ns() - replay.time_start) / 1e9
+        self.interface.queue_item('status', f'Replayed {replay.samples} samples in {seconds:.1f} s '
+                                            f'({replay.samples / max(seconds, 1e-9):.0f} samples/s)')
+        self.replay = None
 
     def update_request_queues(self):
         items: List[str] = self.interface.get_items('command')
@@ -177,14 +597,23 @@ class SerialThread(threading.Thread):
             message = self.process_reconnect()
         elif cmd == 'connect':
             message = self.process_connect(arg[0])
+        elif cmd == 'read_size':
+            message = self.process_read_size(arg[0])
+        elif cmd == 'protocol':
+            message = self.process_protocol(*arg)
+        elif cmd == 'replay':
+            # The path is the last argument and keeps its spaces
+            message = self.process_replay(*command.split(' ', 5)[1:])
         else:
             message = f'Unknown command: {command}'
         self.interface.queue_item('status', message)
 
     def process_connect(self, name):
+        if self.replay is not None:
+            self.process_replay('stop')
         try:
             status = self.serial.connect(name)
-        except serial.SerialException as e:
+        except (serial.SerialException, ValueError, OSError) as e:
             return str(e)
         if status:
             message = f'Successfully connected to device {name}'
@@ -195,7 +624,7 @@ class SerialThread(threading.Thread):
         return message
 
     def process_reconnect(self):
-        name = self.serial.serial.name
+        name = self.serial.name
         status = self.serial.disconnect()
         status *= self.serial.connect(name)
         if status:
@@ -204,6 +633,55 @@ class SerialThread(threading.Thread):
             message = 'Reconnecting failed: There was no connection'
         return message
 
+    def process_read_size(self, size: str):
+        try:
+            read_size = int(size)
+        except ValueError:
+            return 'Unknown read size ' + size
+        if read_size < 1:
+            return 'Read size has to be at least 1 byte'
+        self.serial.read_size = read_size
+        return f'Read size set to {read_size} bytes'
+
+    def process_protocol(self, protocol='text', layout='<fff', framing='sync', checksum='none', sync='aa55'):
+        if protocol == 'text':
+            self.converter = BufferConverter()
+            return 'Protocol set to text lines'
+        if protocol != 'binary':
+            return 'Unknown protocol ' + protocol
+        try:
+            self.converter = BinaryConverter(layout, framing, checksum, bytes.fromhex(sync))
+        except ValueError as e:
+            return 'Invalid binary protocol: ' + str(e)
+        return f'Protocol set to binary {layout} records with {framing} framing and {checksum} checksum'
+
+    def process_replay(self, state='stop', speed='1', delimiter='comma', decimal='dot', file_path=''):
+        # A speed of max replays without waiting
+        if self.replay is not None:
+            self.replay.close()
+            self.replay = None
+        if state == 'stop':
+            return 'Replay stopped'
+        if state != 'start':
+            return 'Unknown replay state ' + state
+        if self.serial.is_connected.is_set():
+            return 'Please disconnect before replaying a recording'
+        try:
+            replay_speed = 0.0 if speed == 'max' else float(speed.rstrip('x'))
+        except ValueError:
+            return 'Unknown replay speed ' + speed
+        if delimiter not in SEPARATORS or decimal not in SEPARATORS:
+            return f'Unknown format {delimiter} {decimal}'
+        try:
+            self.replay = Replayer(file_path, replay_speed, delimiter=SEPARATORS[delimiter],
+                                   decimal=SEPARATORS[decimal])
+            self.replay.load()
+        except (OSError, ValueError) as e:
+            self.replay = None
+            return 'Could not replay the recording: ' + str(e)
+        self.replay_reported = 0
+        return f'Replaying {os.path.basename(self.replay.file_path)} at {speed} speed'
+
     def process_disconnect(self):
         status = self.serial.disconnect()
         if status:
@@ -213,11 +691,25 @@ class SerialThread(threading.Thread):
         return message
 
 
+class NotifyingQueue(queue.Queue):
+    """Queue which calls notify after every item that has been put"""
+
+    def __init__(self, max_size, notify):
+        super().__init__(max_size)
+        self.notify = notify
+
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        self.notify()
+
+
 class SerialInterface:
     """This is the view"""
     queues: Dict[str, List[queue.Queue]]
+    frame_queues: Dict[str, List[queue.Queue]]
+    requests = ('out', 'command')
 
-    def __init__(self):
+    def __init__(self, ring: SampleRing = None):
         self.queues = {
             'in': [],  # Messages that are straight from the serial connection
             'out': [],  # Messages that needs to be sent to the serial connection
@@ -226,20 +718,118 @@ class SerialInterface:
             'status': [],  # Status messages from the controller
             'command': [],  # Command messages to the controller
         }
+        self.frame_queues = {name: [] for name in self.queues}
+        self.queue_drops = {name: 0 for name in self.queues}
+        self.ring = SampleRing() if ring is None else ring
+        self.truncated_width = 0
+        self.on_wakeup = None
 
     def create_queue(self, name: str, max_size=1000):
         if name not in self.queues:
             return
-        new_queue = queue.Queue(max_size)
+        if name in self.requests:
+            new_queue = NotifyingQueue(max_size, self.notify)
+        else:
+            new_queue = queue.Queue(max_size)
         self.queues[name].append(new_queue)
         return new_queue
 
+    def create_cursor(self, name: str):
+        """
+        Creates a cursor which reads the samples of the data topic from
+        the ring buffer. The lag and dropped samples of the cursor can
+        be requested with get_statistics.
+
+        :param name: Name of the subscriber
+        :return: The new cursor
+        """
+        return self.ring.subscribe(name)
+
+    def get_statistics(self):
+        """
+        Gets the (lag, drops) of every data subscriber, the amount of
+        items that did not fit into the queues of each topic and the
+        amount of values above the channels of the ring buffer.
+
+        :return: Dictionary with statistics
+        """
+        return {
+            'cursors': self.ring.statistics(),
+            'queues': dict(self.queue_drops),
+            'truncated': self.ring.truncated,
+        }
+
+    def write_samples(self, block: np.ndarray, times=None):
+        """
+        Writes samples into the ring buffer. A shared ring buffer has a
+        fixed amount of channels, the first block which does not fit is
+        reported on the status topic.
+
+        :param block: Array with shape (rows, channels)
+        :param times: Timestamps of the samples in nanoseconds
+        """
+        self.ring.write(block, times)
+        width = block.shape[1]
+        if width > self.ring.channels and width > self.truncated_width:
+            self.truncated_width = width
+            self.queue_item('status', f'The sample buffer holds {self.ring.channels} of {width} channels, '
+                                      f'the other channels are lost')
+
+    def create_frame_queue(self, name: str, max_size=1000):
+        """
+        Creates a queue which receives whole frames instead of single
+        items. A frame of the data topic is an (N, channels) array, a
+        frame of a text topic is a list of strings.
+
+        :param name: Name of the topic
+        :param max_size: Maximum amount of frames inside the queue
+        :return: The new queue
+        """
+        if name not in self.frame_queues:
+            return
+        new_queue = queue.Queue(max_size)
+        self.frame_queues[name].append(new_queue)
+        return new_queue
+
+    def queue_frame(self, name: str, frame, times=None):
+        """
+        Publishes a frame to the frame queues of the topic. The items of
+        the frame are also put in the item queues of the topic.
+
+        :param name: Name of the topic
+        :param frame: Array with samples or list of strings
+        :param times: Timestamps of the samples in nanoseconds
+        """
+        if name not in self.frame_queues:
+            return
+        if name == 'data':
+            self.write_samples(frame, times)
+        for q in self.frame_queues[name]:
+            if q.full():
+                self.queue_drops[name] += len(frame)
+                continue
+            q.put(frame, False)
+        if len(self.queues[name]) == 0:
+            return
+        items = frame.tolist() if isinstance(frame, np.ndarray) else frame
+        for item in items:
+            self.queue_item(name, item)
+
+    def notify(self):
+        """
+        Wakes up the controller when a request has been queued.
+        """
+        on_wakeup = self.on_wakeup
+        if on_wakeup is not None:
+            on_wakeup()
+
     def queue_item(self, name: str, item):
         if name not in self.queues:
             return
         current_queues = self.queues[name]
         for q in current_queues:
             if q.full():
+                self.queue_drops[name] += 1
                 continue
             q.put(item, False)
 
@@ -262,7 +852,15 @@ class SerialHandler:
         self.serial = serial.Serial()
         self.is_connected = threading.Event()
         self.is_debug = False
-        self.time_debug = 0
+        self.name = ''
+        self.simulator: DeviceSimulator = None
+        self.pty: PtySimulator = None
+        self.wakeup = threading.Event()
+        self.timeout = 0.05
+        self.read_size = 65536
+        self.read_last = 0
+        self.read_time = 0
+        self.byte_counter = RateCounter()
 
     def available(self):
         """
@@ -273,8 +871,7 @@ class SerialHandler:
         if not self.is_connected.is_set():
             return 0
         if self.is_debug is True:
-            self.time_debug += 1
-            return self.time_debug - 3
+            return self.simulator.available()
         return self.serial.inWaiting()
 
     def connect(self, name):
@@ -288,16 +885,41 @@ class SerialHandler:
         """
         if self.is_connected.is_set():
             return False
-        if name == 'debug':
+        if name == 'debug' or name.startswith('debug:'):
+            self.simulator = DeviceSimulator(**parse_options(name))
             self.is_debug = True
+            self.name = name
             self.is_connected.set()
             return True
+        if name == 'pty' or name.startswith('pty:'):
+            return self.connect_pty(name)
         for p in serial.tools.list_ports.comports():
             if p.device == name:
                 break
         else:
             return False
-        self.serial = serial.Serial(name, timeout=0.1)
+        self.serial = serial.Serial(name, timeout=self.timeout)
+        self.name = name
+        self.is_connected.set()
+        return True
+
+    def connect_pty(self, name):
+        """
+        Connects to a simulated device behind a pseudo terminal, so the
+        data goes through the real serial port code.
+
+        :param name: Name of the device with the simulator options
+        :return: True or False
+        """
+        self.pty = PtySimulator(DeviceSimulator(**parse_options(name)))
+        self.pty.start()
+        try:
+            self.serial = serial.Serial(self.pty.device, timeout=self.timeout)
+        except serial.SerialException:
+            self.pty.stop()
+            self.pty = None
+            raise
+        self.name = name
         self.is_connected.set()
         return True
 
@@ -314,28 +936,68 @@ class SerialHandler:
         self.is_connected.clear()
         if self.is_debug:
             self.is_debug = False
+            self.simulator = None
             return True
         self.serial.close()
+        if self.pty is not None:
+            self.pty.stop()
+            self.pty = None
         return True
 
     def read(self):
         """
-        Reads the input buffer and returns its contents
+        Reads everything in the input buffer, up to read_size bytes,
+        with a single call. The bytes are returned undecoded, so
+        characters split over two reads are decoded after framing.
 
         :return: Bytes in the buffer
         """
         if not self.is_connected.is_set():
-            return
+            return b''
         if self.is_debug:
-            self.time_debug = 0
-            rand = random.Random()
-            return f'{rand.random()}\t{rand.random()}\t{rand.random()}\n'
-        buffer = self.serial.read(32)
+            buffer = self.simulator.read(self.read_size)
+        else:
+            size = min(self.serial.inWaiting(), self.read_size)
+            buffer = self.serial.read(size)
+        self.read_time = time.monotonic_ns()
+        self.read_last = len(buffer)
+        self.byte_counter.add(len(buffer))
+        return buffer
+
+    def wait_read(self):
+        """
+        Blocks until bytes arrive, cancel_wait is called or the timeout
+        has passed and returns the bytes that are available by then.
+
+        :return: Bytes in the buffer
+        """
+        if not self.is_connected.is_set():
+            self.wakeup.wait(self.timeout)
+            return b''
+        if self.is_debug:
+            self.wakeup.wait(min(self.simulator.next_due(), self.timeout))
+            return self.read()
+        # The serial port returns after the first byte or the timeout
+        buffer = self.serial.read(1)
+        if len(buffer) == 0:
+            return buffer
+        buffer += self.read()
+        self.byte_counter.add(1)
+        self.read_last += 1
+        return buffer
+
+    def cancel_wait(self):
+        """
+        Makes wait_read return immediately, this is thread safe.
+        """
+        self.wakeup.set()
+        if not self.is_connected.is_set() or self.is_debug:
+            return
         try:
-            decode = buffer.decode()
-        except UnicodeError:
-            return ''
-        return decode
+            self.serial.cancel_read()
+        except (AttributeError, OSError, serial.SerialException):
+            # Either unsupported or the port is closing at this moment
+            pass
 
     def write(self, message: str):
         """
@@ -1,11 +1,12 @@
 import datetime
 import json
 import os
+import time
 import tkinter as tk
 import webbrowser
 from pathlib import Path
 
-import pandas
+import numpy as np
 
 SETTINGS_FILE = 'settings.json'
 
@@ -19,6 +20,9 @@ CSV_EXTENSION = '.csv'
 DATE_FORMAT = "%Y-%m-%d_%H_%M"
 DATE_TIME = datetime.datetime.now().strftime(DATE_FORMAT)
 
+CSV_BUFFER_SIZE = 1 << 20
+CSV_FLUSH_INTERVAL = 1.0
+
 
 def json_load(settings=None):
     if settings is None:
@@ -54,12 +58,171 @@ def ask_directory():
     return path
 
 
+def ask_recording():
+    path = tk.filedialog.askopenfilename(initialdir=CSV_FOLDER, filetypes=[
+        ('Recordings', '*' + CSV_EXTENSION + ' *.col'),
+        ('All files', '*'),
+    ])
+    return path
+
+
+def csv_format(data, delimiter=None, decimal=None):
+    """
+    Formats rows of values as CSV text with a single format operation.
+    Missing values stay empty.
+
+    :param data: Array with shape (rows, columns) or list of rows
+    :param delimiter: Delimiter of the fields, by default CSV_DELIMITER
+    :param decimal: Decimal separator, by default CSV_DECIMAL
+    :return: Text of the rows
+    """
+    if delimiter is None:
+        delimiter = CSV_DELIMITER
+    if decimal is None:
+        decimal = CSV_DECIMAL
+    if not isinstance(data, np.ndarray):
+        # Shorter rows are padded like a DataFrame would do
+        width = max(len(row) for row in data)
+        data = [row + [np.nan] * (width - len(row)) for row in data]
+    block = np.asarray(data, dtype=np.float64)
+    rows, columns = block.shape
+    field = '%r'
+    if decimal == delimiter:
+        field = '"%r"'
+    line = delimiter.join([field] * columns) + '\n'
+    text = line * rows % tuple(block.ravel().tolist())
+    if np.isnan(block).any():
+        text = text.replace('nan', '')
+    if decimal != '.':
+        text = text.replace('.', decimal)
+    return text
+
+
+class CsvStream:
+    """
+    CSV file which stays open between writes. The text is buffered and
+    written to disk once flush_size bytes are pending or flush_interval
+    seconds have passed. Without a delimiter and decimal the stream
+    follows CSV_DELIMITER and CSV_DECIMAL.
+    """
+
+    def __init__(self, file_path, mode='a', flush_size=CSV_BUFFER_SIZE, flush_interval=CSV_FLUSH_INTERVAL,
+                 delimiter=None, decimal=None):
+        self.file_path = file_path
+        self.delimiter = delimiter
+        self.decimal = decimal
+        self.file = open(file_path, mode, buffering=CSV_BUFFER_SIZE, newline='')
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.flush_time = time.monotonic()
+        self.pending = 0
+        self.size = self.file.tell()
+
+    def write(self, data):
+        if len(data) == 0:
+            return
+        written = self.file.write(csv_format(data, self.delimiter, self.decimal))
+        self.pending += written
+        self.size += written
+        self.update()
+
+    def update(self):
+        if self.pending == 0:
+            return
+        if self.pending < self.flush_size and time.monotonic() - self.flush_time < self.flush_interval:
+            return
+        self.flush()
+
+    def flush(self):
+        self.file.flush()
+        self.flush_time = time.monotonic()
+        self.pending = 0
+
+    def sync(self):
+        # Writes the file to disk, not only to the operating system
+        self.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+
+def csv_parse(lines, delimiter=None, decimal=None):
+    """
+    Parses CSV lines into an array, the inverse of csv_format. Shorter
+    rows and empty fields are filled with NaN.
+
+    :param lines: List of lines without line endings
+    :param delimiter: Delimiter of the fields, by default CSV_DELIMITER
+    :param decimal: Decimal separator, by default CSV_DECIMAL
+    :return: Array with shape (rows, columns)
+    """
+    if len(lines) == 0:
+        return np.empty((0, 0))
+    if delimiter is None:
+        delimiter = CSV_DELIMITER
+    if decimal is None:
+        decimal = CSV_DECIMAL
+    if decimal == delimiter:
+        lines = [line.replace('","', '\t').strip('"') for line in lines]
+        delimiter = '\t'
+    counts = {line.count(delimiter) for line in lines}
+    columns = max(counts) + 1
+    text = delimiter.join(lines)
+    if len(counts) == 1 and delimiter * 2 not in text and text[:1] != delimiter and text[-1:] != delimiter:
+        # Every row has all fields, so the whole text parses in one call
+        text = text.replace(delimiter, ' ').replace(decimal, '.')
+        return np.array(text.split(), np.float64).reshape(len(lines), columns)
+    block = np.full((len(lines), columns), np.nan)
+    for row, line in zip(block, lines):
+        for index, value in enumerate(line.replace(decimal, '.').split(delimiter)):
+            if value != '':
+                row[index] = float(value)
+    return block
+
+
+def csv_reader(file_path, rows=65536):
+    """
+    Reads a CSV file in blocks of rows.
+
+    :param file_path: Path of the file
+    :param rows: Largest amount of rows per block
+    :return: Generator of arrays with shape (rows, columns)
+    """
+    with open(file_path, 'r', newline='') as csv_file:
+        lines = []
+        for line in csv_file:
+            line = line.rstrip('\r\n')
+            if line == '':
+                continue
+            lines.append(line)
+            if len(lines) >= rows:
+                yield csv_parse(lines)
+                lines = []
+        if len(lines) > 0:
+            yield csv_parse(lines)
+
+
 def csv_writer(file_path, data, mode):
-    dataframe = pandas.DataFrame(data)
-    dataframe.to_csv(file_path, mode=mode,
-                     decimal=CSV_DECIMAL, sep=CSV_DELIMITER,
-                     index=False, header=False)
-    return dataframe
+    with open(file_path, mode, newline='') as csv_file:
+        csv_file.write(csv_format(data))
+    return data
+
+
+def csv_path_auto(extension=CSV_EXTENSION, segment=0):
+    if not Path(CSV_BACKUP).exists():
+        Path(CSV_BACKUP).mkdir()
+    if segment > 0:
+        return CSV_BACKUP + DATE_TIME + f'_{segment:04d}' + extension
+    return CSV_BACKUP + DATE_TIME + extension
+
+
+def csv_path(file_name, extension=CSV_EXTENSION):
+    if len(file_name) <= 1:
+        file_name = 'Unnamed'
+    if not Path(CSV_FOLDER).exists():
+        Path(CSV_FOLDER).mkdir()
+    return CSV_FOLDER + file_name + extension
 
 
 def csv_save_auto(data):
@@ -0,0 +1,303 @@
+import json
+import os
+import struct
+import time
+import zlib
+from typing import Dict, List
+
+import numpy as np
+
+from . import files, recording
+from .backups import COMPRESSIONS
+from .buffers import SampleBlock
+
+JOURNAL_FOLDER = './journal/'
+JOURNAL_EXTENSION = '.journal'
+JOURNAL_CHECKPOINT = 'checkpoint.json'
+JOURNAL_TARGETS = ('backup', 'recorder')
+
+# Kind, targets, rows, columns and crc32 of the payload
+RECORD_HEADER = struct.Struct('<BBIII')
+RECORD_DATA = 0
+RECORD_OPEN = 1
+
+
+def target_mask(*targets):
+    return sum(1 << JOURNAL_TARGETS.index(target) for target in targets)
+
+
+def read_records(file_path):
+    """
+    Reads the records of a journal file. Reading stops at the first
+    record which is incomplete or damaged, like the end of a crash.
+
+    :param file_path: Path of the journal file
+    :return: Generator of (offset, kind, targets, payload), the payload
+        of data records is an array and of open records a dictionary
+    """
+    with open(file_path, 'rb') as journal_file:
+        while True:
+            offset = journal_file.tell()
+            header = journal_file.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            kind, targets, rows, columns, crc = RECORD_HEADER.unpack(header)
+            size = rows * columns * 8 if kind == RECORD_DATA else rows
+            payload = journal_file.read(size)
+            if len(payload) < size or zlib.crc32(payload) != crc:
+                return
+            if kind == RECORD_DATA:
+                yield offset, kind, targets, np.frombuffer(payload, '<f8').reshape(rows, columns)
+            else:
+                yield offset, kind, targets, json.loads(payload)
+
+
+class SampleJournal:
+    """
+    Write-ahead journal of the samples which are not saved yet. Samples
+    are appended as binary records when they arrive and the journal is
+    synced to disk once sync_size bytes are pending or sync_interval
+    seconds have passed. A checkpoint stores for every target the
+    position in the journal from which its samples are not inside the
+    recording files yet, and removes the journal files before these
+    positions.
+    """
+
+    def __init__(self, folder=JOURNAL_FOLDER, sync_interval=0.05, sync_size=256 << 10, worker=None):
+        """
+        :param folder: Path of the journal folder
+        :param sync_interval: Largest amount of seconds between syncs
+        :param sync_size: Largest amount of bytes between syncs
+        :param worker: StorageWriter which syncs, without a worker the
+            journal is synced directly
+        """
+        self.folder = folder
+        self.worker = worker
+        self.sync_interval = sync_interval
+        self.sync_size = sync_size
+        self.sync_time = time.monotonic()
+        self.generation = 0
+        self.file = None
+        self.pending = 0
+        self.size = 0
+        self.written = 0
+        self.syncs = 0
+
+    def path(self, generation):
+        return os.path.join(self.folder, f'{generation:08d}{JOURNAL_EXTENSION}')
+
+    def generations(self):
+        if not os.path.isdir(self.folder):
+            return []
+        names = [name for name in os.listdir(self.folder) if name.endswith(JOURNAL_EXTENSION)]
+        return sorted(int(name[:-len(JOURNAL_EXTENSION)]) for name in names)
+
+    def start(self):
+        os.makedirs(self.folder, exist_ok=True)
+        self.generation = max(self.generations(), default=0) + 1
+        self.file = open(self.path(self.generation), 'ab')
+        self.size = 0
+
+    def append(self, kind, targets, rows, columns, payload: bytes):
+        header = RECORD_HEADER.pack(kind, targets, rows, columns, zlib.crc32(payload))
+        self.file.write(header + payload)
+        self.pending += len(header) + len(payload)
+        self.size += len(header) + len(payload)
+        self.written += len(header) + len(payload)
+        self.update()
+
+    def position(self):
+        """
+        Gets the position of the next record.
+
+        :return: Pair of the generation and the offset inside its file
+        """
+        return [self.generation, self.size]
+
+    def append_block(self, block: np.ndarray, targets: int):
+        """
+        Appends samples.
+
+        :param block: Array with shape (rows, channels)
+        :param targets: Bit mask of the targets which receive the samples
+        """
+        block = np.ascontiguousarray(block, '<f8')
+        self.append(RECORD_DATA, targets, block.shape[0], block.shape[1], block.tobytes())
+
+    def append_open(self, target: str, meta: Dict[str, any]):
+        """
+        Appends the opening of a recording file.
+
+        :param target: Either 'recorder' or 'backup'
+        :param meta: Path, format and position of the file, carry is the
+            amount of buffered rows which go into the new file
+        """
+        payload = json.dumps(meta).encode()
+        self.append(RECORD_OPEN, target_mask(target), len(payload), 0, payload)
+
+    def update(self):
+        if self.pending == 0:
+            return
+        if self.pending < self.sync_size and time.monotonic() - self.sync_time < self.sync_interval:
+            return
+        if self.worker is None:
+            self.sync()
+            return
+        # A writer which is behind syncs the journal once it has room again
+        if self.worker.is_full():
+            return
+        self.sync_time = time.monotonic()
+        self.pending = 0
+        self.worker.submit(self.sync_file, self.file)
+
+    def sync(self):
+        self.sync_file(self.file)
+        self.sync_time = time.monotonic()
+        self.pending = 0
+
+    def sync_file(self, journal_file):
+        journal_file.flush()
+        os.fsync(journal_file.fileno())
+        self.syncs += 1
+
+    def close_file(self, journal_file):
+        self.sync_file(journal_file)
+        journal_file.close()
+
+    def rotate(self):
+        """
+        Continues in a new journal file. With a worker the previous file
+        is synced and closed by the worker, before a later commit.
+
+        :return: Generation of the previous journal file
+        """
+        if self.worker is None:
+            self.close_file(self.file)
+        else:
+            self.worker.submit(self.close_file, self.file)
+        self.sync_time = time.monotonic()
+        self.pending = 0
+        generation = self.generation
+        self.generation += 1
+        self.file = open(self.path(self.generation), 'ab')
+        self.size = 0
+        return generation
+
+    def commit(self, generation, targets: Dict[str, Dict[str, any]], starts: Dict[str, List[int]]):
+        """
+        Stores a checkpoint and removes the journal files up to the
+        generation, which no target needs anymore. Samples of a target
+        before its start have to be synced inside its recording file.
+
+        :param generation: Last generation of the checkpoint
+        :param targets: Meta of the open recording files with their positions
+        :param starts: Position in the journal of the first sample of
+            every target, which is not inside the recording file
+        """
+        file_path = os.path.join(self.folder, JOURNAL_CHECKPOINT)
+        with open(file_path + '.tmp', 'w') as checkpoint_file:
+            json.dump({'generation': generation, 'targets': targets, 'starts': starts}, checkpoint_file)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(file_path + '.tmp', file_path)
+        first = min(start[0] for start in starts.values())
+        for old in self.generations():
+            if old <= generation and old < first:
+                os.remove(self.path(old))
+
+    def close(self):
+        """
+        Closes and removes the journal, after a clean shutdown all
+        samples are inside the recording files.
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        for generation in self.generations():
+            os.remove(self.path(generation))
+        checkpoint_path = os.path.join(self.folder, JOURNAL_CHECKPOINT)
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+
+def open_target(meta: Dict[str, any]):
+    """
+    Opens a recording file for the replay and cuts it at the position of
+    the meta, so samples which are inside the journal are not doubled.
+
+    :param meta: Path, format, position and CSV settings of the file
+    :return: The stream of the file, None when the file was compressed
+    """
+    file_path = meta['path']
+    compressed = [file_path + extension for extension, _ in filter(None, COMPRESSIONS.values())]
+    if not os.path.exists(file_path) and any(os.path.exists(path) for path in compressed):
+        return None
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    if meta['format'] == 'csv':
+        if os.path.exists(file_path) and os.path.getsize(file_path) > meta['position']:
+            os.truncate(file_path, meta['position'])
+        return files.CsvStream(file_path, 'a', delimiter=meta['delimiter'], decimal=meta['decimal'])
+    stream = recording.ColumnWriter(file_path, meta['names'], meta['width'], meta['format'])
+    if stream.samples > meta['position']:
+        stream.truncate(meta['position'])
+    return stream
+
+
+def replay_journal(folder=JOURNAL_FOLDER):
+    """
+    Writes the samples of a journal which was left by a crash into the
+    recording files and removes the journal.
+
+    :param folder: Path of the journal folder
+    :return: Amount of recovered samples
+    """
+    journal = SampleJournal(folder)
+    generations = journal.generations()
+    if len(generations) == 0:
+        return 0
+    checkpoint = {'generation': 0, 'targets': {}}
+    try:
+        with open(os.path.join(folder, JOURNAL_CHECKPOINT)) as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+    except (OSError, ValueError):
+        pass
+    # Records of a target before its start are inside its recording file
+    start = [checkpoint['generation'] + 1, 0]
+    starts = {target: tuple(checkpoint.get('starts', {}).get(target, start)) for target in JOURNAL_TARGETS}
+    streams = {target: open_target(meta) for target, meta in checkpoint['targets'].items()}
+    buffers = {target: SampleBlock() for target in JOURNAL_TARGETS}
+    samples = 0
+    for generation in generations:
+        for offset, kind, targets, payload in read_records(journal.path(generation)):
+            names = [target for target in JOURNAL_TARGETS
+                     if targets & target_mask(target) and (generation, offset) >= starts[target]]
+            if len(names) == 0:
+                continue
+            if kind == RECORD_DATA:
+                samples += len(payload)
+                for target in names:
+                    buffers[target].append(payload)
+                continue
+            # Like the storage, the buffered rows except the carry belong to the previous file
+            target, = names
+            buffer = buffers[target]
+            keep = buffer.view()[len(buffer) - payload['carry']:].copy()
+            write_target(streams.get(target), buffer.view()[:len(buffer) - payload['carry']])
+            buffer.clear()
+            buffer.append(keep)
+            if streams.get(target) is not None:
+                streams[target].close()
+            streams[target] = open_target(payload)
+    for target, buffer in buffers.items():
+        write_target(streams.get(target), buffer.view())
+    for stream in streams.values():
+        if stream is not None:
+            stream.close()
+    journal.close()
+    return samples
+
+
+def write_target(stream, block):
+    if stream is None or len(block) == 0:
+        return
+    stream.write(block)
@@ -1,6 +1,8 @@
 import threading
 from typing import List, Dict
 
+from . import files
+from .acquisition import SerialProcess
 from .device import SerialThread, SerialInterface
 from .storage import StorageThread, StorageInterace
 
@@ -53,17 +55,23 @@ class TaskInterface:
     storage_interface: StorageInterace
     application_settings: Dict[str, Dict[str, any]]
 
-    def __init__(self):
+    def __init__(self, acquisition: str = None):
         self.tasks_manager = TaskManager()
         self.application_settings = {}
 
-        # Create a thread for serial tasks
-        serial = SerialThread(self.tasks_manager.running)
+        # Create a thread or a process for serial tasks
+        if acquisition is None:
+            settings = files.json_load()
+            acquisition = settings.get('connection', {}).get('acquisition', 'thread')
+        if acquisition == 'process':
+            serial = SerialProcess(self.tasks_manager.running)
+        else:
+            serial = SerialThread(self.tasks_manager.running)
         self.serial_interface = serial.interface
         self.tasks_manager.add(serial)
 
         # Create a thread for storage tasks
         storage = StorageThread(self.tasks_manager.running)
-        storage.interface.queue_data = serial.interface.create_queue('data')
+        storage.interface.cursor_data = serial.interface.create_cursor('storage')
         self.storage_interface = storage.interface
         self.tasks_manager.add(storage)
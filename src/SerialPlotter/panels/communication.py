@@ -49,7 +49,7 @@ class Controller(mvc.ControllerOld):
         self.update_view()
         self.queue_in = interface.serial_interface.create_queue('in')
         self.queue_out = interface.serial_interface.create_queue('out')
-        self.queue_data = interface.serial_interface.create_queue('data')
+        self.cursor_data = interface.serial_interface.create_cursor('communication')
         self.queue_messages = interface.serial_interface.create_queue('text')
         self.view.after(1000, self.display_incoming_text)
 
@@ -76,10 +76,10 @@ class Controller(mvc.ControllerOld):
             text = str(self.queue_in.get())
             if state != 1: continue
             self.view.text_field['In'].insert('1.0', text)
-        while not self.queue_data.empty():
-            text = str(self.queue_data.get()) + '\n'
+        for _, block in self.cursor_data.read():
             if state != 3: continue
-            self.view.text_field['In'].insert('1.0', text)
+            for values in block.tolist():
+                self.view.text_field['In'].insert('1.0', str(values) + '\n')
         while not self.queue_messages.empty():
             text = str(self.queue_messages.get())
             if state != 2: continue
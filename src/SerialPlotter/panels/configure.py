@@ -14,7 +14,7 @@ class Model(mvc.ModelOld):
             'graph_y_min': -10,
             'graph_y_max': 110,
             'graph_size': 200,
-            'graph_clear': 50,
+            'graph_fps': 30,
         })
 
 
@@ -85,15 +85,15 @@ class View(mvc.ViewBase):
 
         # Contents of graph data settings frame
         label['graph_data_size'] = mvc.Label(frame_data, 'Total of points')
-        label['graph_clear_size'] = mvc.Label(frame_data, 'Clear amount')
+        label['graph_fps'] = mvc.Label(frame_data, 'Frames per second')
         label['graph_data_size'].grid_configure(row=3, sticky='w')
-        label['graph_clear_size'].grid_configure(row=4, sticky='w')
+        label['graph_fps'].grid_configure(row=4, sticky='w')
 
         # Contents of graph data settings frame
-        spinbox['graph_data_size'] = mvc.Spinbox(frame_data, (10, 10000, 10))
-        spinbox['graph_clear_size'] = mvc.Spinbox(frame_data, (10, 10000, 10))
+        spinbox['graph_data_size'] = mvc.Spinbox(frame_data, (10, 100000, 10))
+        spinbox['graph_fps'] = mvc.Spinbox(frame_data, (1, 120, 1))
         spinbox['graph_data_size'].grid_configure(row=3, column=1, cnf=expand_cnf)
-        spinbox['graph_clear_size'].grid_configure(row=4, column=1, cnf=expand_cnf)
+        spinbox['graph_fps'].grid_configure(row=4, column=1, cnf=expand_cnf)
 
         # Buttons for saving settings inside this view
         button['save'] = mvc.Button(self.frame, 'Save settings')
@@ -127,7 +127,7 @@ class Controller(mvc.ControllerOld):
         settings['graph_y_max'] = float(self.view.spinboxes['graph_y_max'].get())
 
         settings['graph_size'] = int(float(self.view.spinboxes['graph_data_size'].get()))
-        settings['graph_clear'] = int(float(self.view.spinboxes['graph_clear_size'].get()))
+        settings['graph_fps'] = int(float(self.view.spinboxes['graph_fps'].get()))
 
     def update_view(self):
         settings = self.model.settings
@@ -140,7 +140,7 @@ class Controller(mvc.ControllerOld):
         self.view.spinboxes['graph_y_max'].variable.set(settings['graph_y_max'])
 
         self.view.spinboxes['graph_data_size'].variable.set(settings['graph_size'])
-        self.view.spinboxes['graph_clear_size'].variable.set(settings['graph_clear'])
+        self.view.spinboxes['graph_fps'].variable.set(settings['graph_fps'])
 
     def on_close(self):
         self.update_model()
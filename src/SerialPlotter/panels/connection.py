@@ -2,7 +2,7 @@ from typing import List
 
 from serial.tools.list_ports import comports
 
-from .. import mvc
+from .. import files, mvc
 from ..manager import TaskInterface
 
 
@@ -36,6 +36,26 @@ class View(mvc.ViewOld):
         self.create_grouped_button('Controls', 'Disconnect', 'Disconnect')
         self.create_grouped_button('Controls', 'Reconnect', 'Reconnect')
 
+        # Protocol of the device, binary records are described by a struct
+        # layout, their framing, checksum and sync word
+        self.create_label_header('Protocol:')
+        self.create_combobox('Protocol', 'text', ['text', 'binary'])
+        self.create_labeled_entry('Layout', 'Struct layout')
+        self.create_labeled_entry('Sync', 'Sync word (hex)')
+        self.create_combobox('Framing', 'sync', ['sync', 'cobs'])
+        self.create_combobox('Checksum', 'none', ['none', 'crc16', 'crc32'])
+
+        # Replays a recording like the samples of a device
+        self.create_label_header('Replay recording:')
+        self.create_combobox('Speed', '1x', ['1x', '10x', '100x', 'max'])
+        self.create_group('Replay')
+        self.create_grouped_button('Replay', 'Replay', 'Open recording')
+        self.create_grouped_button('Replay', 'Stop', 'Stop replay')
+
+        # Checkbox which moves the acquisition into its own process
+        # The setting is used when the application starts
+        self.create_check_button('Process', 'Acquire in a separate process (after restart)')
+
 
 class Model(mvc.ModelOld):
     def __init__(self):
@@ -43,6 +63,12 @@ class Model(mvc.ModelOld):
         self.settings.update({
             'device': '',
             'keep': 0,
+            'acquisition': 'thread',
+            'protocol': 'text',
+            'layout': '<fff',
+            'framing': 'sync',
+            'checksum': 'none',
+            'sync': 'aa55',
         })
 
 
@@ -57,6 +83,8 @@ class Controller(mvc.ControllerOld):
         self.view.bind_button('Disconnect', self.command_disconnect)
         self.view.bind_button('Reconnect', self.command_reconnect)
         self.view.bind_button('Refresh', self.command_refresh)
+        self.view.bind_button('Replay', self.command_replay)
+        self.view.bind_button('Stop', self.command_replay_stop)
 
         self.model.load()
         self.update_view()
@@ -73,6 +101,14 @@ class Controller(mvc.ControllerOld):
         settings['keep'] = self.view.check_buttons['Remember'].get()
         if settings['keep'] == 1:
             settings['device'] = self.view.combo_boxes['Device'].get()
+        if self.view.check_buttons['Process'].get() == 1:
+            settings['acquisition'] = 'process'
+        else:
+            settings['acquisition'] = 'thread'
+        for name in ('Protocol', 'Framing', 'Checksum'):
+            settings[name.lower()] = self.view.combo_boxes[name].get()
+        for name in ('Layout', 'Sync'):
+            settings[name.lower()] = self.view.entries[name].get().replace(' ', '')
 
     def update_view(self):
         settings = self.model.settings
@@ -80,6 +116,15 @@ class Controller(mvc.ControllerOld):
             self.view.combo_boxes['Device'].delete(0, 'end')
             self.view.combo_boxes['Device'].insert(0, settings['device'])
         self.view.check_buttons['Remember'].set(settings['keep'])
+        self.view.check_buttons['Process'].set(int(settings['acquisition'] == 'process'))
+        # Older settings held the arguments of the protocol command in one text
+        protocol, *options = settings['protocol'].split(' ')
+        settings.update(zip(('protocol', 'layout', 'framing', 'checksum', 'sync'), [protocol, *options]))
+        for name in ('Protocol', 'Framing', 'Checksum'):
+            self.view.combo_boxes[name].set(settings[name.lower()])
+        for name in ('Layout', 'Sync'):
+            self.view.entries[name].delete(0, 'end')
+            self.view.entries[name].insert(0, settings[name.lower()])
 
     def update_display_status(self):
         status = ''
@@ -93,7 +138,11 @@ class Controller(mvc.ControllerOld):
     def command_connect(self):
         # Read the selected device name from the combobox
         device_name = self.view.combo_boxes['Device'].get()
-        # Attempt connecting to the selected device
+        # Select the protocol and attempt connecting to the selected device
+        self.update_model()
+        settings = self.model.settings
+        self.queue_out.put(f'protocol {settings["protocol"]} {settings["layout"]} '
+                           f'{settings["framing"]} {settings["checksum"]} {settings["sync"]}')
         self.queue_out.put('connect ' + device_name)
         self.view.after(500, self.update_display_status)
         # Update the connection status label
@@ -113,6 +162,23 @@ class Controller(mvc.ControllerOld):
         # Update the connection status label
         self.view.update_label('Status', 'Reconnecting to device...')
 
+    def command_replay(self):
+        file_path = files.ask_recording()
+        if file_path == '':
+            return
+        # The recording is read with the delimiter and decimal of the formatter
+        formatter = self.interface.application_settings.get('format', {})
+        delimiter = formatter.get('delimiter', 'Comma').lower()
+        decimal = formatter.get('decimal', 'Dot').lower()
+        speed = self.view.combo_boxes['Speed'].get()
+        self.queue_out.put(f'replay start {speed} {delimiter} {decimal} {file_path}')
+        self.view.after(500, self.update_display_status)
+        self.view.update_label('Status', 'Loading recording...')
+
+    def command_replay_stop(self):
+        self.queue_out.put('replay stop')
+        self.view.after(500, self.update_display_status)
+
     def command_refresh(self):
         # Gather the ports and extract the device names into a new list
         device_names = [port.device for port in comports()]
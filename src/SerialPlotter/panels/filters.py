@@ -102,6 +102,7 @@ class Controller(mvc.ControllerOld):
 
         self.model.load()
         self.update_view()
+        self.command_channels()
 
     def command_remove(self):
         self.view.filter.remove_entry()
@@ -112,13 +113,20 @@ class Controller(mvc.ControllerOld):
     def command_save(self):
         self.update_model()
         self.model.save()
+        self.command_channels()
         self.view.winfo_toplevel().event_generate('<<UpdateFilters>>')
 
     def command_restore(self):
         self.model.load()
         self.update_view()
+        self.command_channels()
         self.view.winfo_toplevel().event_generate('<<UpdateFilters>>')
 
+    def command_channels(self):
+        # The filter names are the channel names of binary recordings
+        names = [values['name'].replace(',', '').replace(' ', '%') for values in self.model.filter_data]
+        self.interface.storage_interface.queue_command.put('channels ' + ','.join(names))
+
     def on_close(self):
         self.update_model()
         self.model.save()
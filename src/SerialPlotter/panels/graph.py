@@ -1,19 +1,30 @@
+import time
 import tkinter as tk
 from typing import List, Dict
 
+import numpy as np
 from matplotlib.axes import Axes
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
 from matplotlib.figure import Figure
 from matplotlib.lines import Line2D
 
 from .. import mvc
+from ..buffers import LineBuffer
+from ..decimation import decimate_minmax
 from ..manager import TaskInterface
 
+# Seconds between the updates while the graph is hidden or dragged
+HIDDEN_INTERVAL = 0.25
+
 
 class GraphFrame(tk.Frame):
     def __init__(self, master):
         super().__init__(master)
 
+        # The statistics are a label outside the canvas, so they never redraw the figure
+        self.label_statistics = tk.Label(self, anchor='e')
+        self.label_statistics.pack(side='top', fill='x')
+
         # Create figure so graphs can be plotted
         self.figure = Figure(figsize=(9, 5))
         self.figure.subplots_adjust(0.05, 0.08, 0.97, 0.95)
@@ -32,22 +43,83 @@ class GraphFrame(tk.Frame):
         self.plot: Axes = self.figure.add_subplot()
         self.lines: List[Line2D] = []
 
+        # Everything except the lines is rendered once into the background
+        self.background = None
+        self.is_drawing_background = False
+        self.canvas.mpl_connect('draw_event', self.on_draw_event)
+
+        # Frame statistics
+        self.fps = 0.0
+        self.render_time = 0.0
+        self.frame_count = 0
+        self.frame_start = time.perf_counter()
+
     def create_line(self):
         index = len(self.lines)
         line = Line2D([], [], linewidth=1, color=f'C{index}')
         self.plot.add_line(line)
         self.lines.append(line)
+        self.invalidate()
 
     def remove_line(self):
         line = self.lines.pop()
         line.set_label(s=None)
         line.remove()
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        Makes the next draw render the whole figure, which is needed
+        after the axes or the legend have changed.
+        """
+        self.background = None
+
+    def on_draw_event(self, event):
+        # A resize or the toolbar rendered the figure with the lines inside
+        if not self.is_drawing_background:
+            self.background = None
 
     def draw(self):
         if self.winfo_viewable() == 0:
             return
+        start = time.perf_counter()
+        if self.background is None:
+            self.draw_background()
+        self.canvas.restore_region(self.background)
+        for line in self.lines:
+            self.plot.draw_artist(line)
+        self.canvas.blit(self.plot.bbox)
         self.canvas.flush_events()
-        self.canvas.draw_idle()
+        self.count_frame(time.perf_counter() - start)
+
+    def draw_background(self):
+        # The lines are hidden, so the background only holds the static parts
+        visible = [line.get_visible() for line in self.lines]
+        for line in self.lines:
+            line.set_visible(False)
+        self.is_drawing_background = True
+        try:
+            self.canvas.draw()
+        finally:
+            self.is_drawing_background = False
+            for line, state in zip(self.lines, visible):
+                line.set_visible(state)
+        self.background = self.canvas.copy_from_bbox(self.plot.bbox)
+
+    def count_frame(self, seconds: float):
+        """
+        Updates the frames per second and the average render time.
+
+        :param seconds: Render time of the frame
+        """
+        self.render_time = 0.9 * self.render_time + 0.1 * seconds
+        self.frame_count += 1
+        elapsed = time.perf_counter() - self.frame_start
+        if elapsed < 1.0:
+            return
+        self.fps = self.frame_count / elapsed
+        self.frame_count = 0
+        self.frame_start = time.perf_counter()
 
 
 class View(mvc.ViewOld):
@@ -61,15 +133,17 @@ class View(mvc.ViewOld):
 
 
 class Model(mvc.ModelOld):
-    data: List[List[float]]
+    data: LineBuffer
     filters: List[Dict[str, any]]
 
     def __init__(self):
         super().__init__(None)
         self.filters = []
-        self.data = []
-        self.buffer_size = 500
-        self.buffer_clear = 50
+        self.data = LineBuffer(500)
+        self.sample_rate = 0.0
+        self.sample_jitter = 0.0
+        self.target_fps = 30.0
+        self.lag = 0
 
     def bind(self, interface: TaskInterface):
         super().bind(interface)
@@ -107,51 +181,76 @@ class Controller(mvc.ControllerOld, WindowDrag):
         self.view.after(1000, self.update_loop)
         self.view.after(1000, self.update_graph_legend)
         self.view.after(1000, self.update_graph_settings)
-        self.queue_data = interface.serial_interface.create_queue('data')
+        self.view.after(1000, self.update_sample_rate)
+        self.cursor_data = interface.serial_interface.create_cursor('graph')
+        self.is_stale = False
         self.view.winfo_toplevel().bind('<<UpdateFilters>>', lambda e: self.update_graph_legend(), add='+')
         self.view.winfo_toplevel().bind('<<UpdateSettings>>', lambda e: self.update_graph_settings(), add='+')
 
     def update_loop(self):
-        queue_state = not self.queue_data.empty()
-        if self.window_isdrag() is True:
-            self.view.after(100, self.update_loop)
-            return
-        # Force update the plot when 50 samples behind
-        if self.queue_data.qsize() > 10:
-            while not self.queue_data.empty():
-                values = self.queue_data.get()
-                self.update_model_data(values)
-        if not self.queue_data.empty():
-            values = self.queue_data.get()
-            self.update_model_data(values)
-        # This reduces cpu usage
-        if queue_state is True:
+        """
+        Renders one frame. All samples which arrived since the previous
+        frame are taken and the graph is drawn at most once. The next
+        frame is timed for the target frames per second, while the graph
+        is hidden or dragged the samples are only buffered.
+        """
+        start = time.perf_counter()
+        graph = self.view.graph
+        is_visible = self.window_isdrag() is False and graph.winfo_viewable() == 1
+
+        # Samples which arrived but are not displayed yet
+        self.model.lag = self.cursor_data.lag()
+        blocks = self.cursor_data.read()
+        for times, block in blocks:
+            self.update_model_data(block, times)
+        if len(blocks) > 0:
+            self.is_stale = True
+        if is_visible and self.is_stale:
             self.update_lines_data()
-            self.view.graph.draw()
-        self.view.after(10, self.update_loop)
+            graph.draw()
+            self.is_stale = False
 
-    def update_model_data(self, values):
-        model_data = self.model.data
+        if is_visible:
+            delay = 1 / self.model.target_fps - (time.perf_counter() - start)
+        else:
+            delay = HIDDEN_INTERVAL
+        self.view.after(max(int(delay * 1000), 1), self.update_loop)
 
-        # Remove or create list to match the amount of data lines
-        while len(model_data) < len(values):
-            model_data.append([])
-        while len(model_data) > len(values):
-            model_data.pop()
+    def update_model_data(self, block, times):
+        # The channels of the buffer follow the channels of the block
+        self.model.data.append(block, times)
 
-        # Update the graph labels and visibility
-        for list_values, value in zip(model_data, values):
-            if len(list_values) > self.model.buffer_size:
-                del list_values[:self.model.buffer_clear]  # Clean up
-            list_values.append(value)
+    def update_sample_rate(self):
+        """
+        Measures the sample rate and the jitter between the samples from
+        the timestamps and shows them above the graph.
+        """
+        self.view.after(1000, self.update_sample_rate)
+        times = self.model.data.view_times()
+        if len(times) < 2:
+            return
+        intervals = np.diff(times)
+        mean = intervals.mean()
+        if mean <= 0:
+            return
+        self.model.sample_rate = 1e9 / mean
+        self.model.sample_jitter = intervals.std() / 1e3
+        graph = self.view.graph
+        graph.label_statistics.config(
+            text=f'{self.model.sample_rate:.1f} samples/s, jitter {self.model.sample_jitter:.1f} \u00b5s, '
+                 f'{graph.fps:.0f} FPS, {graph.render_time * 1000:.1f} ms/frame, lag {self.model.lag} samples')
 
     def update_lines_data(self):
         graph = self.view.graph
         model_data = self.model.data
 
+        # Only the min and max of every pixel column inside the axis limits are drawn
+        x_min, x_max = graph.plot.get_xlim()
+        pixels = int(graph.plot.bbox.width)
+        x_axis, values = decimate_minmax(model_data.view_x(), model_data.view(), x_min, x_max, pixels)
+
         # Pair lines and model data together
-        for line, y_values in zip(graph.lines, model_data):
-            x_axis = [i for i in range(len(y_values))]
+        for line, y_values in zip(graph.lines, values):
             line.set_data(x_axis, y_values)
 
     def update_graph_legend(self):
@@ -180,6 +279,7 @@ class Controller(mvc.ControllerOld, WindowDrag):
         # Update the legend of the plot
         active_lines = [line for line in graph.lines if line.get_visible()]
         graph.plot.legend(handles=active_lines, loc='upper left')
+        graph.invalidate()
         graph.draw()
 
     def update_graph_settings(self):
@@ -188,14 +288,15 @@ class Controller(mvc.ControllerOld, WindowDrag):
 
         graph.plot.set_xlim(settings['graph_x_min'], settings['graph_x_max'])
         graph.plot.set_ylim(settings['graph_y_min'], settings['graph_y_max'])
+        graph.invalidate()
         graph.draw()
 
         graph_size = int(settings['graph_size'])
         if graph_size > 0:
-            self.model.buffer_size = graph_size
-        graph_clear = int(settings['graph_clear'])
-        if graph_clear > 0:
-            self.model.buffer_clear = graph_clear
+            self.model.data.resize(graph_size, self.model.data.channels)
+        graph_fps = float(settings['graph_fps'])
+        if graph_fps > 0:
+            self.model.target_fps = graph_fps
 
     def on_close(self):
         pass
@@ -23,6 +23,8 @@ class View(mvc.ViewBase):
         frame_status.grid_configure(row=0, column=0, rowspan=2, columnspan=3, cnf=expand_cnf)
         label['status'] = mvc.Label(frame_status, 'Standby')
         label['status'].pack(fill='both', expand=True, pady=(5, 10))
+        label['buffers'] = mvc.Label(frame_status, 'Buffered samples: 0 (0.0 MB)')
+        label['buffers'].pack(fill='both', expand=True, pady=(0, 10))
 
         # Label frame
         frame_recorder_controls = mvc.LabelFrame(self.frame, 'Recorder controls')
@@ -38,6 +40,8 @@ class View(mvc.ViewBase):
         button['start'].grid_configure(row=0, column=0, cnf=expand_cnf)
         button['pause'].grid_configure(row=0, column=1, cnf=expand_cnf)
         button['save'].grid_configure(row=0, column=2, cnf=expand_cnf)
+        button['dump'] = mvc.Button(frame_recorder_controls, 'Dump black box into a recording')
+        button['dump'].grid_configure(row=1, column=0, columnspan=3, cnf=expand_cnf)
 
         # Label frame
         frame_directory = mvc.LabelFrame(self.frame, 'Directory settings')
@@ -53,6 +57,16 @@ class View(mvc.ViewBase):
         entry['file_name'].grid_configure(row=0, column=0, columnspan=5, cnf=expand_cnf)
         entry['directory_data'].grid_configure(row=1, column=0, columnspan=5, cnf=expand_cnf)
         entry['directory_backup'].grid_configure(row=2, column=0, columnspan=5, cnf=expand_cnf)
+        entry['backup_size'] = mvc.LabeledEntry(frame_directory, 'Backup file size (MB)')
+        entry['backup_minutes'] = mvc.LabeledEntry(frame_directory, 'Backup file duration (minutes)')
+        entry['backup_retention'] = mvc.LabeledEntry(frame_directory, 'Backup disk limit (MB, 0 is no limit)')
+        entry['backup_size'].grid_configure(row=3, column=0, columnspan=5, cnf=expand_cnf)
+        entry['backup_minutes'].grid_configure(row=4, column=0, columnspan=5, cnf=expand_cnf)
+        entry['backup_retention'].grid_configure(row=5, column=0, columnspan=5, cnf=expand_cnf)
+        entry['blackbox_minutes'] = mvc.LabeledEntry(frame_directory, 'Black box duration (minutes)')
+        entry['blackbox_size'] = mvc.LabeledEntry(frame_directory, 'Black box file size (MB)')
+        entry['blackbox_minutes'].grid_configure(row=6, column=0, columnspan=5, cnf=expand_cnf)
+        entry['blackbox_size'].grid_configure(row=7, column=0, columnspan=5, cnf=expand_cnf)
 
         # Label frame
         frame_directory_controls = mvc.LabelFrame(self.frame, 'Directory controls')
@@ -79,9 +93,23 @@ class View(mvc.ViewBase):
         checkbox['file_append'] = mvc.Checkbox(frame_settings, 'Append recorder save file data when saving manually')
         checkbox['file_overwrite'] = mvc.Checkbox(frame_settings,
                                                   'Overwrite recorder save file data when saving manually')
+        checkbox['timestamp'] = mvc.Checkbox(frame_settings, 'Add a timestamp column to saved data')
+        checkbox['binary'] = mvc.Checkbox(frame_settings, 'Save data as binary columns instead of CSV')
+        checkbox['backup_compress'] = mvc.Checkbox(frame_settings, 'Compress finished backup files')
+        checkbox['journal'] = mvc.Checkbox(frame_settings, 'Keep a journal to recover data after a crash')
+        checkbox['database'] = mvc.Checkbox(frame_settings, 'Also store data in a SQLite database')
+        checkbox['blackbox'] = mvc.Checkbox(frame_settings, 'Keep the last minutes in a black box file')
+        checkbox['pyramid'] = mvc.Checkbox(frame_settings, 'Write an overview with min and max next to recordings')
         checkbox['auto_save'].pack(anchor='w')
         checkbox['file_append'].pack(anchor='w')
         checkbox['file_overwrite'].pack(anchor='w')
+        checkbox['timestamp'].pack(anchor='w')
+        checkbox['binary'].pack(anchor='w')
+        checkbox['backup_compress'].pack(anchor='w')
+        checkbox['journal'].pack(anchor='w')
+        checkbox['database'].pack(anchor='w')
+        checkbox['blackbox'].pack(anchor='w')
+        checkbox['pyramid'].pack(anchor='w')
 
         # Label frame
         frame_settings_controls = mvc.LabelFrame(self.frame)
@@ -104,8 +132,24 @@ class Model(mvc.ModelOld):
             'auto_save': 0,
             'file_append': 0,
             'file_overwrite': 0,
+            'timestamp': 0,
+            'binary': 0,
             'data_dir': './data/',
             'backup_dir': './backup/',
+            'backup_size': 64,
+            'backup_minutes': 60,
+            'backup_retention': 0,
+            'backup_compress': 1,
+            'journal': 0,
+            'journal_interval': 50,
+            'journal_size': 256,
+            'database': 0,
+            'pyramid': 0,
+            'blackbox': 0,
+            'blackbox_minutes': 5,
+            'blackbox_size': 64,
+            'blackbox_after': 60,
+            'trigger': '',
         })
 
 
@@ -118,10 +162,12 @@ class Controller(mvc.ControllerOld):
         self.view.frame.pack(fill='both', side='left', padx=5, pady=5)
         self.view.frame.after(1000, lambda: self.command_settings())
         self.view.frame.after(2000, lambda: self.update_status('Standby'))
+        self.view.frame.after(1000, self.update_buffers_loop)
 
         self.view.buttons['save'].command = self.command_save
         self.view.buttons['start'].command = self.command_start
         self.view.buttons['pause'].command = self.command_pause
+        self.view.buttons['dump'].command = self.command_dump
         self.view.buttons['directory_data'].command = self.command_directory_data
         self.view.buttons['directory_backup'].command = self.command_directory_backup
         self.view.buttons['open_data'].command = self.command_open_data
@@ -146,6 +192,18 @@ class Controller(mvc.ControllerOld):
         settings['auto_save'] = self.view.checkboxes['auto_save'].variable.get()
         settings['file_append'] = self.view.checkboxes['file_append'].variable.get()
         settings['file_overwrite'] = self.view.checkboxes['file_overwrite'].variable.get()
+        settings['timestamp'] = self.view.checkboxes['timestamp'].variable.get()
+        settings['binary'] = self.view.checkboxes['binary'].variable.get()
+        settings['backup_size'] = self.view.entries['backup_size'].get()
+        settings['backup_minutes'] = self.view.entries['backup_minutes'].get()
+        settings['backup_retention'] = self.view.entries['backup_retention'].get()
+        settings['backup_compress'] = self.view.checkboxes['backup_compress'].variable.get()
+        settings['journal'] = self.view.checkboxes['journal'].variable.get()
+        settings['database'] = self.view.checkboxes['database'].variable.get()
+        settings['pyramid'] = self.view.checkboxes['pyramid'].variable.get()
+        settings['blackbox'] = self.view.checkboxes['blackbox'].variable.get()
+        settings['blackbox_minutes'] = self.view.entries['blackbox_minutes'].get()
+        settings['blackbox_size'] = self.view.entries['blackbox_size'].get()
 
     def update_view(self):
         settings = self.model.settings
@@ -155,6 +213,18 @@ class Controller(mvc.ControllerOld):
         self.view.checkboxes['auto_save'].variable.set(settings['auto_save'])
         self.view.checkboxes['file_append'].variable.set(settings['file_append'])
         self.view.checkboxes['file_overwrite'].variable.set(settings['file_overwrite'])
+        self.view.checkboxes['timestamp'].variable.set(settings['timestamp'])
+        self.view.checkboxes['binary'].variable.set(settings['binary'])
+        self.view.entries['backup_size'].variable.set(settings['backup_size'])
+        self.view.entries['backup_minutes'].variable.set(settings['backup_minutes'])
+        self.view.entries['backup_retention'].variable.set(settings['backup_retention'])
+        self.view.checkboxes['backup_compress'].variable.set(settings['backup_compress'])
+        self.view.checkboxes['journal'].variable.set(settings['journal'])
+        self.view.checkboxes['database'].variable.set(settings['database'])
+        self.view.checkboxes['pyramid'].variable.set(settings['pyramid'])
+        self.view.checkboxes['blackbox'].variable.set(settings['blackbox'])
+        self.view.entries['blackbox_minutes'].variable.set(settings['blackbox_minutes'])
+        self.view.entries['blackbox_size'].variable.set(settings['blackbox_size'])
 
     def update_status_loop(self):
         status = ''
@@ -165,6 +235,18 @@ class Controller(mvc.ControllerOld):
             return
         self.update_status(status[:-1])
 
+    def update_buffers_loop(self):
+        statistics = self.interface.storage_interface.statistics
+        if len(statistics) > 0:
+            memory = statistics['memory'] / 1e6
+            latency = statistics['write_latency'] * 1000
+            latency_max = statistics['write_latency_max'] * 1000
+            self.view.labels['buffers'].set(
+                f'Buffered samples: {statistics["buffered"]} ({memory:.1f} MB)\n'
+                f'Write queue: {statistics["write_queue"]}, '
+                f'write latency: {latency:.1f} ms (max {latency_max:.1f} ms)')
+        self.view.frame.after(1000, self.update_buffers_loop)
+
     def update_status(self, text):
         self.view.labels['status'].set(text)
 
@@ -205,6 +287,73 @@ class Controller(mvc.ControllerOld):
             command = 'auto_save disable'
         self.queue_command.put(command)
 
+        state_timestamp = self.view.checkboxes['timestamp'].get()
+        if state_timestamp is True:
+            command = 'timestamp enable'
+        else:
+            command = 'timestamp disable'
+        self.queue_command.put(command)
+
+        state_binary = self.view.checkboxes['binary'].get()
+        if state_binary is True:
+            command = 'format float64'
+        else:
+            command = 'format csv'
+        self.queue_command.put(command)
+
+        backup_size = self.view.entries['backup_size'].get()
+        backup_minutes = self.view.entries['backup_minutes'].get()
+        self.queue_command.put(f'backup_rotation {backup_size} {backup_minutes}')
+
+        backup_retention = self.view.entries['backup_retention'].get()
+        self.queue_command.put('backup_retention ' + backup_retention)
+
+        state_backup_compress = self.view.checkboxes['backup_compress'].get()
+        if state_backup_compress is True:
+            command = 'backup_compression gzip'
+        else:
+            command = 'backup_compression none'
+        self.queue_command.put(command)
+
+        state_journal = self.view.checkboxes['journal'].get()
+        if state_journal is True:
+            settings = self.model.settings
+            command = f'journal enable {settings["journal_interval"]} {settings["journal_size"]}'
+        else:
+            command = 'journal disable'
+        self.queue_command.put(command)
+
+        state_database = self.view.checkboxes['database'].get()
+        if state_database is True:
+            command = 'database enable'
+        else:
+            command = 'database disable'
+        self.queue_command.put(command)
+
+        state_pyramid = self.view.checkboxes['pyramid'].get()
+        if state_pyramid is True:
+            command = 'pyramid enable'
+        else:
+            command = 'pyramid disable'
+        self.queue_command.put(command)
+
+        state_blackbox = self.view.checkboxes['blackbox'].get()
+        if state_blackbox is True:
+            blackbox_minutes = self.view.entries['blackbox_minutes'].get()
+            blackbox_size = self.view.entries['blackbox_size'].get()
+            command = f'blackbox enable {blackbox_minutes} {blackbox_size}'
+        else:
+            command = 'blackbox disable'
+        self.queue_command.put(command)
+
+        # The trigger is written as channel, above or below and level, like 0 above 2.5
+        trigger = str(self.model.settings['trigger']).strip()
+        if trigger != '':
+            command = f'trigger {trigger} {self.model.settings["blackbox_after"]}'
+        else:
+            command = 'trigger disable'
+        self.queue_command.put(command)
+
         self.update_status_loop()
         self.view.frame.winfo_toplevel().event_generate('<<UpdateRecorder>>')
 
@@ -233,6 +382,11 @@ class Controller(mvc.ControllerOld):
         self.update_status_loop()
         self.queue_command.put('recorder start')
 
+    def command_dump(self):
+        self.update_status('Waiting for response...')
+        self.update_status_loop()
+        self.queue_command.put(f'recorder dump {self.model.settings["blackbox_after"]}')
+
     def command_pause(self):
         self.update_status('Waiting for response...')
         self.update_status_loop()
@@ -0,0 +1,268 @@
+import json
+import os
+import time
+from typing import List, Dict
+
+import numpy as np
+
+PYRAMID_EXTENSION = '.lod'
+PYRAMID_HEADER = 'pyramid.json'
+PYRAMID_FACTORS = (16, 256, 4096, 65536, 1048576)
+PYRAMID_FLUSH_INTERVAL = 1.0
+
+
+def pyramid_path(file_path):
+    """
+    Gets the folder of the pyramid which belongs to a recording.
+
+    :param file_path: Path of the recording
+    :return: Path of the pyramid folder
+    """
+    return os.path.splitext(file_path)[0] + PYRAMID_EXTENSION
+
+
+def reduce_groups(rows: np.ndarray, starts: np.ndarray, counts: np.ndarray, channels: int):
+    """
+    Combines groups of rows into single buckets. The rows are either
+    samples or buckets of the level below.
+
+    :param rows: Array with shape (groups, size, columns), samples have
+        channels columns and buckets 4 * channels columns with min, max,
+        mean and the amount of values which are not NaN
+    :param starts: First sample of every group
+    :param counts: Amount of samples of every row, shape (groups, size)
+    :param channels: Amount of channels
+    :return: Array with shape (groups, 2 + 4 * channels)
+    """
+    if rows.shape[2] == channels:
+        minimum = maximum = mean = rows
+        valid = ~np.isnan(rows)
+    else:
+        minimum = rows[:, :, :channels]
+        maximum = rows[:, :, channels:2 * channels]
+        mean = rows[:, :, 2 * channels:3 * channels]
+        valid = rows[:, :, 3 * channels:]
+    total = valid.sum(axis=1)
+    sums = np.where(valid > 0, mean * valid, 0.0).sum(axis=1)
+    buckets = np.empty((len(rows), 2 + 4 * channels))
+    buckets[:, 0] = starts
+    buckets[:, 1] = counts.sum(axis=1)
+    buckets[:, 2:2 + channels] = np.fmin.reduce(minimum, axis=1)
+    buckets[:, 2 + channels:2 + 2 * channels] = np.fmax.reduce(maximum, axis=1)
+    buckets[:, 2 + 2 * channels:2 + 3 * channels] = np.nan
+    np.divide(sums, total, out=buckets[:, 2 + 2 * channels:2 + 3 * channels], where=total > 0)
+    buckets[:, 2 + 3 * channels:] = total
+    return buckets
+
+
+class PyramidWriter:
+    """
+    Downsampled levels of a recording, which are updated with every
+    write. Every level holds buckets of factor samples with the first
+    sample, the amount of samples and the min, max, mean and amount of
+    values which are not NaN of every channel. A level is computed from the level below, so every sample
+    is only touched once. The first sample is the sample of the recording
+    at which the pyramid started, so the buckets use the sample numbers
+    of the recording.
+    """
+    pending: List[np.ndarray]
+
+    def __init__(self, folder, channels, names: List[str] = (), factors=PYRAMID_FACTORS, start=0,
+                 flush_interval=PYRAMID_FLUSH_INTERVAL):
+        """
+        :param folder: Path of the pyramid folder, an existing pyramid is appended
+        :param channels: Amount of channels
+        :param names: Names of the channels
+        :param factors: Samples per bucket of every level, every factor
+            has to be a multiple of the previous factor
+        :param start: Samples which are already in the recording
+        :param flush_interval: Seconds between the updates of the header
+        :raises ValueError: When an existing pyramid does not end at start
+        """
+        self.folder = folder
+        self.file_path = folder
+        header_path = os.path.join(folder, PYRAMID_HEADER)
+        if os.path.exists(header_path):
+            with open(header_path) as header_file:
+                self.header = json.load(header_file)
+            if self.header['samples'] != start:
+                raise ValueError(f'The pyramid has {self.header["samples"]} samples, the recording {start}')
+        else:
+            self.header = {'channels': channels, 'names': list(names), 'factors': list(factors),
+                           'start': start, 'samples': start}
+        os.makedirs(folder, exist_ok=True)
+        self.flush_interval = flush_interval
+        self.flush_time = time.monotonic()
+        self.flushed = None
+        self.channels = self.header['channels']
+        self.factors = self.header['factors']
+        self.ratios = [self.factors[0]] + [b // a for a, b in zip(self.factors, self.factors[1:])]
+        width = 2 + 4 * self.channels
+        self.pending = [np.empty((0, self.channels))] + [np.empty((0, width)) for _ in self.factors[1:]]
+        self.files = [open(os.path.join(folder, f'{factor}.bin'), 'ab') for factor in self.factors]
+
+    @property
+    def samples(self):
+        return self.header['samples']
+
+    def write(self, data):
+        """
+        Adds samples and writes the buckets which are complete.
+
+        :param data: Array with shape (rows, channels)
+        """
+        block = np.asarray(data, dtype=np.float64)
+        if len(block) == 0:
+            return
+        rows, width = block.shape
+        if width != self.channels:
+            fitted = np.full((rows, self.channels), np.nan)
+            fitted[:, :min(width, self.channels)] = block[:, :self.channels]
+            block = fitted
+        self.header['samples'] += rows
+        self.update_levels(block, False)
+
+    def update_levels(self, block: np.ndarray, complete: bool):
+        # With complete the last buckets are written even when they are not full
+        first = self.samples - len(self.pending[0]) - len(block)
+        rows = np.concatenate((self.pending[0], block))
+        counts = np.ones(len(rows))
+        starts = first + np.arange(len(rows), dtype=np.float64)
+        values = rows
+        for level, ratio in enumerate(self.ratios):
+            if level > 0:
+                rows = np.concatenate((self.pending[level], rows))
+                starts, counts, values = rows[:, 0], rows[:, 1], rows[:, 2:]
+            groups = len(rows) // ratio
+            full = groups * ratio
+            buckets = reduce_groups(values[:full].reshape(groups, ratio, values.shape[1]),
+                                    starts[:full:ratio], counts[:full].reshape(groups, ratio), self.channels)
+            self.pending[level] = rows[full:]
+            if complete and full < len(rows):
+                last = reduce_groups(values[None, full:], starts[full:full + 1], counts[None, full:], self.channels)
+                buckets = np.concatenate((buckets, last))
+                self.pending[level] = self.pending[level][:0]
+            self.files[level].write(buckets.tobytes())
+            rows = buckets
+
+    def update(self):
+        # Runs with the updates of the streams, so the header follows the recording
+        if self.samples == self.flushed or time.monotonic() - self.flush_time < self.flush_interval:
+            return
+        self.flush()
+
+    def flush(self):
+        self.flush_time = time.monotonic()
+        self.flushed = self.samples
+        for level_file in self.files:
+            level_file.flush()
+        header_path = os.path.join(self.folder, PYRAMID_HEADER)
+        with open(header_path + '.tmp', 'w') as header_file:
+            json.dump(self.header, header_file)
+        os.replace(header_path + '.tmp', header_path)
+
+    def sync(self):
+        self.flush()
+        for level_file in self.files:
+            os.fsync(level_file.fileno())
+
+    def close(self):
+        """
+        Writes the buckets which are not full yet and closes the levels.
+        """
+        self.update_levels(np.empty((0, self.channels)), True)
+        self.flush()
+        for level_file in self.files:
+            level_file.close()
+
+
+class PyramidReader:
+    """
+    Memory mapped levels of a pyramid. Only the buckets of the requested
+    range are read from disk.
+    """
+    levels: Dict[int, np.ndarray]
+
+    def __init__(self, folder):
+        with open(os.path.join(folder, PYRAMID_HEADER)) as header_file:
+            self.header = json.load(header_file)
+        self.channels = self.header['channels']
+        self.names = self.header['names']
+        self.start = self.header.get('start', 0)
+        self.samples = self.header['samples']
+        width = 2 + 4 * self.channels
+        self.levels = {}
+        for factor in self.header['factors']:
+            file_path = os.path.join(folder, f'{factor}.bin')
+            rows = os.path.getsize(file_path) // (width * 8)
+            if rows == 0:
+                self.levels[factor] = np.empty((0, width))
+            else:
+                self.levels[factor] = np.memmap(file_path, np.float64, 'r', shape=(rows, width))
+
+    def level(self, start, stop, width):
+        """
+        Gets the coarsest level which still has a bucket for every pixel.
+
+        :param start: First sample
+        :param stop: Sample after the last sample
+        :param width: Amount of pixels
+        :return: Factor of the level, None when the samples themselves
+            are needed
+        """
+        factors = [factor for factor in self.levels if (stop - start) / factor >= width]
+        return max(factors, default=None)
+
+    def read(self, start=None, stop=None, width=1000):
+        """
+        Gets the buckets of a range of samples at the level which fits
+        the amount of pixels.
+
+        :param start: First sample, by default the start of the pyramid
+        :param stop: Sample after the last sample, by default the end
+        :param width: Amount of pixels
+        :return: Dictionary with factor, start, count, min, max, mean
+            and valid, None when the range needs the samples themselves
+        """
+        if start is None:
+            start = self.start
+        if stop is None:
+            stop = self.samples
+        factor = self.level(start, stop, width)
+        if factor is None:
+            return None
+        buckets = self.levels[factor]
+        first = max(np.searchsorted(buckets[:, 0], start, 'right') - 1, 0)
+        last = np.searchsorted(buckets[:, 0], stop, 'left')
+        buckets = np.array(buckets[first:last])
+        channels = self.channels
+        return {
+            'factor': factor,
+            'start': buckets[:, 0].astype(np.int64),
+            'count': buckets[:, 1].astype(np.int64),
+            'min': buckets[:, 2:2 + channels],
+            'max': buckets[:, 2 + channels:2 + 2 * channels],
+            'mean': buckets[:, 2 + 2 * channels:2 + 3 * channels],
+            'valid': buckets[:, 2 + 3 * channels:].astype(np.int64),
+        }
+
+    def read_time(self, start, stop, width=1000, column=0):
+        """
+        Like read, but the range is given in the unit of a time channel.
+
+        :param start: First time
+        :param stop: Last time
+        :param width: Amount of pixels
+        :param column: Channel with the increasing timestamps
+        :return: Dictionary like read
+        """
+        # The finest level which exists gives the sample of a time
+        for buckets in self.levels.values():
+            if len(buckets) == 0:
+                continue
+            times = buckets[:, 2 + column]
+            index = np.searchsorted(times, [start, stop], 'right') - 1
+            first = int(buckets[max(index[0], 0), 0])
+            last = int(buckets[index[1], 0] + buckets[index[1], 1]) if index[1] >= 0 else 0
+            return self.read(first, last, width)
+        return None
@@ -0,0 +1,294 @@
+import json
+import os
+import time
+from typing import List
+
+import numpy as np
+
+from . import files
+
+COLUMN_EXTENSION = '.col'
+COLUMN_MAGIC = b'SERIALPLOTTER-COLUMNS\n'
+COLUMN_HEADER_SIZE = 4096
+COLUMN_CHUNK = 4096
+COLUMN_DTYPES = {'float64': '<f8', 'float32': '<f4'}
+
+
+def read_header(file_path):
+    """
+    Reads the header of a column file.
+
+    :param file_path: Path of the file
+    :return: Dictionary with version, dtype, channels, names, chunk and samples
+    """
+    with open(file_path, 'rb') as column_file:
+        header = column_file.read(COLUMN_HEADER_SIZE)
+    if not header.startswith(COLUMN_MAGIC) or len(header) < COLUMN_HEADER_SIZE:
+        raise ValueError(f'{file_path} is not a column file')
+    return json.loads(header[len(COLUMN_MAGIC):].rstrip(b' \n'))
+
+
+class ColumnWriter:
+    """
+    Append-only file which stores samples in chunks of COLUMN_CHUNK rows.
+    Inside a chunk every channel is a contiguous column. The header in
+    front of the chunks holds the channel names, the dtype and the amount
+    of samples, which is updated after the samples are on disk.
+
+    The writer has the same methods as files.CsvStream, so the storage
+    can use either of them.
+    """
+
+    def __init__(self, file_path, names: List[str] = (), channels=0, dtype='float64',
+                 chunk=COLUMN_CHUNK, flush_interval=files.CSV_FLUSH_INTERVAL):
+        """
+        :param file_path: Path of the file, an existing file is appended
+        :param names: Names of the channels
+        :param channels: Amount of channels, at least the amount of names
+        :param dtype: Either 'float64' or 'float32'
+        :param chunk: Rows per chunk
+        :param flush_interval: Seconds between writes of the last chunk
+        """
+        if dtype not in COLUMN_DTYPES:
+            raise ValueError(f'Unknown dtype {dtype}')
+        self.file_path = file_path
+        self.flush_interval = flush_interval
+        self.flush_time = time.monotonic()
+        self.truncated = 0
+        if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
+            self.header = read_header(file_path)
+            self.file = open(file_path, 'r+b')
+        else:
+            self.header = {
+                'version': 1,
+                'dtype': COLUMN_DTYPES[dtype],
+                'channels': max(channels, len(names)),
+                'names': list(names),
+                'chunk': chunk,
+                'samples': 0,
+            }
+            self.file = open(file_path, 'w+b')
+            self.write_header()
+        self.dtype = np.dtype(self.header['dtype'])
+        self.chunk = self.header['chunk']
+        self.buffer = np.full((self.header['channels'], self.chunk), np.nan, self.dtype)
+        self.rows = self.header['samples'] % self.chunk
+        if self.rows > 0:
+            # The last chunk is not full, so it is read back and rewritten
+            self.file.seek(self.chunk_offset())
+            self.buffer[:] = np.fromfile(self.file, self.dtype, self.buffer.size).reshape(self.buffer.shape)
+        self.pending = False
+
+    @property
+    def channels(self):
+        return self.header['channels']
+
+    @property
+    def samples(self):
+        return self.header['samples']
+
+    @property
+    def size(self):
+        if self.rows == 0:
+            return self.chunk_offset()
+        return self.chunk_offset() + self.buffer.nbytes
+
+    def chunk_offset(self):
+        return COLUMN_HEADER_SIZE + self.header['samples'] // self.chunk * self.buffer.nbytes
+
+    def write_header(self):
+        text = COLUMN_MAGIC + json.dumps(self.header).encode()
+        if len(text) >= COLUMN_HEADER_SIZE:
+            raise ValueError('Too many channel names for the header')
+        self.file.seek(0)
+        self.file.write(text.ljust(COLUMN_HEADER_SIZE - 1) + b'\n')
+
+    def write(self, data):
+        """
+        Adds rows of values. Missing values become NaN and values of
+        channels above the file channels are counted as truncated.
+
+        :param data: Array with shape (rows, channels) or list of rows
+        """
+        if len(data) == 0:
+            return
+        if not isinstance(data, np.ndarray):
+            width = max(len(row) for row in data)
+            data = [row + [np.nan] * (width - len(row)) for row in data]
+        block = np.asarray(data, dtype=np.float64)
+        rows, width = block.shape
+        if width > self.channels:
+            self.truncated += rows * (width - self.channels)
+            block = block[:, :self.channels]
+            width = self.channels
+        start = 0
+        while start < rows:
+            count = min(rows - start, self.chunk - self.rows)
+            self.buffer[:width, self.rows:self.rows + count] = block[start:start + count].T
+            self.rows += count
+            start += count
+            self.pending = True
+            if self.rows == self.chunk:
+                self.write_chunk()
+        self.update()
+
+    def write_chunk(self):
+        # Samples are counted in the header only after they are written
+        self.file.seek(self.chunk_offset())
+        self.file.write(self.buffer.tobytes())
+        self.header['samples'] += self.rows - self.header['samples'] % self.chunk
+        if self.rows == self.chunk:
+            self.buffer[:] = np.nan
+            self.rows = 0
+        self.write_header()
+        self.pending = False
+
+    def update(self):
+        if not self.pending:
+            return
+        if time.monotonic() - self.flush_time < self.flush_interval:
+            return
+        self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.write_chunk()
+        self.file.flush()
+        self.flush_time = time.monotonic()
+
+    def sync(self):
+        self.flush()
+        os.fsync(self.file.fileno())
+
+    def truncate(self, samples):
+        """
+        Removes the samples behind the desired amount of samples.
+
+        :param samples: Amount of samples which are kept
+        """
+        self.header['samples'] = samples
+        self.rows = samples % self.chunk
+        self.buffer[:] = np.nan
+        if self.rows > 0:
+            self.file.seek(self.chunk_offset())
+            values = np.fromfile(self.file, self.dtype, self.buffer.size).reshape(self.buffer.shape)
+            self.buffer[:, :self.rows] = values[:, :self.rows]
+            self.pending = True
+        self.file.truncate(self.chunk_offset())
+        self.write_header()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class ColumnReader:
+    """
+    Memory mapped view of a column file. Opening does not read the
+    samples, only the parts which are accessed are loaded from disk.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.header = header = read_header(file_path)
+        self.names: List[str] = header['names']
+        self.channels = header['channels']
+        self.chunk = header['chunk']
+        self.samples = header['samples']
+        chunks = -(-self.samples // self.chunk)
+        if chunks == 0:
+            self.chunks = np.empty((0, self.channels, self.chunk), header['dtype'])
+        else:
+            self.chunks = np.memmap(file_path, header['dtype'], 'r', COLUMN_HEADER_SIZE,
+                                    (chunks, self.channels, self.chunk))
+
+    def __len__(self):
+        return self.samples
+
+    def index(self, channel):
+        """
+        Gets the index of a channel.
+
+        :param channel: Name or index of the channel
+        :return: Index of the channel
+        """
+        if isinstance(channel, str):
+            return self.names.index(channel)
+        return channel
+
+    def column(self, channel, start=0, stop=None):
+        """
+        Gets the samples of a single channel. A range inside one chunk
+        is a view of the file, other ranges are copied.
+
+        :param channel: Name or index of the channel
+        :param start: First sample
+        :param stop: Sample after the last sample, by default the end
+        :return: Array with the samples
+        """
+        index = self.index(channel)
+        start, stop, _ = slice(start, stop).indices(self.samples)
+        if stop <= start:
+            return np.empty(0, self.chunks.dtype)
+        first, last = start // self.chunk, (stop - 1) // self.chunk
+        if first == last:
+            offset = first * self.chunk
+            return self.chunks[first, index, start - offset:stop - offset]
+        return self.chunks[first:last + 1, index].reshape(-1)[start - first * self.chunk:stop - first * self.chunk]
+
+    def read(self, start=0, stop=None):
+        """
+        Gets the samples of all channels.
+
+        :param start: First sample
+        :param stop: Sample after the last sample, by default the end
+        :return: Array with shape (rows, channels)
+        """
+        start, stop, _ = slice(start, stop).indices(self.samples)
+        stop = max(start, stop)
+        first, last = start // self.chunk, -(-stop // self.chunk)
+        block = self.chunks[first:last].transpose(0, 2, 1).reshape(-1, self.channels)
+        return np.array(block[start - first * self.chunk:stop - first * self.chunk], np.float64)
+
+    def close(self):
+        del self.chunks
+
+
+def csv_to_columns(csv_path, column_path, names: List[str] = (), dtype='float64'):
+    """
+    Converts a CSV file with the files.CSV_DELIMITER and files.CSV_DECIMAL
+    settings into a column file. The channels are taken from the first rows.
+
+    :param csv_path: Path of the CSV file
+    :param column_path: Path of the new column file
+    :param names: Names of the channels
+    :param dtype: Either 'float64' or 'float32'
+    :return: Amount of values which did not fit in the channels
+    """
+    if os.path.exists(column_path):
+        os.remove(column_path)
+    writer = None
+    for block in files.csv_reader(csv_path):
+        if writer is None:
+            writer = ColumnWriter(column_path, names, block.shape[1], dtype)
+        writer.write(block)
+    if writer is None:
+        writer = ColumnWriter(column_path, names, len(names), dtype)
+    writer.close()
+    return writer.truncated
+
+
+def columns_to_csv(column_path, csv_path, rows=65536):
+    """
+    Converts a column file into a CSV file with the files.CSV_DELIMITER
+    and files.CSV_DECIMAL settings.
+
+    :param column_path: Path of the column file
+    :param csv_path: Path of the new CSV file
+    :param rows: Rows per write
+    """
+    reader = ColumnReader(column_path)
+    with open(csv_path, 'w', newline='') as csv_file:
+        for start in range(0, len(reader), rows):
+            csv_file.write(files.csv_format(reader.read(start, start + rows)))
+    reader.close()
@@ -0,0 +1,246 @@
+import os
+import time
+
+import numpy as np
+
+from . import files, recording
+
+REPLAY_ROWS = 65536
+REPLAY_BATCH = 4096
+REPLAY_RATE = 1000.0
+REPLAY_CHUNK = 1 << 20
+SEPARATORS = {
+    'comma': ',',
+    'dot': '.',
+    'semicolon': ';',
+    'colon': ':',
+    'tab': '\t',
+}
+
+
+def recording_path(file_path):
+    """
+    Prefers the binary column file of a recording when it exists next
+    to the CSV file.
+
+    :param file_path: Path of the recording
+    :return: Path of the file which is loaded
+    """
+    binary_path = os.path.splitext(file_path)[0] + recording.COLUMN_EXTENSION
+    if os.path.exists(binary_path):
+        return binary_path
+    return file_path
+
+
+def csv_chunks(file_path, rows=REPLAY_ROWS, delimiter=None, decimal=None):
+    """
+    Reads a CSV file in blocks of rows, like files.csv_reader but with
+    the progress of every block.
+
+    :param file_path: Path of the file
+    :param rows: Largest amount of rows per block
+    :param delimiter: Delimiter of the fields, by default the one of the files module
+    :param decimal: Decimal separator, by default the one of the files module
+    :return: Generator of (block, progress), progress goes up to 1.0
+    """
+    size = max(os.path.getsize(file_path), 1)
+    position = 0
+    rest = b''
+    lines = []
+    with open(file_path, 'rb') as csv_file:
+        while True:
+            chunk = csv_file.read(REPLAY_CHUNK)
+            position += len(chunk)
+            if len(chunk) > 0:
+                *complete, rest = (rest + chunk).split(b'\n')
+            else:
+                complete, rest = [rest], b''
+            lines.extend(line for line in (line.decode().rstrip('\r') for line in complete) if line != '')
+            while len(lines) >= rows or (len(chunk) == 0 and len(lines) > 0):
+                block, lines = files.csv_parse(lines[:rows], delimiter, decimal), lines[rows:]
+                yield block, position / size
+            if len(chunk) == 0:
+                return
+
+
+def column_chunks(file_path, rows=REPLAY_ROWS):
+    reader = recording.ColumnReader(file_path)
+    samples = len(reader)
+    try:
+        for start in range(0, samples, rows):
+            stop = min(start + rows, samples)
+            yield reader.read(start, stop), stop / samples
+    finally:
+        reader.close()
+
+
+def load_chunks(file_path, rows=REPLAY_ROWS, delimiter=None, decimal=None):
+    """
+    Reads a recording in blocks of rows. CSV files use the delimiter and
+    decimal of the files module unless they are given, column files are
+    memory mapped.
+
+    :param file_path: Path of the recording
+    :param rows: Largest amount of rows per block
+    :param delimiter: Delimiter of a CSV file
+    :param decimal: Decimal separator of a CSV file
+    :return: Generator of (block, progress), progress goes up to 1.0
+    """
+    if file_path.endswith(recording.COLUMN_EXTENSION):
+        return column_chunks(file_path, rows)
+    return csv_chunks(file_path, rows, delimiter, decimal)
+
+
+def load_recording(file_path, progress=None, rows=REPLAY_ROWS, delimiter=None, decimal=None):
+    """
+    Reads a whole recording into one array.
+
+    :param file_path: Path of the recording
+    :param progress: Function which receives the progress from 0.0 to 1.0
+    :param rows: Amount of rows which are read at once
+    :param delimiter: Delimiter of a CSV file
+    :param decimal: Decimal separator of a CSV file
+    :return: Array with shape (samples, channels)
+    """
+    blocks = []
+    for block, fraction in load_chunks(file_path, rows, delimiter, decimal):
+        blocks.append(block)
+        if progress is not None:
+            progress(fraction)
+    if len(blocks) == 0:
+        return np.empty((0, 0))
+    width = max(block.shape[1] for block in blocks)
+    if all(block.shape[1] == width for block in blocks):
+        return np.concatenate(blocks)
+    data = np.full((sum(len(block) for block in blocks), width), np.nan)
+    row = 0
+    for block in blocks:
+        data[row:row + len(block), :block.shape[1]] = block
+        row += len(block)
+    return data
+
+
+def has_timestamps(file_path, block: np.ndarray):
+    """
+    Checks if the first column of a recording holds the Unix time which
+    the recorder adds in front of the values.
+
+    :param file_path: Path of the recording
+    :param block: First block of the recording
+    :return: True when the first column are timestamps
+    """
+    if file_path.endswith(recording.COLUMN_EXTENSION):
+        return recording.read_header(file_path)['names'][:1] == ['Time']
+    if block.shape[1] < 2 or len(block) == 0:
+        return False
+    times = block[:, 0]
+    return bool(times[0] > 1e9 and np.all(np.diff(times) >= 0))
+
+
+class Replayer:
+    """
+    Plays a recording back as blocks of samples with timestamps, like
+    the samples of a device. The speed is a multiple of the recorded
+    time, 0 replays as fast as the blocks are taken. Recordings without
+    timestamps are replayed at rate samples per second.
+    """
+
+    def __init__(self, file_path, speed=1.0, rate=REPLAY_RATE, batch=REPLAY_BATCH, delimiter=None, decimal=None):
+        """
+        :param file_path: Path of the recording, a column file next to a
+            CSV file is preferred
+        :param speed: Multiple of the recorded time, 0 is maximum speed
+        :param rate: Samples per second of recordings without timestamps
+        :param batch: Largest amount of samples per block at maximum speed
+        :param delimiter: Delimiter of a CSV recording
+        :param decimal: Decimal separator of a CSV recording
+        """
+        self.file_path = recording_path(file_path)
+        self.speed = speed
+        self.rate = rate
+        self.batch = batch
+        self.chunks = load_chunks(self.file_path, delimiter=delimiter, decimal=decimal)
+        self.block = np.empty((0, 0))
+        self.block_times = np.empty(0)
+        self.position = 0
+        self.progress = 0.0
+        self.samples = 0
+        self.is_done = False
+        self.is_timestamp = None
+        self.time_first = None
+        self.time_start = time.monotonic_ns()
+        self.time_previous = self.time_start
+
+    def load(self):
+        # Takes the next block of the file, False at the end of the file
+        try:
+            block, self.progress = next(self.chunks)
+        except StopIteration:
+            self.is_done = True
+            return False
+        if self.is_timestamp is None:
+            self.is_timestamp = has_timestamps(self.file_path, block)
+        if self.is_timestamp:
+            seconds, block = block[:, 0], block[:, 1:]
+        else:
+            seconds = (self.samples + np.arange(len(block))) / self.rate
+        if self.time_first is None and len(seconds) > 0:
+            self.time_first = seconds[0]
+        self.block = np.ascontiguousarray(block)
+        self.block_times = seconds - self.time_first
+        self.position = 0
+        return True
+
+    def elapsed(self):
+        # Recorded seconds which are due at this moment
+        return (time.monotonic_ns() - self.time_start) / 1e9 * self.speed
+
+    def next_due(self):
+        """
+        Gets the seconds until the next sample is due.
+
+        :return: Seconds, 0 when a sample is due
+        """
+        if self.speed <= 0 or self.is_done:
+            return 0.0
+        if self.position >= len(self.block):
+            return 0.0
+        return max(self.block_times[self.position] - self.elapsed(), 0.0) / self.speed
+
+    def read(self):
+        """
+        Takes the samples which are due.
+
+        :return: List of (times, block), times are monotonic nanoseconds
+            like the timestamps of a device
+        """
+        frames = []
+        while not self.is_done:
+            if self.position >= len(self.block) and not self.load():
+                break
+            if self.speed <= 0:
+                stop = min(self.position + self.batch, len(self.block))
+            else:
+                stop = int(np.searchsorted(self.block_times, self.elapsed(), 'right'))
+            if stop <= self.position:
+                break
+            block = self.block[self.position:stop]
+            if self.speed <= 0:
+                # Spread like the samples of a device which arrived since the previous block
+                now = time.monotonic_ns()
+                steps = np.arange(1, len(block) + 1, dtype=np.int64)
+                times = self.time_previous + (now - self.time_previous) * steps // len(block)
+                self.time_previous = now
+            else:
+                seconds = self.block_times[self.position:stop] / self.speed
+                times = self.time_start + (seconds * 1e9).astype(np.int64)
+            frames.append((times, block))
+            self.samples += len(block)
+            self.position = stop
+            if self.speed <= 0:
+                break
+        return frames
+
+    def close(self):
+        self.chunks.close()
+        self.is_done = True
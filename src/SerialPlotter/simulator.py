@@ -0,0 +1,162 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+WAVEFORMS = ('sine', 'noise', 'steps')
+
+
+def parse_options(name: str):
+    """
+    Reads the simulator options from a device name like
+    'debug:rate=1000,channels=4,waveform=noise'.
+
+    :param name: Device name
+    :return: Dictionary with keyword arguments for DeviceSimulator
+    """
+    options = {}
+    _, _, text = name.partition(':')
+    for option in text.split(','):
+        if option == '':
+            continue
+        key, _, value = option.partition('=')
+        if key in ('rate', 'messages', 'amplitude'):
+            options[key] = float(value)
+        elif key in ('channels', 'chunk', 'seed'):
+            options[key] = int(value)
+        elif key == 'waveform':
+            options[key] = value
+        else:
+            raise ValueError(f'Unknown simulator option {key}')
+    return options
+
+
+class DeviceSimulator:
+    """
+    Generates the bytes of a device which prints its samples as text
+    lines, in real time and with the configured rate and shape.
+    """
+
+    def __init__(self, rate=1000.0, channels=3, waveform='sine', messages=0.0,
+                 chunk=0, amplitude=50.0, seed=None):
+        """
+        :param rate: Samples per second
+        :param channels: Values per line
+        :param waveform: Shape of the values, sine, noise or steps
+        :param messages: Part of the lines which are text messages
+        :param chunk: Largest amount of bytes per read, 0 is unlimited
+        :param amplitude: Amplitude of the values
+        :param seed: Seed of the random generator
+        """
+        if waveform not in WAVEFORMS:
+            raise ValueError(f'Unknown waveform {waveform}')
+        self.rate = rate
+        self.channels = channels
+        self.waveform = waveform
+        self.messages = messages
+        self.chunk = chunk
+        self.amplitude = amplitude
+        self.random = np.random.default_rng(seed)
+        self.line_format = '\t'.join(['%.3f'] * channels) + '\n'
+        self.pending = bytearray()
+        self.samples = 0
+        self.start = None
+
+    def generate(self, count: int):
+        """
+        Creates the next lines of the device.
+
+        :param count: Amount of samples
+        :return: Bytes of the lines
+        """
+        t = (self.samples + np.arange(count)) / self.rate
+        self.samples += count
+        phase = np.arange(self.channels) * 2 * np.pi / max(self.channels, 1)
+        if self.waveform == 'sine':
+            values = np.sin(2 * np.pi * t[:, None] + phase)
+        elif self.waveform == 'noise':
+            values = self.random.standard_normal((count, self.channels))
+        else:
+            values = np.floor(t[:, None] + phase) % 4 - 1.5
+        values *= self.amplitude
+        lines = (self.line_format * count % tuple(values.ravel().tolist())).splitlines(keepends=True)
+        if self.messages > 0:
+            for index in np.flatnonzero(self.random.random(count) < self.messages).tolist():
+                lines[index] = f'Message: sample {self.samples - count + index}\n'
+        return ''.join(lines).encode()
+
+    def update(self):
+        # Generates the samples which are due since the start
+        now = time.perf_counter()
+        if self.start is None:
+            self.start = now
+        due = int((now - self.start) * self.rate) - self.samples
+        if due > 0:
+            self.pending += self.generate(due)
+
+    def next_due(self):
+        """
+        Gets the time until the next sample is due.
+
+        :return: Time in seconds
+        """
+        if self.start is None:
+            return 0.0
+        return max(0.0, self.start + (self.samples + 1) / self.rate - time.perf_counter())
+
+    def available(self):
+        self.update()
+        return len(self.pending)
+
+    def read(self, size: int):
+        """
+        Takes bytes from the generated stream. With a chunk size the
+        reads are cut at random positions, like a real device.
+
+        :param size: Largest amount of bytes
+        :return: Bytes
+        """
+        self.update()
+        if self.chunk > 0:
+            size = min(size, int(self.random.integers(1, self.chunk + 1)))
+        buffer = bytes(self.pending[:size])
+        del self.pending[:size]
+        return buffer
+
+
+class PtySimulator(threading.Thread):
+    """
+    Writes the bytes of a DeviceSimulator into a pseudo terminal, so the
+    simulated device can be opened as a real serial port. Linux only.
+    """
+
+    def __init__(self, simulator: DeviceSimulator):
+        super().__init__(daemon=True, name='Simulator')
+        if not hasattr(os, 'openpty'):
+            raise OSError('Pseudo terminals are not supported on this system')
+        import tty
+        self.simulator = simulator
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.master)
+        tty.setraw(self.slave)
+        self.device = os.ttyname(self.slave)
+        self.is_running = threading.Event()
+
+    def run(self):
+        self.is_running.set()
+        while self.is_running.is_set():
+            time.sleep(max(self.simulator.next_due(), 0.001))
+            size = self.simulator.available()
+            if size == 0:
+                continue
+            try:
+                os.write(self.master, self.simulator.read(size))
+            except OSError:
+                break
+
+    def stop(self):
+        self.is_running.clear()
+        self.join(1)
+        os.close(self.master)
+        os.close(self.slave)
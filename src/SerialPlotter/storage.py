@@ -1,48 +1,479 @@
+import json
+import os
 import queue
+import sqlite3
 import threading
 import time
-from typing import List
+from pathlib import Path
+from typing import List, Dict
 
-from . import files
+import numpy as np
+
+from . import files, recording
+from .backups import BackupRotation, COMPRESSIONS
+from .blackbox import BlackBox, BLACKBOX_FILE
+from .journal import SampleJournal, replay_journal, target_mask
+from .pyramid import PyramidWriter, pyramid_path
+from .buffers import SampleRing, SampleBlock, RingCursor
+
+DATABASE_NAME = 'recordings.sqlite'
 
 
 class StorageInterace:
-    queue_data: queue.Queue
+    cursor_data: RingCursor
     queue_status: queue.Queue
     queue_command: queue.Queue
+    statistics: Dict[str, int]
 
     def __init__(self):
-        self.queue_data = queue.Queue()
+        self.cursor_data = SampleRing(1).subscribe('storage')
+        self.statistics = {}
         self.queue_status = queue.Queue()
         self.queue_command = queue.Queue()
 
 
+class StorageWriter(threading.Thread):
+    """
+    Thread which does the file writes of the storage in order. The queue
+    of jobs is bounded, so the storage can see when the disk falls
+    behind and stop taking new samples.
+    """
+    jobs: queue.Queue
+
+    def __init__(self, queue_status: queue.Queue, max_jobs=8, name='Writer'):
+        super().__init__(daemon=False, name=name)
+        self.jobs = queue.Queue(max_jobs)
+        self.queue_status = queue_status
+        self.latency = 0.0
+        self.latency_max = 0.0
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            function, args = job
+            start = time.perf_counter()
+            # Any error is reported, so the writer keeps draining the jobs
+            try:
+                function(*args)
+            except Exception as error:
+                self.queue_status.put(f'Could not write data: {error}')
+            latency = time.perf_counter() - start
+            self.latency += (latency - self.latency) * 0.1
+            self.latency_max = max(self.latency_max, latency)
+
+    def submit(self, function, *args):
+        """
+        Adds a job, waits when the queue is full.
+
+        :param function: Function which is called by the writer
+        :param args: Arguments of the function
+        """
+        self.jobs.put((function, args))
+
+    def is_full(self):
+        return self.jobs.full()
+
+    def stop(self):
+        self.jobs.put(None)
+        self.join()
+
+
+class SqliteSink:
+    """
+    SQLite database with the samples of every session. The samples are
+    stored as chunks of rows inside BLOBs, with the timestamps as first
+    column. The chunks have an index on session and start time, so a
+    time range is found without reading the other chunks.
+    """
+
+    def __init__(self, file_path, chunk=1024):
+        """
+        :param file_path: Path of the database
+        :param chunk: Rows per BLOB
+        """
+        self.file_path = file_path
+        self.chunk = chunk
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(file_path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id INTEGER PRIMARY KEY, name TEXT, started REAL, names TEXT);
+            CREATE TABLE IF NOT EXISTS chunks (
+                session INTEGER, start REAL, stop REAL, rows INTEGER, columns INTEGER, data BLOB);
+            CREATE INDEX IF NOT EXISTS chunks_session_start ON chunks (session, start);
+        """)
+        self.session = None
+
+    def start_session(self, name: str, names: List[str] = ()):
+        """
+        Starts a session, the next samples belong to it.
+
+        :param name: Name of the session
+        :param names: Names of the channels
+        :return: Identifier of the session
+        """
+        with self.lock, self.connection:
+            cursor = self.connection.execute('INSERT INTO sessions (name, started, names) VALUES (?, ?, ?)',
+                                             (name, time.time(), json.dumps(list(names))))
+        self.session = cursor.lastrowid
+        return self.session
+
+    def write(self, block: np.ndarray):
+        """
+        Inserts samples in a single transaction.
+
+        :param block: Array with unix times in the first column
+        """
+        rows = []
+        for start in range(0, len(block), self.chunk):
+            part = np.ascontiguousarray(block[start:start + self.chunk], '<f8')
+            rows.append((self.session, part[0, 0], part[-1, 0], part.shape[0], part.shape[1], part.tobytes()))
+        with self.lock, self.connection:
+            self.connection.executemany(
+                'INSERT INTO chunks (session, start, stop, rows, columns, data) VALUES (?, ?, ?, ?, ?, ?)', rows)
+
+    def sessions(self):
+        """
+        Gets the sessions of the database.
+
+        :return: List of (id, name, started)
+        """
+        with self.lock:
+            return self.connection.execute('SELECT id, name, started FROM sessions ORDER BY id').fetchall()
+
+    def query(self, session: int, start=-np.inf, stop=np.inf):
+        """
+        Gets the samples of a session inside a time range.
+
+        :param session: Identifier of the session
+        :param start: First unix time
+        :param stop: Last unix time
+        :return: Array with unix times in the first column
+        """
+        # Chunks start in order, so only the chunk before start can overlap it
+        with self.lock:
+            first = self.connection.execute(
+                'SELECT MAX(start) FROM chunks WHERE session = ? AND start <= ?', (session, start)).fetchone()[0]
+            chunks = self.connection.execute(
+                'SELECT columns, data FROM chunks WHERE session = ? AND start >= ? AND start <= ? ORDER BY start',
+                (session, start if first is None else first, stop)).fetchall()
+        if len(chunks) == 0:
+            return np.empty((0, 0))
+        width = max(columns for columns, _ in chunks)
+        blocks = []
+        for columns, data in chunks:
+            block = np.frombuffer(data, '<f8').reshape(-1, columns)
+            if columns < width:
+                block = np.column_stack((block, np.full((len(block), width - columns), np.nan)))
+            blocks.append(block)
+        block = np.concatenate(blocks)
+        return block[(block[:, 0] >= start) & (block[:, 0] <= stop)]
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
 class StorageHolder:
-    recorder_data: List[List[float]]
-    backup_data: List[List[float]]
+    recorder_data: SampleBlock
+    backup_data: SampleBlock
+    streams: Dict[str, files.CsvStream]
+    channel_names: List[str]
+    blocks: List[SampleBlock]
+    free_blocks: queue.Queue
 
-    def __init__(self):
-        self.backup_data = []
+    def __init__(self, writer: StorageWriter = None, compressor: StorageWriter = None):
+        """
+        :param writer: Thread for the file writes, without a writer the
+            files are written directly
+        :param compressor: Thread which compresses ended backup segments
+        """
+        self.writer = writer
+        self.rotation = BackupRotation(worker=compressor)
+        self.backup_start = None
+        self.backup_stop = None
+        self.blocks = []
+        self.free_blocks = queue.Queue()
+        self.backup_data = self.take_block()
         self.backup_size = 500
-        self.recorder_data = []
+        self.recorder_data = self.take_block()
         self.recorder_size = 500
         self.is_recording = False
         self.is_auto_save = False
+        self.is_timestamp = False
+        self.time_offset = time.time_ns() - time.monotonic_ns()
         self.file_name = 'Unnamed'
+        self.file_format = 'csv'
+        self.channel_names = []
+        self.messages = []
+        self.streams = {}
+        self.stream_meta = {}
+        self.is_pyramid = False
+        self.pyramids = {}
+        self.database = None
+        self.database_data = self.take_block()
+        self.database_size = 1024
+        self.journal = None
+        self.recorder_start = None
+        self.blackbox = None
+        self.trigger = None
+        self.is_trigger_armed = True
+        self.dump_seconds = 60.0
+        self.dump_stop = None
+        self.checkpoint_interval = 5.0
+        self.checkpoint_time = time.monotonic()
 
     def add(self, data):
+        self.add_block(np.array([data], np.float64))
+
+    def add_block(self, block, times=None):
+        values = block
+        if self.database is not None:
+            if times is not None:
+                seconds = (times + self.time_offset) / 1e9
+            else:
+                seconds = np.full(len(block), time.time())
+            self.database_data.append(np.column_stack((seconds, block)))
+        if self.is_timestamp is True and times is not None:
+            # Unix time in seconds in front of the values
+            block = np.column_stack(((times + self.time_offset) / 1e9, block))
+        if times is not None and len(times) > 0:
+            start, stop = (int(times[0]) + self.time_offset) / 1e9, (int(times[-1]) + self.time_offset) / 1e9
+        else:
+            start = stop = time.time()
+        if self.backup_start is None:
+            self.backup_start = start
+        self.backup_stop = stop
+        if self.journal is not None:
+            if self.is_recording is True:
+                self.journal.append_block(block, target_mask('backup', 'recorder'))
+            else:
+                self.journal.append_block(block, target_mask('backup'))
         if self.is_recording is True:
-            self.recorder_data.append(data)
-        self.backup_data.append(data)
+            self.recorder_data.append(block)
+        self.backup_data.append(block)
+        if self.blackbox is not None:
+            self.blackbox.write(values, None if times is None else times + self.time_offset)
+            if self.trigger is not None:
+                self.update_trigger(values)
 
     def update(self):
-        self.update_backup_status()
-        self.update_recorder_status()
+        if self.journal is not None:
+            self.journal.update()
+        # Every step can add jobs, so the writer is checked before each step
+        for update in (self.update_backup_status, self.update_dump_status, self.update_recorder_status,
+                       self.update_database_status, self.update_journal_status):
+            if self.is_busy():
+                return
+            update()
+        if not self.is_busy():
+            self.submit(self.update_streams)
+
+    def enable_blackbox(self, file_path: str = None, minutes=5.0, max_size=64 << 20):
+        """
+        Keeps the newest samples inside a ring file, so a dump can write
+        the samples from before the dump into a recording.
+
+        :param file_path: Path of the ring file, None to stop
+        :param minutes: Minutes which a dump reaches back
+        :param max_size: Bytes of the ring file
+        """
+        if self.blackbox is not None:
+            self.blackbox.close()
+            self.blackbox = None
+        if file_path is None:
+            return
+        self.blackbox = BlackBox(file_path, max_size, minutes)
+        # The ring of the previous session keeps its layout until a wider block arrives
+        self.blackbox.open(len(self.channel_names))
+
+    def update_trigger(self, block: np.ndarray):
+        # The trigger fires once and is armed again when the condition ends
+        is_triggered = self.is_triggered(block)
+        if is_triggered and self.is_trigger_armed and self.dump_stop is None and self.is_recording is False:
+            self.start_dump()
+        self.is_trigger_armed = not is_triggered
+
+    def is_triggered(self, block: np.ndarray):
+        channel, condition, level = self.trigger
+        if channel >= block.shape[1]:
+            return False
+        if condition == 'above':
+            return bool(np.any(block[:, channel] > level))
+        return bool(np.any(block[:, channel] < level))
+
+    def start_dump(self, seconds=None):
+        """
+        Writes the samples of the black box into the recording and keeps
+        recording for seconds, the acquisition continues during the dump.
+
+        :param seconds: Seconds which are recorded after the dump, by
+            default dump_seconds
+        :return: Amount of samples from the black box
+        """
+        times, block = self.blackbox.read()
+        if self.is_timestamp is True:
+            block = np.column_stack((times / 1e9, block))
+        if self.journal is not None:
+            self.journal.append_block(block, target_mask('recorder'))
+        self.recorder_data.append(block)
+        self.is_recording = True
+        self.dump_stop = time.monotonic() + (self.dump_seconds if seconds is None else seconds)
+        return len(block)
+
+    def update_dump_status(self):
+        if self.dump_stop is None or time.monotonic() < self.dump_stop:
+            return
+        self.stop_dump()
+
+    def stop_dump(self):
+        # Ends the recording of the dump and writes its samples
+        self.dump_stop = None
+        self.is_recording = False
+        self.save_recorder_data()
+
+    def update_database_status(self):
+        if len(self.database_data) < self.database_size:
+            return
+        self.save_database_data()
+
+    def save_database_data(self):
+        if self.database is None or len(self.database_data) == 0:
+            return
+        self.submit(self.write_block, self.database_data, self.database)
+        self.database_data = self.take_block()
+
+    def enable_database(self, file_path: str = None):
+        """
+        Starts a new session in the SQLite database, every next sample
+        is also stored inside the database.
+
+        :param file_path: Path of the database, None to stop
+        """
+        self.save_database_data()
+        if self.database is not None:
+            self.submit(self.database.close)
+            self.database = None
+        if file_path is None:
+            return
+        self.database = SqliteSink(file_path)
+        self.submit(self.database.start_session, self.file_name, self.channel_names)
+
+    def update_journal_status(self):
+        if self.journal is None or self.journal.size == 0:
+            return
+        if time.monotonic() - self.checkpoint_time < self.checkpoint_interval:
+            return
+        # The buffered samples are handed to the writer before the checkpoint
+        self.save_backup_data()
+        if self.is_auto_save is True:
+            self.save_recorder_data()
+        self.checkpoint_time = time.monotonic()
+        generation = self.journal.rotate()
+        if len(self.recorder_data) == 0:
+            self.recorder_start = self.journal.position()
+        # A recording which is not saved yet keeps the journal files from its first sample on
+        starts = {'backup': self.journal.position(), 'recorder': self.recorder_start}
+        targets = [(target, stream, dict(self.stream_meta[target])) for target, stream in self.streams.items()]
+        self.submit(self.commit_journal, self.journal, generation, targets, starts)
+
+    @staticmethod
+    def commit_journal(journal: SampleJournal, generation: int, targets, starts):
+        # Runs on the writer after the samples of the generation are written
+        checkpoint = {}
+        for target, stream, meta in targets:
+            stream.sync()
+            meta['position'] = stream.size if meta['format'] == 'csv' else stream.samples
+            meta['carry'] = 0
+            checkpoint[target] = meta
+        journal.commit(generation, checkpoint, starts)
+
+    def enable_journal(self, journal: SampleJournal):
+        """
+        Starts to write every sample into the journal before it is buffered.
+        The journal needs an empty buffer, so the buffers are saved first.
+
+        :param journal: The journal, None to stop journaling
+        """
+        self.save_recorder_data()
+        self.save_backup_data()
+        if self.journal is not None:
+            self.submit(self.journal.close)
+        self.journal = journal
+        if journal is None:
+            return
+        journal.start()
+        for target, meta in self.stream_meta.items():
+            journal.append_open(target, dict(meta, carry=0))
+        self.recorder_start = journal.position()
+
+    def update_streams(self):
+        for stream in list(self.streams.values()):
+            stream.update()
+        for pyramid in list(self.pyramids.values()):
+            pyramid.update()
+
+    def is_busy(self):
+        """
+        Checks if the writer is behind, while it is busy no samples
+        should be added so the buffers stay bounded.
+
+        :return: True when the job queue of the writer is full
+        """
+        return self.writer is not None and self.writer.is_full()
+
+    def submit(self, function, *args):
+        if self.writer is None:
+            function(*args)
+        else:
+            self.writer.submit(function, *args)
+
+    def take_block(self):
+        try:
+            return self.free_blocks.get_nowait()
+        except queue.Empty:
+            block = SampleBlock()
+            self.blocks.append(block)
+            return block
+
+    def write_target(self, block: SampleBlock, stream, target: str):
+        # Runs on the writer, which owns the pyramids
+        pyramid = self.pyramids.get(target)
+        if pyramid is None:
+            self.write_block(block, stream)
+        else:
+            self.write_block(block, stream, pyramid)
+
+    def write_block(self, block: SampleBlock, *streams):
+        # Runs on the writer, the block is reused once it is written
+        try:
+            for stream in streams:
+                stream.write(block.view())
+        finally:
+            block.clear()
+            self.free_blocks.put(block)
+
+    def save_block(self, target: str, block: SampleBlock):
+        """
+        Hands the filled block to the writer and continues with an
+        empty block, so new samples are added during the write.
+
+        :param target: Either 'recorder' or 'backup'
+        :param block: Block with the samples
+        :return: The block for the next samples
+        """
+        stream = self.open_stream(target, block.width)
+        self.submit(self.write_target, block, stream, target)
+        return self.take_block()
 
     def update_recorder_status(self):
         if len(self.recorder_data) < self.recorder_size:
             return
-        if self.is_auto_save is False:
+        if self.is_auto_save is False and self.dump_stop is None:
             return
         self.save_recorder_data()
 
@@ -51,17 +482,202 @@ class StorageHolder:
             return
         self.save_backup_data()
 
+    def column_names(self):
+        if self.is_timestamp is True:
+            return ['Time'] + self.channel_names
+        return self.channel_names
+
+    def open_stream(self, target: str, width: int):
+        """
+        Gets the open file of the target, the file is reopened when the
+        path or the format of the target has changed. The backup starts
+        a new segment when the rotation is due.
+
+        :param target: Either 'recorder' or 'backup'
+        :param width: Amount of channels of a new column file
+        :return: The stream of the target
+        """
+        if self.file_format == 'csv':
+            extension = files.CSV_EXTENSION
+        else:
+            extension = recording.COLUMN_EXTENSION
+        if target == 'backup':
+            return self.open_backup_stream(extension, width)
+        file_path = files.csv_path(self.file_name, extension)
+        stream = self.streams.get(target)
+        if stream is not None and self.is_current(stream, file_path, width):
+            return stream
+        if stream is not None:
+            self.close_stream(stream)
+            self.submit(self.close_pyramid, target)
+        stream = self.create_stream(target, file_path, width)
+        if not self.is_fitting(stream, width):
+            # The samples continue in a column file with enough channels
+            self.close_stream(stream)
+            stream = self.create_stream(target, self.wide_path(file_path, width), width)
+            self.messages.append(f'{os.path.basename(file_path)} has fewer than {width} channels, '
+                                 f'recording continues in {os.path.basename(stream.file_path)}')
+        self.streams[target] = stream
+        if self.is_pyramid is True:
+            self.submit(self.open_pyramid, target, stream, width, self.column_names())
+        return stream
+
+    def enable_pyramid(self, is_pyramid: bool):
+        """
+        Writes pyramids next to the recordings, an open recording gets its
+        pyramid from the next samples on.
+
+        :param is_pyramid: True to write pyramids
+        """
+        self.is_pyramid = is_pyramid
+        stream = self.streams.get('recorder')
+        if stream is None:
+            return
+        if is_pyramid is True:
+            meta = self.stream_meta['recorder']
+            self.submit(self.open_pyramid, 'recorder', stream, meta['width'], meta['names'])
+        else:
+            self.submit(self.close_pyramid, 'recorder')
+
+    def open_pyramid(self, target: str, stream, width: int, names: List[str]):
+        # Runs on the writer, so the samples before the pyramid are already in the file
+        if target in self.pyramids:
+            return
+        name = os.path.basename(stream.file_path)
+        if isinstance(stream, recording.ColumnWriter):
+            # Buffered samples are only counted once they are written
+            stream.flush()
+            start = stream.samples
+        elif stream.size == 0:
+            start = 0
+        else:
+            # The samples of a CSV file are not counted, so its pyramid has to start with the file
+            self.messages.append(f'{name} already has samples, no overview is written')
+            return
+        try:
+            self.pyramids[target] = PyramidWriter(pyramid_path(stream.file_path), width, names, start=start)
+        except ValueError as error:
+            self.messages.append(f'No overview is written for {name}: {error}')
+
+    def close_pyramid(self, target: str):
+        # Runs on the writer after the last samples of the pyramid
+        pyramid = self.pyramids.pop(target, None)
+        if pyramid is not None:
+            pyramid.close()
+
+    def is_current(self, stream, file_path: str, width: int):
+        # A recording continues in the wider file which replaced its file
+        if not isinstance(stream, recording.ColumnWriter):
+            return stream.file_path == file_path
+        wide_path = self.wide_path(file_path, stream.channels)
+        return self.is_fitting(stream, width) and stream.file_path in (file_path, wide_path)
+
+    @staticmethod
+    def is_fitting(stream, width: int):
+        # Column files have a fixed amount of channels, CSV rows can grow
+        return not isinstance(stream, recording.ColumnWriter) or width <= stream.channels
+
+    @staticmethod
+    def wide_path(file_path: str, width: int):
+        root, extension = os.path.splitext(file_path)
+        return f'{root}_{width}ch{extension}'
+
+    def open_backup_stream(self, extension: str, width: int):
+        rotation = self.rotation
+        stream = self.streams.get('backup')
+        if stream is not None and (rotation.is_due(stream.size) or not rotation.matches(files.CSV_BACKUP, extension)
+                                   or not self.is_fitting(stream, width)):
+            stream = self.streams.pop('backup')
+            if self.journal is not None:
+                self.submit(stream.sync)
+            self.submit(rotation.finish, stream, rotation.end())
+        if 'backup' not in self.streams:
+            number = rotation.start(files.CSV_BACKUP, extension, files.DATE_TIME)
+            file_path = files.csv_path_auto(extension, number)
+            self.streams['backup'] = self.create_stream('backup', file_path, width)
+            self.submit(rotation.save)
+        return self.streams['backup']
+
+    def create_stream(self, target: str, file_path: str, width: int):
+        if self.file_format == 'csv':
+            stream = files.CsvStream(file_path, 'a')
+            position = stream.size
+        else:
+            stream = recording.ColumnWriter(file_path, self.column_names(), width, self.file_format)
+            position = stream.samples
+        self.stream_meta[target] = meta = {
+            'path': file_path,
+            'format': self.file_format,
+            'names': self.column_names(),
+            'width': width,
+            'delimiter': files.CSV_DELIMITER,
+            'decimal': files.CSV_DECIMAL,
+            'position': position,
+        }
+        if self.journal is not None:
+            # The buffered samples of the target are written into the new file
+            carry = len(self.backup_data) if target == 'backup' else len(self.recorder_data)
+            self.journal.append_open(target, dict(meta, carry=carry))
+        return stream
+
+    def close_stream(self, stream):
+        if self.journal is not None:
+            self.submit(stream.sync)
+        self.submit(stream.close)
+
     def save_recorder_data(self):
         if not len(self.recorder_data) > 0:
             return
-        files.csv_save_append(self.file_name, self.recorder_data)
-        self.recorder_data.clear()
+        self.recorder_data = self.save_block('recorder', self.recorder_data)
+        if self.journal is not None:
+            # The next samples of the recorder follow the saved samples in the journal
+            self.recorder_start = self.journal.position()
 
     def save_backup_data(self):
         if not len(self.backup_data) > 0:
             return
-        files.csv_save_auto(self.backup_data)
-        self.backup_data.clear()
+        stream = self.open_stream('backup', self.backup_data.width)
+        self.rotation.add(len(self.backup_data), self.backup_start, self.backup_stop)
+        self.backup_start = None
+        self.submit(self.write_block, self.backup_data, stream)
+        if self.rotation.retention > 0:
+            self.submit(self.rotation.update, stream, self.rotation.segment)
+        self.backup_data = self.take_block()
+
+    def statistics(self):
+        """
+        Gets the amount of buffered samples, the memory of the buffers
+        and the state of the writer.
+
+        :return: Dictionary with the statistics
+        """
+        statistics = {
+            'buffered': sum(len(block) for block in self.blocks),
+            'memory': sum(block.nbytes for block in self.blocks),
+            'write_queue': 0,
+            'write_latency': 0.0,
+            'write_latency_max': 0.0,
+        }
+        if self.writer is not None:
+            statistics['write_queue'] = self.writer.jobs.qsize()
+            statistics['write_latency'] = self.writer.latency
+            statistics['write_latency_max'] = self.writer.latency_max
+        return statistics
+
+    def close(self):
+        if 'backup' in self.streams:
+            # The last segment is compressed as well, the compressor stops after the writer
+            self.submit(self.rotation.finish, self.streams.pop('backup'), self.rotation.end())
+        for target, stream in self.streams.items():
+            self.submit(stream.close)
+            self.submit(self.close_pyramid, target)
+        self.streams.clear()
+        self.stream_meta.clear()
+        self.enable_database(None)
+        self.enable_blackbox(None)
+        if self.journal is not None:
+            self.submit(self.journal.close)
+            self.journal = None
 
 
 class StorageThread(threading.Thread):
@@ -71,15 +687,23 @@ class StorageThread(threading.Thread):
         super().__init__(daemon=False, name='Storage')
         self.is_running = event
         self.interface = StorageInterace()
-        self.storage = StorageHolder()
+        self.writer = StorageWriter(self.interface.queue_status)
+        self.compressor = StorageWriter(self.interface.queue_status, name='Compressor')
+        self.storage = StorageHolder(self.writer, self.compressor)
         self.success = 0
+        self.drops = 0
 
     def run(self):
         self.is_running.set()
+        self.update_journal_replay()
+        self.writer.start()
+        self.compressor.start()
         while self.is_running.is_set():
             self.update_request_queues()
             self.update_settings_status()
             self.storage.update()
+            self.update_message_status()
+            self.interface.statistics = self.storage.statistics()
             time.sleep(0.2)
         self.exit()
 
@@ -87,6 +711,25 @@ class StorageThread(threading.Thread):
         if self.storage.is_auto_save is True:
             self.storage.save_recorder_data()
         self.storage.save_backup_data()
+        self.storage.save_database_data()
+        self.storage.close()
+        self.writer.stop()
+        self.compressor.stop()
+
+    def update_journal_replay(self):
+        # Samples which were left in the journal by a crash
+        try:
+            samples = replay_journal()
+        except (OSError, ValueError, KeyError) as error:
+            self.interface.queue_status.put(f'Could not recover the journal: {error}')
+            return
+        if samples > 0:
+            self.interface.queue_status.put(f'Recovered {samples} samples from the journal')
+
+    def update_message_status(self):
+        messages, self.storage.messages = self.storage.messages, []
+        for message in messages:
+            self.interface.queue_status.put(message)
 
     def update_settings_status(self):
         if self.success == 0:
@@ -95,25 +738,55 @@ class StorageThread(threading.Thread):
         self.interface.queue_status.put('Succesfully saved settings')
 
     def update_request_queues(self):
-        while not self.interface.queue_data.empty():
-            data = self.interface.queue_data.get()
-            self.storage.add(data)
-        while not self.interface.queue_command.empty():
+        cursor = self.interface.cursor_data
+        # While the writer is behind the samples wait in the ring buffer,
+        # once the ring buffer is full the oldest samples are dropped
+        if not self.storage.is_busy():
+            for times, block in cursor.read():
+                self.storage.add_block(block, times)
+        if cursor.drops > self.drops:
+            lost = cursor.drops - self.drops
+            self.drops = cursor.drops
+            self.interface.queue_status.put(f'Storage could not keep up and lost {lost} samples')
+        # Commands can add jobs, so they wait in the queue like the samples
+        while not self.interface.queue_command.empty() and not self.storage.is_busy():
             command = self.interface.queue_command.get()
             self.process_command(command)
 
     def process_command(self, command: str):
         cmd, *arg = command.split(' ')
         if cmd == 'recorder':
-            message = self.process_recorder(arg[0])
+            message = self.process_recorder(*arg[:2])
         elif cmd == 'auto_save':
             message = self.process_auto_save(arg[0])
+        elif cmd == 'timestamp':
+            message = self.process_timestamp(arg[0])
+        elif cmd == 'format':
+            message = self.process_format(arg[0])
+        elif cmd == 'channels':
+            message = self.process_channels(arg[0] if len(arg) > 0 else '')
         elif cmd == 'file_name':
             message = self.process_file_name(arg[0])
         elif cmd == 'data_dir':
             message = self.process_data_directory(arg[0])
         elif cmd == 'backup_dir':
             message = self.process_backup_directory(arg[0])
+        elif cmd == 'database':
+            message = self.process_database(arg[0])
+        elif cmd == 'blackbox':
+            message = self.process_blackbox(*arg[:3])
+        elif cmd == 'trigger':
+            message = self.process_trigger(*arg[:4])
+        elif cmd == 'pyramid':
+            message = self.process_pyramid(arg[0])
+        elif cmd == 'journal':
+            message = self.process_journal(*arg[:3])
+        elif cmd == 'backup_rotation':
+            message = self.process_backup_rotation(*arg[:2])
+        elif cmd == 'backup_compression':
+            message = self.process_backup_compression(arg[0])
+        elif cmd == 'backup_retention':
+            message = self.process_backup_retention(arg[0])
         elif cmd == 'delimiter':
             message = self.process_delimiter(arg[0])
         elif cmd == 'decimal':
@@ -131,6 +804,17 @@ class StorageThread(threading.Thread):
         self.storage.file_name = file_name
         return 'success'
 
+    def process_format(self, file_format: str):
+        if file_format not in ('csv', *recording.COLUMN_DTYPES):
+            return 'Unknown format ' + file_format
+        self.storage.file_format = file_format
+        return 'success'
+
+    def process_channels(self, names: str):
+        # Names are separated by commas and spaces are sent as %
+        self.storage.channel_names = [name.replace('%', ' ') for name in names.split(',') if name != '']
+        return 'success'
+
     def process_data_directory(self, folder_path: str):
         if len(folder_path) == 0:
             folder_path = './data/'
@@ -143,11 +827,132 @@ class StorageThread(threading.Thread):
         files.CSV_BACKUP = folder_path.replace('%', ' ')
         return 'success'
 
-    def process_recorder(self, subcommand: str):
+    def process_database(self, state: str):
+        if state == 'disable':
+            self.storage.enable_database(None)
+            return 'success'
+        if state != 'enable':
+            return 'Unknown database state'
+        if self.storage.database is not None:
+            return 'success'
+        try:
+            Path(files.CSV_FOLDER).mkdir(parents=True, exist_ok=True)
+            self.storage.enable_database(files.CSV_FOLDER + DATABASE_NAME)
+        except (OSError, sqlite3.Error) as error:
+            self.storage.database = None
+            return f'Could not open the database: {error}'
+        return 'success'
+
+    def process_dump(self, seconds: str = None):
+        storage = self.storage
+        if storage.blackbox is None:
+            return 'The black box is disabled'
+        if storage.is_recording is True:
+            return 'The recorder is already recording'
+        try:
+            after = None if seconds is None else float(seconds)
+        except ValueError:
+            return 'Invalid dump duration ' + seconds
+        samples = storage.start_dump(after)
+        return f'Dumped {samples} samples from the black box, recording continues'
+
+    def process_blackbox(self, state: str, minutes: str = '5', size: str = '64'):
+        # The minutes are the window of a dump and the size is in megabytes
+        if state == 'disable':
+            self.storage.enable_blackbox(None)
+            return 'success'
+        if state != 'enable':
+            return 'Unknown black box state'
+        try:
+            window, max_size = float(minutes), int(float(size) * (1 << 20))
+        except ValueError:
+            return 'Invalid black box settings ' + minutes + ' ' + size
+        if max_size <= 0:
+            return 'Black box size has to be above 0 MB'
+        try:
+            self.storage.enable_blackbox(files.CSV_BACKUP + BLACKBOX_FILE, window, max_size)
+        except OSError as error:
+            self.storage.blackbox = None
+            return f'Could not open the black box: {error}'
+        return 'success'
+
+    def process_trigger(self, channel: str, condition: str = 'above', level: str = '0', seconds: str = None):
+        # Dumps the black box once a channel goes above or below the level
+        if channel == 'disable':
+            self.storage.trigger = None
+            return 'success'
+        if condition not in ('above', 'below'):
+            return 'Unknown trigger condition ' + condition
+        try:
+            self.storage.trigger = int(channel), condition, float(level)
+            if seconds is not None:
+                self.storage.dump_seconds = float(seconds)
+        except ValueError:
+            return f'Invalid trigger {channel} {condition} {level}'
+        return 'success'
+
+    def process_pyramid(self, state: str):
+        if state not in ('enable', 'disable'):
+            return 'Unknown pyramid state'
+        self.storage.enable_pyramid(state == 'enable')
+        return 'success'
+
+    def process_journal(self, state: str, interval: str = '50', size: str = '256'):
+        # The sync interval is in milliseconds and the sync size in kilobytes
+        if state == 'disable':
+            self.storage.enable_journal(None)
+            return 'success'
+        if state != 'enable':
+            return 'Unknown journal state'
+        try:
+            sync_interval, sync_size = float(interval) / 1000, int(float(size) * 1024)
+        except ValueError:
+            return 'Invalid journal sync ' + interval + ' ' + size
+        journal = self.storage.journal
+        if journal is not None:
+            journal.sync_interval, journal.sync_size = sync_interval, sync_size
+            return 'success'
+        try:
+            self.storage.enable_journal(SampleJournal(sync_interval=sync_interval, sync_size=sync_size,
+                                                      worker=self.writer))
+        except OSError as error:
+            self.storage.journal = None
+            return f'Could not start the journal: {error}'
+        return 'success'
+
+    def process_backup_rotation(self, size: str, minutes: str = '0'):
+        # Sizes are in megabytes, zero turns the limit off
+        try:
+            self.storage.rotation.max_size = int(float(size) * 1e6)
+            self.storage.rotation.max_duration = float(minutes) * 60
+        except ValueError:
+            return 'Invalid backup rotation ' + size + ' ' + minutes
+        return 'success'
+
+    def process_backup_compression(self, compression: str):
+        if compression not in COMPRESSIONS:
+            return 'Unknown compression ' + compression
+        self.storage.rotation.compression = compression
+        return 'success'
+
+    def process_backup_retention(self, size: str):
+        try:
+            self.storage.rotation.retention = int(float(size) * 1e6)
+        except ValueError:
+            return 'Invalid backup retention ' + size
+        return 'success'
+
+    def process_recorder(self, subcommand: str, seconds: str = None):
+        if subcommand == 'dump':
+            return self.process_dump(seconds)
         if subcommand == 'start':
+            # A running dump becomes a recording of the user, so it does not stop on its own
+            self.storage.dump_stop = None
             self.storage.is_recording = True
             return "Recorder started"
         elif subcommand == 'pause':
+            if self.storage.dump_stop is not None:
+                self.storage.stop_dump()
             self.storage.is_recording = False
             return 'Recorder paused'
         elif subcommand == 'save':
@@ -181,3 +986,12 @@ class StorageThread(threading.Thread):
         else:
             return 'Unknown auto save state'
         return 'success'
+
+    def process_timestamp(self, state: str):
+        if state == 'enable':
+            self.storage.is_timestamp = True
+        elif state == 'disable':
+            self.storage.is_timestamp = False
+        else:
+            return 'Unknown timestamp state'
+        return 'success'
@@ -0,0 +1,171 @@
+"""
+Throughput benchmark of the ingestion path, without serial hardware.
+
+A canned byte stream from the device simulator goes through each stage:
+framing and parsing in BufferConverter, the fan-out of SerialInterface,
+buffering and saving in StorageHolder and writing with files.csv_writer.
+Every stage reports its time, lines/s, bytes/s and peak memory. The
+results are saved as JSON, so runs on different commits can be compared.
+
+    PYTHONPATH=src python tests/benchmark/bench_ingest.py --lines 10000000
+    PYTHONPATH=src python tests/benchmark/bench_ingest.py --compare old.json
+"""
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from SerialPlotter import files
+from SerialPlotter.device import BufferConverter, SerialInterface
+from SerialPlotter.simulator import DeviceSimulator
+from SerialPlotter.storage import StorageHolder
+
+
+def create_stream(lines: int, channels: int, messages: float):
+    simulator = DeviceSimulator(channels=channels, waveform='noise', messages=messages, seed=1)
+    parts = []
+    while lines > 0:
+        count = min(lines, 100000)
+        parts.append(simulator.generate(count))
+        lines -= count
+    return b''.join(parts)
+
+
+def stage_converter(stream: bytes, chunk: int):
+    converter = BufferConverter()
+    frames = []
+    for start in range(0, len(stream), chunk):
+        converter.add(stream[start:start + chunk])
+        converter.update_batch()
+        frames.extend(zip(converter.times, converter.blocks))
+        converter.times.clear()
+        converter.blocks.clear()
+        converter.messages.clear()
+        converter.lines.clear()
+    return frames
+
+
+def stage_interface(frames):
+    interface = SerialInterface()
+    cursors = [interface.create_cursor(name) for name in ('graph', 'storage', 'communication')]
+    for times, block in frames:
+        interface.queue_frame('data', block, times)
+        for cursor in cursors:
+            cursor.read()
+    return sum(cursor.drops for cursor in cursors)
+
+
+def stage_storage(frames, folder: str):
+    files.CSV_BACKUP = folder + '/backup/'
+    files.CSV_FOLDER = folder + '/data/'
+    storage = StorageHolder()
+    storage.is_recording = True
+    storage.is_auto_save = True
+    for times, block in frames:
+        storage.add_block(block, times)
+        storage.update()
+    storage.save_recorder_data()
+    storage.save_backup_data()
+
+
+def stage_csv_writer(frames, folder: str, rows: int):
+    file_path = folder + '/writer.csv'
+    data = []
+    for _, block in frames:
+        data.extend(block.tolist())
+        if len(data) >= rows:
+            files.csv_writer(file_path, data, 'a')
+            data = []
+    if len(data) > 0:
+        files.csv_writer(file_path, data, 'a')
+
+
+def measure(name, results, lines, size, memory, function, *args):
+    start = time.perf_counter()
+    value = function(*args)
+    seconds = time.perf_counter() - start
+    peak = 0
+    if memory:
+        # Tracing slows the stage down, so the memory gets its own run
+        tracemalloc.start()
+        function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    results[name] = {
+        'seconds': seconds,
+        'lines_per_second': lines / seconds,
+        'bytes_per_second': size / seconds,
+        'peak_memory': peak,
+    }
+    print(f'{name:>10}: {seconds:8.3f} s {lines / seconds:12.0f} lines/s '
+          f'{size / seconds / 1e6:8.2f} MB/s peak {peak / 1e6:8.2f} MB')
+    return value
+
+
+def git_commit():
+    try:
+        output = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True)
+    except OSError:
+        return ''
+    return output.stdout.strip()
+
+
+def compare(results, file_path):
+    with open(file_path) as json_file:
+        previous = json.load(json_file)
+    print(f'Compared with {previous["commit"]} ({previous["date"]}):')
+    for name, stage in results['stages'].items():
+        if name not in previous['stages']:
+            continue
+        ratio = stage['lines_per_second'] / previous['stages'][name]['lines_per_second']
+        print(f'{name:>10}: {ratio:6.2f}x')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingestion throughput benchmark')
+    parser.add_argument('--lines', type=int, default=1000000)
+    parser.add_argument('--channels', type=int, default=4)
+    parser.add_argument('--messages', type=float, default=0.001)
+    parser.add_argument('--chunk', type=int, default=65536, help='bytes per read')
+    parser.add_argument('--writer-rows', type=int, default=500, help='rows per csv_writer call')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc runs')
+    parser.add_argument('--output', default='bench_output.json')
+    parser.add_argument('--compare', help='JSON file of a previous run')
+    arguments = parser.parse_args()
+
+    lines = arguments.lines
+    memory = not arguments.no_memory
+    stream = create_stream(lines, arguments.channels, arguments.messages)
+    size = len(stream)
+    print(f'{lines} lines, {arguments.channels} channels, {size / 1e6:.1f} MB')
+
+    stages = {}
+    frames = measure('converter', stages, lines, size, memory, stage_converter, stream, arguments.chunk)
+    measure('interface', stages, lines, size, memory, stage_interface, frames)
+    with tempfile.TemporaryDirectory() as folder:
+        measure('storage', stages, lines, size, memory, stage_storage, frames, folder)
+        measure('csv_writer', stages, lines, size, memory, stage_csv_writer, frames, folder,
+                arguments.writer_rows)
+
+    results = {
+        'commit': git_commit(),
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'lines': lines,
+        'bytes': size,
+        'channels': arguments.channels,
+        'chunk': arguments.chunk,
+        'stages': stages,
+    }
+    with open(arguments.output, 'w') as json_file:
+        json.dump(results, json_file, indent=1)
+    if arguments.compare:
+        compare(results, arguments.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Throughput of the sample journal for different fsync batches.
+
+Every configuration appends the same blocks as fast as possible and
+reports the samples per second, the fsync calls per second and the
+samples which a crash could lose at the acquisition rate. Run it from
+the repository root with:
+
+    PYTHONPATH=src python tests/benchmark/bench_journal.py
+    PYTHONPATH=src python tests/benchmark/bench_journal.py --folder /mnt/share
+"""
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+
+from SerialPlotter.journal import SampleJournal, target_mask
+
+# Sync interval in milliseconds and sync size in kilobytes
+CONFIGURATIONS = [
+    (0, 0),
+    (1, 1024),
+    (10, 1024),
+    (50, 256),
+    (200, 1024),
+    (1000, 4096),
+]
+
+
+def run(folder, interval, size, blocks, block):
+    journal = SampleJournal(folder, sync_interval=interval / 1000, sync_size=size * 1024)
+    journal.start()
+    targets = target_mask('backup')
+    start = time.perf_counter()
+    for _ in range(blocks):
+        journal.append_block(block, targets)
+    journal.sync()
+    seconds = time.perf_counter() - start
+    syncs = journal.syncs
+    journal.close()
+    return seconds, syncs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Journal fsync benchmark')
+    parser.add_argument('--blocks', type=int, default=2000)
+    parser.add_argument('--rows', type=int, default=100, help='rows per block')
+    parser.add_argument('--channels', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=10000, help='acquisition rate in samples per second')
+    parser.add_argument('--folder', help='folder on the disk under test')
+    parser.add_argument('--output', default='bench_journal.json')
+    arguments = parser.parse_args()
+
+    block = np.random.default_rng(1).standard_normal((arguments.rows, arguments.channels))
+    samples = arguments.blocks * arguments.rows
+    results = []
+    with tempfile.TemporaryDirectory(dir=arguments.folder) as folder:
+        print(f'{"interval":>9} {"size":>8} {"samples/s":>12} {"fsync/s":>8} {"at risk":>8}')
+        for interval, size in CONFIGURATIONS:
+            seconds, syncs = run(folder, interval, size, arguments.blocks, block)
+            # Samples which arrive during one sync interval at the acquisition rate
+            bytes_per_sample = arguments.channels * 8
+            at_risk = min(interval / 1000 * arguments.rate, size * 1024 / bytes_per_sample) if interval else 0
+            results.append({
+                'interval_ms': interval,
+                'size_kb': size,
+                'samples_per_second': samples / seconds,
+                'syncs_per_second': syncs / seconds,
+                'samples_at_risk': at_risk,
+            })
+            print(f'{interval:>7}ms {size:>6}kB {samples / seconds:12.0f} {syncs / seconds:8.1f} {at_risk:8.0f}')
+    with open(arguments.output, 'w') as json_file:
+        json.dump(results, json_file, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+End-to-end throughput of a replay at maximum speed.
+
+A recording is written as CSV and as binary columns and replayed by the
+serial thread through the data topic, while a graph and a storage
+subscriber read their cursors like the application does. The rate at
+which the subscribers receive the samples is the throughput of the
+whole live path. Run it from the repository root with:
+
+    PYTHONPATH=src python tests/benchmark/bench_replay.py --samples 2000000
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from SerialPlotter import files
+from SerialPlotter.device import SerialThread
+from SerialPlotter.recording import ColumnWriter
+from SerialPlotter.storage import StorageHolder
+
+
+def run(file_path, samples, folder):
+    running = threading.Event()
+    thread = SerialThread(running)
+    graph = thread.interface.create_cursor('graph')
+    cursor = thread.interface.create_cursor('storage')
+    files.CSV_BACKUP = folder + '/backup/'
+    storage = StorageHolder()
+    thread.process_command(f'replay start max comma dot {file_path}')
+    start = time.perf_counter()
+    thread.start()
+    received = 0
+    while received + graph.drops < samples:
+        received += sum(len(block) for _, block in graph.read())
+        for times, block in cursor.read():
+            storage.add_block(block, times)
+            storage.update()
+    seconds = time.perf_counter() - start
+    running.clear()
+    thread.join()
+    storage.close()
+    return seconds, graph.drops + cursor.drops
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay throughput benchmark')
+    parser.add_argument('--samples', type=int, default=1000000)
+    parser.add_argument('--channels', type=int, default=4)
+    parser.add_argument('--output', default='bench_replay.json')
+    arguments = parser.parse_args()
+
+    data = np.random.default_rng(1).standard_normal((arguments.samples, arguments.channels))
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        csv_path = os.path.join(folder, 'replay.csv')
+        files.csv_writer(csv_path, data, 'w')
+        column_folder = os.path.join(folder, 'binary')
+        os.makedirs(column_folder)
+        writer = ColumnWriter(os.path.join(column_folder, 'replay.col'), channels=arguments.channels)
+        writer.write(data)
+        writer.close()
+        for name, file_path in (('csv', csv_path), ('binary', os.path.join(column_folder, 'replay.csv'))):
+            seconds, drops = run(file_path, arguments.samples, folder)
+            results[name] = {
+                'seconds': seconds,
+                'samples_per_second': arguments.samples / seconds,
+                'drops': drops,
+            }
+            print(f'{name:>6}: {arguments.samples} samples in {seconds:.2f} s, '
+                  f'{arguments.samples / seconds:.0f} samples/s, {drops} dropped')
+    with open(arguments.output, 'w') as json_file:
+        json.dump(results, json_file, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Compares the old polling loop of SerialThread with the event driven loop.
+
+A pseudo terminal stands in for the serial device, so this only runs on
+Linux and macOS. Run it from the repository root with:
+
+    PYTHONPATH=src python tests/benchmark/bench_serial_loop.py
+"""
+import os
+import threading
+import time
+import tty
+
+import serial
+
+from SerialPlotter.device import SerialThread
+
+
+class PollingSerialThread(SerialThread):
+    """The acquisition loop as it was before, used as reference"""
+
+    def run(self):
+        self.is_running.set()
+        while self.is_running.is_set():
+            self.update_request_queues()
+            self.update_response_queues()
+            if not self.serial.is_connected.is_set():
+                time.sleep(0.1)
+                continue
+            while self.serial.available() > 0:
+                buffer = self.serial.read()
+                self.converter.add(buffer)
+            self.converter.update_batch()
+            for message in self.interface.get_items('out'):
+                self.serial.write(message)
+            time.sleep(0.001)
+        self.serial.disconnect()
+
+
+def open_device(thread: SerialThread):
+    master, slave = os.openpty()
+    tty.setraw(master)
+    tty.setraw(slave)
+    handler = thread.serial
+    handler.serial = serial.Serial(os.ttyname(slave), timeout=handler.timeout)
+    handler.is_connected.set()
+    return master, slave
+
+
+def measure_idle_cpu(thread_class, duration=2.0):
+    running = threading.Event()
+    thread = thread_class(running)
+    master, slave = open_device(thread)
+    thread.start()
+    time.sleep(0.2)
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    time.sleep(duration)
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    running.clear()
+    thread.join()
+    os.close(master)
+    os.close(slave)
+    return cpu / wall * 100
+
+
+def measure_latency(thread_class, samples=200):
+    running = threading.Event()
+    thread = thread_class(running)
+    queue_data = thread.interface.create_queue('data')
+    master, slave = open_device(thread)
+    thread.start()
+    time.sleep(0.2)
+    latencies = []
+    for index in range(samples):
+        start = time.perf_counter()
+        os.write(master, f'{index}\t{index}\n'.encode())
+        queue_data.get(timeout=1)
+        latencies.append(time.perf_counter() - start)
+        time.sleep(0.005)
+    running.clear()
+    thread.join()
+    os.close(master)
+    os.close(slave)
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+
+def measure_command_latency(thread_class, samples=50):
+    running = threading.Event()
+    thread = thread_class(running)
+    queue_status = thread.interface.create_queue('status')
+    queue_command = thread.interface.create_queue('command')
+    master, slave = open_device(thread)
+    thread.start()
+    time.sleep(0.2)
+    latencies = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        queue_command.put('read_size 65536')
+        queue_status.get(timeout=1)
+        latencies.append(time.perf_counter() - start)
+        time.sleep(0.01)
+    running.clear()
+    thread.join()
+    os.close(master)
+    os.close(slave)
+    latencies.sort()
+    return latencies[len(latencies) // 2]
+
+
+def main():
+    for name, thread_class in [('polling', PollingSerialThread), ('event', SerialThread)]:
+        cpu = measure_idle_cpu(thread_class)
+        median, p99 = measure_latency(thread_class)
+        command = measure_command_latency(thread_class)
+        print(f'{name:>8}: idle cpu {cpu:5.1f} %, '
+              f'data latency median {median * 1e3:.3f} ms p99 {p99 * 1e3:.3f} ms, '
+              f'command latency median {command * 1e3:.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
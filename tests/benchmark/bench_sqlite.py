@@ -0,0 +1,80 @@
+"""
+Sustained insert rate and range query time of the SQLite sink.
+
+Blocks of samples are inserted like the storage does it for the given
+duration, the rate has to stay above the acquisition rate. Afterwards
+time ranges of the session are queried. Run it from the repository
+root with:
+
+    PYTHONPATH=src python tests/benchmark/bench_sqlite.py --seconds 30
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from SerialPlotter.storage import SqliteSink
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite sink benchmark')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--rows', type=int, default=1024, help='rows per write')
+    parser.add_argument('--channels', type=int, default=4)
+    parser.add_argument('--chunk', type=int, default=1024, help='rows per BLOB')
+    parser.add_argument('--rate', type=float, default=10000, help='acquisition rate in samples per second')
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--output', default='bench_sqlite.json')
+    arguments = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    values = rng.standard_normal((arguments.rows, arguments.channels))
+    with tempfile.TemporaryDirectory() as folder:
+        file_path = os.path.join(folder, 'bench.sqlite')
+        sink = SqliteSink(file_path, arguments.chunk)
+        session = sink.start_session('bench')
+
+        samples = 0
+        latencies = []
+        start = time.perf_counter()
+        while time.perf_counter() - start < arguments.seconds:
+            times = (samples + np.arange(arguments.rows)) / arguments.rate
+            block = np.column_stack((times, values))
+            before = time.perf_counter()
+            sink.write(block)
+            latencies.append(time.perf_counter() - before)
+            samples += arguments.rows
+        seconds = time.perf_counter() - start
+        rate = samples / seconds
+
+        duration = samples / arguments.rate
+        query_start = time.perf_counter()
+        for offset in rng.uniform(0, duration - 1, arguments.queries):
+            sink.query(session, offset, offset + 1)
+        query_time = (time.perf_counter() - query_start) / arguments.queries
+        sink.close()
+        size = os.path.getsize(file_path)
+
+    results = {
+        'samples': samples,
+        'samples_per_second': rate,
+        'write_latency_max': max(latencies),
+        'query_seconds': query_time,
+        'bytes_per_sample': size / samples,
+        'acquisition_rate': arguments.rate,
+    }
+    print(f'{samples} samples in {seconds:.1f} s: {rate:.0f} samples/s '
+          f'({rate / arguments.rate:.0f}x the acquisition rate)')
+    print(f'Largest write: {max(latencies) * 1000:.1f} ms, '
+          f'query of 1 s of samples: {query_time * 1000:.2f} ms, {size / samples:.1f} bytes per sample')
+    with open(arguments.output, 'w') as json_file:
+        json.dump(results, json_file, indent=1)
+    if rate < arguments.rate:
+        raise SystemExit('Insert rate is below the acquisition rate')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from SerialPlotter import files
+from SerialPlotter.backups import BACKUP_MANIFEST
+from SerialPlotter.storage import StorageHolder
+
+
+class TestBackupRotation(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.paths = files.CSV_BACKUP, files.CSV_DELIMITER, files.CSV_DECIMAL
+        files.CSV_BACKUP = self.folder.name + '/backup/'
+        files.CSV_DELIMITER, files.CSV_DECIMAL = ',', '.'
+        self.storage = StorageHolder()
+        self.storage.backup_size = 10
+
+    def tearDown(self):
+        files.CSV_BACKUP, files.CSV_DELIMITER, files.CSV_DECIMAL = self.paths
+        self.folder.cleanup()
+
+    def add_samples(self, count):
+        for index in range(count):
+            times = (np.arange(10, dtype=np.int64) + index * 10) * 1000000
+            self.storage.add_block(np.ones((10, 1)), times)
+            self.storage.update()
+        self.storage.close()
+
+    def load_manifest(self):
+        with open(files.CSV_BACKUP + BACKUP_MANIFEST) as manifest_file:
+            return json.load(manifest_file)['segments']
+
+    def test_rotation(self):
+        self.storage.rotation.max_size = 80
+        self.add_samples(6)
+        segments = self.load_manifest()
+        self.assertEqual([segment['samples'] for segment in segments], [20, 20, 20])
+        self.assertEqual([segment['compression'] for segment in segments], ['gzip', 'gzip', 'gzip'])
+        self.assertLess(segments[0]['stop'], segments[1]['start'])
+        with gzip.open(files.CSV_BACKUP + segments[0]['file'], 'rt') as csv_file:
+            self.assertEqual(csv_file.read(), '1.0\n' * 20)
+        self.assertEqual(sorted(os.listdir(files.CSV_BACKUP)),
+                         sorted([BACKUP_MANIFEST] + [segment['file'] for segment in segments]))
+
+    def test_retention(self):
+        self.storage.rotation.max_size = 80
+        self.storage.rotation.compression = 'none'
+        self.storage.rotation.retention = 170
+        self.add_samples(8)
+        segments = self.load_manifest()
+        self.assertEqual([segment['number'] for segment in segments], [3, 4])
+        self.assertLessEqual(sum(segment["bytes"] for segment in segments), 170)
+        self.assertEqual(len(os.listdir(files.CSV_BACKUP)), 3)
+
+    def test_retention_active(self):
+        self.storage.rotation.max_size = 80
+        self.storage.rotation.compression = 'none'
+        self.storage.rotation.retention = 100
+        for index in range(3):
+            self.storage.add_block(np.ones((10, 1)))
+            self.storage.update()
+        # The first segment has 80 bytes and the active segment 40 bytes
+        segments = self.load_manifest()
+        self.assertEqual([segment['number'] for segment in segments], [2])
+        self.assertEqual(segments[0]['bytes'], 40)
+        self.storage.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from SerialPlotter import files
+from SerialPlotter.blackbox import BlackBox
+from SerialPlotter.recording import ColumnReader
+from SerialPlotter.storage import StorageHolder, StorageThread
+
+
+class TestBlackBox(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.folder.name, 'blackbox.ring')
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_ring(self):
+        blackbox = BlackBox(self.file_path, max_size=4096, minutes=1)
+        blackbox.open(2)
+        size = os.path.getsize(self.file_path)
+        self.assertLessEqual(size, 4096)
+        seconds = int(1e9)
+        block = np.arange(600, dtype=np.float64).reshape(300, 2)
+        blackbox.write(block, np.arange(300) * seconds)
+        self.assertEqual(os.path.getsize(self.file_path), size, 'File keeps its size')
+        times, values = blackbox.read()
+        # Only the capacity fits and only the last minute is dumped
+        self.assertLess(blackbox.capacity, 300)
+        np.testing.assert_array_equal(times, np.arange(239, 300) * seconds)
+        np.testing.assert_array_equal(values, block[239:])
+        blackbox.close()
+
+        # The samples survive a restart
+        blackbox = BlackBox(self.file_path, max_size=4096, minutes=1)
+        blackbox.open(2)
+        blackbox.write(np.array([[1.0]]), np.array([300 * seconds]))
+        times, values = blackbox.read(1 / 60)
+        np.testing.assert_array_equal(values, [[299 * 2, 299 * 2 + 1], [1, np.nan]])
+        blackbox.close()
+
+    def test_restart(self):
+        blackbox = BlackBox(self.file_path, max_size=4096)
+        blackbox.open(3)
+        blackbox.write(np.ones((100, 3)))
+        blackbox.close()
+
+        # Before the channels are known the layout of the file is kept
+        blackbox = BlackBox(self.file_path, max_size=4096)
+        blackbox.open(1)
+        self.assertEqual(blackbox.ring.channels, 3)
+        blackbox.write(np.ones((1, 2)))
+        self.assertEqual(len(blackbox.read()[0]), 101)
+        blackbox.write(np.ones((1, 4)))
+        self.assertEqual(len(blackbox.read()[0]), 1, 'A wider block needs a new layout')
+        blackbox.close()
+
+    def test_dump(self):
+        paths = files.CSV_FOLDER, files.CSV_BACKUP
+        files.CSV_FOLDER = self.folder.name + '/data/'
+        files.CSV_BACKUP = self.folder.name + '/backup/'
+        try:
+            storage = StorageHolder()
+            storage.file_format = 'float64'
+            storage.enable_blackbox(self.file_path, minutes=1)
+            storage.trigger = 1, 'above', 5.0
+            storage.dump_seconds = 0.05
+            for value in range(5):
+                storage.add_block(np.full((10, 2), float(value)))
+            self.assertFalse(storage.is_recording)
+            storage.add_block(np.array([[0.0, 9.0]]))
+            self.assertTrue(storage.is_recording, 'Trigger starts the dump')
+            storage.add_block(np.full((10, 2), 7.0))
+            time.sleep(0.06)
+            storage.update()
+            self.assertFalse(storage.is_recording, 'Dump ends after its duration')
+            storage.add_block(np.full((10, 2), 8.0))
+            self.assertFalse(storage.is_recording, 'Trigger is armed after the condition ends')
+            storage.close()
+        finally:
+            files.CSV_FOLDER, files.CSV_BACKUP = paths
+        reader = ColumnReader(self.folder.name + '/data/Unnamed.col')
+        self.assertEqual(len(reader), 61)
+        np.testing.assert_array_equal(reader.read()[50], [0, 9])
+        reader.close()
+
+    def test_dump_start(self):
+        paths = files.CSV_FOLDER, files.CSV_BACKUP
+        files.CSV_FOLDER = self.folder.name + '/data/'
+        files.CSV_BACKUP = self.folder.name + '/backup/'
+        try:
+            thread = StorageThread(threading.Event())
+            storage = thread.storage
+            storage.enable_blackbox(self.file_path, minutes=1)
+            storage.add_block(np.ones((10, 2)))
+            storage.start_dump(0.0)
+            thread.process_recorder('start')
+            storage.update()
+            self.assertTrue(storage.is_recording, 'The recording of the user keeps going after the dump')
+            storage.start_dump(0.0)
+            thread.process_recorder('pause')
+            self.assertIsNone(storage.dump_stop)
+            self.assertFalse(storage.is_recording)
+            storage.close()
+        finally:
+            files.CSV_FOLDER, files.CSV_BACKUP = paths
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import unittest
+
+import numpy as np
+
+from SerialPlotter.buffers import SampleRing, SampleBlock, SharedSampleRing, LineBuffer
+
+
+class TestSampleRing(unittest.TestCase):
+
+    def test_ring_read(self):
+        ring = SampleRing(8, 4)
+        cursor = ring.subscribe('test')
+        ring.write(np.array([[1.0, 2.0], [3.0, 4.0]]))
+        ring.write(np.array([[5.0, 6.0, 7.0]]))
+        ring.write(np.array([[8.0, 9.0, 10.0]]), np.array([100]))
+        blocks = cursor.read()
+        self.assertEqual(2, len(blocks))
+        self.assertListEqual([[1.0, 2.0], [3.0, 4.0]], blocks[0][1].tolist())
+        self.assertListEqual([[5.0, 6.0, 7.0], [8.0, 9.0, 10.0]], blocks[1][1].tolist())
+        self.assertEqual(100, blocks[1][0][1])
+        self.assertTrue(blocks[0][0][0] <= blocks[1][0][0])
+        self.assertListEqual([], cursor.read())
+
+    def test_ring_wrap_around(self):
+        ring = SampleRing(8, 1)
+        cursor = ring.subscribe('test')
+        for start in range(0, 30, 5):
+            ring.write(np.arange(start, start + 5, dtype=float).reshape(5, 1))
+            _, block = cursor.read()[0]
+            self.assertListEqual(list(range(start, start + 5)), block[:, 0].tolist())
+        self.assertEqual(0, cursor.drops)
+
+    def test_ring_overrun(self):
+        ring = SampleRing(8, 1)
+        slow = ring.subscribe('slow')
+        fast = ring.subscribe('fast')
+        for start in range(0, 20, 4):
+            ring.write(np.arange(start, start + 4, dtype=float).reshape(4, 1))
+            fast.read()
+        self.assertEqual(8, slow.lag())
+        _, block = slow.read()[0]
+        self.assertListEqual(list(range(12, 20)), block[:, 0].tolist())
+        self.assertEqual(12, slow.drops)
+        self.assertEqual(0, fast.drops)
+        self.assertEqual({'slow': (0, 12), 'fast': (0, 0)}, ring.statistics())
+
+    def test_ring_grow(self):
+        ring = SampleRing(4, 2)
+        cursor = ring.subscribe('test')
+        ring.write(np.ones((2, 2)))
+        ring.write(np.full((10, 3), 2.0))
+        _, block = cursor.read()[0]
+        self.assertEqual(3, ring.channels)
+        self.assertEqual((4, 3), block.shape)
+        self.assertEqual(0, ring.truncated)
+        self.assertEqual(8, cursor.drops)
+
+    def test_ring_truncate(self):
+        ring = SharedSampleRing(4, 2)
+        cursor = ring.subscribe('test')
+        ring.write(np.ones((10, 3)))
+        _, block = cursor.read()[0]
+        self.assertEqual((4, 2), block.shape)
+        self.assertEqual(10, ring.truncated)
+        self.assertEqual(6, cursor.drops)
+        del block, cursor
+        ring.close()
+        ring.unlink()
+
+    def test_shared_ring(self):
+        ring = SharedSampleRing(16, 2)
+        attached = SharedSampleRing(16, 2, ring.name, ring.lock)
+        cursor = ring.subscribe('test')
+        attached.write(np.array([[1.0, 2.0], [3.0, 4.0]]))
+        self.assertEqual(2, attached.lag(), 'The writer sees the lag of the cursors of the reader')
+        _, block = cursor.read()[0]
+        self.assertListEqual([[1.0, 2.0], [3.0, 4.0]], block.tolist())
+        self.assertEqual(0, attached.lag())
+        attached.close()
+        ring.close()
+        ring.unlink()
+        self.assertListEqual([], cursor.read(), 'A closed ring is not read')
+        self.assertEqual(0, cursor.lag())
+
+
+class TestSampleBlock(unittest.TestCase):
+
+    def test_block_grow(self):
+        block = SampleBlock(rows=2)
+        block.append(np.ones((3, 2)))
+        block.append(np.full((2, 3), 2.0))
+        block.append(np.full((1, 1), 3.0))
+        self.assertEqual(len(block), 6)
+        expected = [[1, 1, np.nan]] * 3 + [[2, 2, 2]] * 2 + [[3, np.nan, np.nan]]
+        np.testing.assert_array_equal(block.view(), expected)
+
+    def test_block_clear(self):
+        block = SampleBlock(rows=4)
+        block.append(np.ones((4, 2)))
+        values = block.values
+        block.clear()
+        block.append(np.zeros((2, 1)))
+        self.assertIs(block.values, values, 'Array is reused after a clear')
+        np.testing.assert_array_equal(block.view(), [[0], [0]])
+        self.assertTrue(np.shares_memory(block.view(), values))
+
+
+
+class TestLineBuffer(unittest.TestCase):
+
+    def test_wrap_around(self):
+        buffer = LineBuffer(capacity=5)
+        data = np.arange(24, dtype=np.float64).reshape(12, 2)
+        for start in (0, 3, 4, 11):
+            stop = {0: 3, 3: 4, 4: 11, 11: 12}[start]
+            buffer.append(data[start:stop], np.arange(start, stop))
+        self.assertEqual(len(buffer), 5)
+        view = buffer.view()
+        np.testing.assert_array_equal(view, data[7:].T)
+        np.testing.assert_array_equal(buffer.view_times(), np.arange(7, 12))
+        np.testing.assert_array_equal(buffer.view_x(), np.arange(5))
+        self.assertTrue(view[0].flags['C_CONTIGUOUS'], 'Every line is contiguous')
+        self.assertTrue(np.shares_memory(view, buffer.values))
+
+    def test_resize(self):
+        buffer = LineBuffer(capacity=4)
+        buffer.append(np.ones((3, 1)), np.arange(3))
+        buffer.append(np.full((2, 2), 2.0), np.arange(3, 5))
+        np.testing.assert_array_equal(buffer.view(), [[1, 1, 2, 2], [np.nan, np.nan, 2, 2]])
+        buffer.resize(3, 2)
+        np.testing.assert_array_equal(buffer.view(), [[1, 2, 2], [np.nan, 2, 2]])
+        buffer.resize(6, 1)
+        buffer.append(np.full((1, 1), 3.0), np.arange(5, 6))
+        np.testing.assert_array_equal(buffer.view(), [[1, 2, 2, 3]])
+        np.testing.assert_array_equal(buffer.view_times(), [2, 3, 4, 5])
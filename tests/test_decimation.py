@@ -0,0 +1,50 @@
+import unittest
+
+import numpy as np
+
+from SerialPlotter.decimation import decimate_minmax, visible_range
+
+
+class TestDecimation(unittest.TestCase):
+
+    def test_visible_range(self):
+        x = np.arange(100, dtype=np.float64)
+        self.assertEqual(visible_range(x, 10.5, 20.5), (10, 22))
+        self.assertEqual(visible_range(x, -10, 500), (0, 100))
+        self.assertEqual(visible_range(x, 200, 300), (99, 100))
+
+    def test_small(self):
+        x = np.arange(50, dtype=np.float64)
+        y = np.random.default_rng(1).standard_normal((2, 50))
+        x_out, y_out = decimate_minmax(x, y, 0, 49, 100)
+        np.testing.assert_array_equal(x_out, x)
+        np.testing.assert_array_equal(y_out, y)
+
+    def test_spikes(self):
+        x = np.arange(100000, dtype=np.float64)
+        y = np.zeros((3, 100000))
+        y[0, 12345] = 10.0
+        y[1, 99999] = -5.0
+        y[2, 5000:] = np.nan
+        x_out, y_out = decimate_minmax(x, y, -10, 100010, 900)
+        self.assertLessEqual(len(x_out), 2 * 900)
+        self.assertEqual(y_out.shape, (3, len(x_out)))
+        self.assertEqual(y_out[0].max(), 10.0)
+        self.assertEqual(y_out[1].min(), -5.0)
+        self.assertTrue(np.all(np.diff(x_out) >= 0))
+        # The column with the spike is at the position of the spike
+        column = np.argmax(y_out[0])
+        self.assertLess(abs(x_out[column] - 12345), 100000 / 900)
+        self.assertTrue(np.isnan(y_out[2, -1]))
+
+    def test_zoom(self):
+        x = np.arange(10000, dtype=np.float64)
+        y = x[None, :] * 2
+        x_out, y_out = decimate_minmax(x, y, 1000, 2000, 100)
+        self.assertEqual(x_out[0], 999)
+        self.assertEqual(y_out[0].min(), 1998)
+        self.assertEqual(y_out[0].max(), 4002)
+
+
+if __name__ == '__main__':
+    unittest.main()
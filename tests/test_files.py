@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from SerialPlotter import files
+
+
+class TestCsvWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.folder.name, 'data.csv')
+        self.delimiter, self.decimal = files.CSV_DELIMITER, files.CSV_DECIMAL
+
+    def tearDown(self):
+        files.CSV_DELIMITER, files.CSV_DECIMAL = self.delimiter, self.decimal
+        self.folder.cleanup()
+
+    def test_format(self):
+        files.CSV_DELIMITER, files.CSV_DECIMAL = ',', '.'
+        self.assertEqual(files.csv_format([[1.0, 2.5], [3.0]]), '1.0,2.5\n3.0,\n')
+        files.CSV_DELIMITER, files.CSV_DECIMAL = ';', ','
+        self.assertEqual(files.csv_format(np.array([[0.1, -2.0]])), '0,1;-2,0\n')
+
+    def test_stream(self):
+        files.CSV_DELIMITER, files.CSV_DECIMAL = ',', '.'
+        stream = files.CsvStream(self.file_path, 'a', flush_size=1 << 20, flush_interval=60)
+        stream.write([[1.0, 2.0]])
+        with open(self.file_path) as csv_file:
+            self.assertEqual(csv_file.read(), '', 'Rows are buffered until a flush')
+        stream.write(np.array([[3.0, 4.0]]))
+        stream.close()
+        with open(self.file_path) as csv_file:
+            self.assertEqual(csv_file.read(), '1.0,2.0\n3.0,4.0\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import os
+import queue
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+from SerialPlotter import files
+from SerialPlotter.journal import JOURNAL_EXTENSION, RECORD_HEADER, SampleJournal, replay_journal, target_mask
+from SerialPlotter.storage import StorageHolder, StorageWriter
+
+# Records samples with a journal and exits without any cleanup, like a crash
+CRASH = '''
+import os, sys
+import numpy as np
+from SerialPlotter import files
+from SerialPlotter.journal import SampleJournal
+from SerialPlotter.storage import StorageHolder
+
+folder = sys.argv[1]
+files.CSV_FOLDER, files.CSV_BACKUP = folder + '/data/', folder + '/backup/'
+files.CSV_DELIMITER, files.CSV_DECIMAL = ',', '.'
+storage = StorageHolder()
+storage.backup_size = storage.recorder_size = 8
+storage.rotation.max_size = 200
+storage.rotation.compression = 'none'
+storage.checkpoint_interval = 3600
+storage.enable_journal(SampleJournal(folder + '/journal/', sync_interval=0))
+for value in range(50):
+    storage.is_recording = storage.is_auto_save = value >= 10
+    storage.add_block(np.full((3, 2), float(value)))
+    if value in (20, 35):
+        storage.checkpoint_time -= 3600
+    storage.update()
+os._exit(0)
+'''
+
+# Like CRASH, but the recording is only saved once and then stays in the buffer
+UNSAVED = CRASH.replace('storage.is_recording = storage.is_auto_save = value >= 10',
+                        'storage.is_recording = value >= 10').replace(
+    '    storage.update()', '    storage.update()\n    if value == 12:\n        storage.save_recorder_data()')
+
+
+class TestJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.settings = files.CSV_DELIMITER, files.CSV_DECIMAL
+
+    def tearDown(self):
+        files.CSV_DELIMITER, files.CSV_DECIMAL = self.settings
+        self.folder.cleanup()
+
+    def read_folder(self, name):
+        folder = os.path.join(self.folder.name, name)
+        text = ''
+        for file_name in sorted(os.listdir(folder)):
+            if file_name.endswith(files.CSV_EXTENSION):
+                with open(os.path.join(folder, file_name)) as csv_file:
+                    text += csv_file.read()
+        return text
+
+    def test_replay(self):
+        environment = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        subprocess.run([sys.executable, '-c', CRASH, self.folder.name], env=environment, check=True)
+        journal = os.path.join(self.folder.name, 'journal')
+        self.assertTrue(any(name.endswith(JOURNAL_EXTENSION) for name in os.listdir(journal)))
+
+        # A torn record at the end of the journal is ignored
+        last = max(name for name in os.listdir(journal) if name.endswith(JOURNAL_EXTENSION))
+        with open(os.path.join(journal, last), 'ab') as journal_file:
+            journal_file.write(b'\x00\x01\x03')
+        # The files are written in their own format, the settings stay untouched
+        files.CSV_DELIMITER, files.CSV_DECIMAL = ';', ','
+        self.assertEqual(replay_journal(journal) > 0, True)
+        self.assertEqual((files.CSV_DELIMITER, files.CSV_DECIMAL), (';', ','))
+        self.assertEqual(os.listdir(journal), [])
+
+        expected = ''.join(f'{float(value)},{float(value)}\n' * 3 for value in range(50))
+        self.assertEqual(self.read_folder('backup'), expected)
+        self.assertEqual(self.read_folder('data'), expected[expected.index('10.0'):])
+        self.assertEqual(replay_journal(journal), 0, 'Nothing is replayed twice')
+
+    def test_replay_unsaved(self):
+        environment = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        subprocess.run([sys.executable, '-c', UNSAVED, self.folder.name], env=environment, check=True)
+        self.assertGreater(replay_journal(os.path.join(self.folder.name, 'journal')), 0)
+        expected = ''.join(f'{float(value)},{float(value)}\n' * 3 for value in range(50))
+        self.assertEqual(self.read_folder('backup'), expected)
+        self.assertEqual(self.read_folder('data'), expected[expected.index('10.0'):])
+
+    def test_checkpoint_size(self):
+        paths = files.CSV_FOLDER, files.CSV_BACKUP
+        files.CSV_FOLDER = self.folder.name + '/data/'
+        files.CSV_BACKUP = self.folder.name + '/backup/'
+        try:
+            storage = StorageHolder()
+            storage.enable_journal(SampleJournal(os.path.join(self.folder.name, 'journal'), sync_interval=0))
+            storage.is_recording = True
+            for index in range(100):
+                storage.add_block(np.ones((10, 2)))
+                if index == 0:
+                    storage.save_recorder_data()
+                if index % 10 == 9:
+                    storage.checkpoint_time -= storage.checkpoint_interval
+                storage.update()
+            # Every sample is written once, also while the recording is not saved
+            written = storage.journal.written
+            self.assertLess(written, 1000 * 16 * 1.2)
+            self.assertGreater(len(storage.journal.generations()), 9, 'The unsaved samples are kept')
+            storage.save_recorder_data()
+            storage.is_recording = False
+            storage.checkpoint_time -= storage.checkpoint_interval
+            storage.add_block(np.ones((10, 2)))
+            storage.update()
+            self.assertEqual(len(storage.journal.generations()), 1)
+            storage.close()
+        finally:
+            files.CSV_FOLDER, files.CSV_BACKUP = paths
+
+    def test_worker_sync(self):
+        writer = StorageWriter(queue.Queue(), max_jobs=2)
+        journal = SampleJournal(os.path.join(self.folder.name, 'journal'), sync_interval=0, worker=writer)
+        journal.start()
+        journal.append_block(np.ones((2, 2)), target_mask('backup'))
+        self.assertEqual(journal.syncs, 0, 'The storage thread does not sync')
+        self.assertEqual(writer.jobs.qsize(), 1)
+        journal.rotate()
+        journal.append_block(np.ones((2, 2)), target_mask('backup'))
+        self.assertEqual(writer.jobs.qsize(), 2, 'No sync is added while the writer is busy')
+        self.assertEqual(journal.pending, RECORD_HEADER.size + 32)
+        writer.start()
+        writer.stop()
+        self.assertEqual(journal.syncs, 2)
+        journal.sync()
+        journal.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from SerialPlotter import files
+from SerialPlotter.pyramid import PyramidWriter, PyramidReader, pyramid_path
+from SerialPlotter.storage import StorageHolder
+
+
+class TestPyramid(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, 'data.lod')
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_levels(self):
+        rng = np.random.default_rng(1)
+        data = rng.standard_normal((10000, 2))
+        data[101:103, 1] = np.nan
+        data[130:133, 0] = np.nan
+        writer = PyramidWriter(self.path, 2, ['a', 'b'], factors=(4, 16, 64))
+        for start in range(0, len(data), 333):
+            writer.write(data[start:start + 333])
+        writer.close()
+
+        reader = PyramidReader(self.path)
+        self.assertEqual(reader.samples, 10000)
+        self.assertEqual(reader.names, ['a', 'b'])
+        for factor in (4, 16, 64):
+            buckets = reader.levels[factor]
+            self.assertEqual(len(buckets), -(-10000 // factor))
+            self.assertEqual(buckets[:, 1].sum(), 10000)
+            groups = data[:10000 // factor * factor].reshape(-1, factor, 2)
+            np.testing.assert_allclose(buckets[:len(groups), 2:4], np.nanmin(groups, axis=1))
+            np.testing.assert_allclose(buckets[:len(groups), 4:6], np.nanmax(groups, axis=1))
+            np.testing.assert_allclose(buckets[:len(groups), 6:8], np.nanmean(groups, axis=1))
+            np.testing.assert_array_equal(buckets[:len(groups), 8:10], np.sum(~np.isnan(groups), axis=1))
+        # The last partial bucket holds the remaining samples
+        np.testing.assert_allclose(reader.levels[64][-1, 2:4], data[9984:].min(axis=0))
+
+    def test_read(self):
+        data = np.arange(4096, dtype=np.float64)[:, None]
+        writer = PyramidWriter(self.path, 1, factors=(16, 256))
+        writer.write(data)
+        writer.close()
+
+        reader = PyramidReader(self.path)
+        result = reader.read(0, 4096, width=100)
+        self.assertEqual(result['factor'], 16)
+        self.assertEqual(len(result['start']), 256)
+        result = reader.read(0, 4096, width=10)
+        self.assertEqual(result['factor'], 256)
+        np.testing.assert_array_equal(result['min'][:, 0], np.arange(0, 4096, 256))
+        np.testing.assert_array_equal(result['max'][:, 0], np.arange(255, 4096, 256))
+        result = reader.read(1000, 2000, width=10)
+        self.assertEqual(result['factor'], 16)
+        self.assertEqual(result['start'][0], 992)
+        result = reader.read(1000, 2000, width=3)
+        self.assertEqual(result['start'][0], 768)
+        self.assertEqual(result['start'][-1], 1792)
+        self.assertIsNone(reader.read(0, 100, width=100), 'Short ranges need the samples')
+        result = reader.read_time(1000, 2000, width=3)
+        self.assertEqual(result['start'][0], 768)
+
+    def test_storage(self):
+        paths = files.CSV_FOLDER, files.CSV_BACKUP
+        files.CSV_FOLDER = self.folder.name + '/data/'
+        files.CSV_BACKUP = self.folder.name + '/backup/'
+        try:
+            storage = StorageHolder()
+            storage.is_pyramid = True
+            storage.file_format = 'float32'
+            storage.is_recording = True
+            for _ in range(5):
+                storage.add_block(np.ones((100, 3)))
+                storage.save_recorder_data()
+            storage.close()
+        finally:
+            files.CSV_FOLDER, files.CSV_BACKUP = paths
+        reader = PyramidReader(pyramid_path(self.folder.name + '/data/Unnamed.col'))
+        self.assertEqual(reader.samples, 500)
+        self.assertEqual(reader.levels[16][:, 1].sum(), 500)
+
+    def test_update(self):
+        writer = PyramidWriter(self.path, 1, factors=(16,), flush_interval=0)
+        writer.write(np.ones((40, 1)))
+        writer.update()
+        self.assertEqual(PyramidReader(self.path).samples, 40, 'The header follows the samples')
+        writer.close()
+
+    def test_storage_start(self):
+        paths = files.CSV_FOLDER, files.CSV_BACKUP
+        files.CSV_FOLDER = self.folder.name + '/data/'
+        files.CSV_BACKUP = self.folder.name + '/backup/'
+        try:
+            storage = StorageHolder()
+            storage.file_format = 'float32'
+            storage.is_recording = True
+            storage.add_block(np.zeros((100, 2)))
+            storage.save_recorder_data()
+            # The pyramid of the open recording starts behind its samples
+            storage.enable_pyramid(True)
+            storage.add_block(np.ones((200, 2)))
+            storage.save_recorder_data()
+            storage.close()
+
+            # A pyramid which does not end with the recording is not continued
+            storage.enable_pyramid(False)
+            storage.add_block(np.ones((50, 2)))
+            storage.save_recorder_data()
+            storage.close()
+            storage.enable_pyramid(True)
+            storage.add_block(np.ones((50, 2)))
+            storage.save_recorder_data()
+            self.assertEqual(len(storage.messages), 1)
+            storage.close()
+        finally:
+            files.CSV_FOLDER, files.CSV_BACKUP = paths
+        reader = PyramidReader(pyramid_path(self.folder.name + '/data/Unnamed.col'))
+        self.assertEqual((reader.start, reader.samples), (100, 300))
+        self.assertEqual(reader.levels[16][0, 0], 100)
+        self.assertEqual(reader.read(width=10)['start'][0], 100)
+        self.assertEqual(reader.levels[16][:, 1].sum(), 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
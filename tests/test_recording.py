@@ -0,0 +1,96 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from SerialPlotter import files
+from SerialPlotter.recording import ColumnWriter, ColumnReader, csv_to_columns, columns_to_csv
+from SerialPlotter.storage import StorageHolder
+
+
+class TestColumnFile(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.folder.name, 'data.col')
+        self.delimiter, self.decimal = files.CSV_DELIMITER, files.CSV_DECIMAL
+
+    def tearDown(self):
+        files.CSV_DELIMITER, files.CSV_DECIMAL = self.delimiter, self.decimal
+        self.folder.cleanup()
+
+    def test_write_read(self):
+        block = np.arange(30, dtype=np.float64).reshape(10, 3)
+        writer = ColumnWriter(self.file_path, ['a', 'b', 'c'], chunk=4)
+        writer.write(block[:5])
+        writer.write(block[5:].tolist())
+        writer.close()
+
+        reader = ColumnReader(self.file_path)
+        self.assertEqual(len(reader), 10)
+        self.assertEqual(reader.names, ['a', 'b', 'c'])
+        np.testing.assert_array_equal(reader.read(), block)
+        np.testing.assert_array_equal(reader.read(3, 9), block[3:9])
+        np.testing.assert_array_equal(reader.column('b'), block[:, 1])
+        np.testing.assert_array_equal(reader.column(2, 5, 7), block[5:7, 2])
+        self.assertIsInstance(reader.column(0, 4, 8), np.memmap, 'Range inside one chunk is a view')
+        reader.close()
+
+    def test_append(self):
+        writer = ColumnWriter(self.file_path, channels=2, chunk=4)
+        writer.write([[1.0, 2.0], [3.0]])
+        writer.close()
+        writer = ColumnWriter(self.file_path)
+        writer.write([[5.0, 6.0, 7.0]] * 4)
+        writer.close()
+        self.assertEqual(writer.truncated, 4)
+
+        reader = ColumnReader(self.file_path)
+        expected = [[1, 2], [3, np.nan]] + [[5, 6]] * 4
+        np.testing.assert_array_equal(reader.read(), expected)
+        reader.close()
+
+    def test_storage_width(self):
+        folder = files.CSV_FOLDER
+        files.CSV_FOLDER = self.folder.name + '/'
+        try:
+            storage = StorageHolder()
+            storage.file_format = 'float64'
+            storage.is_recording = True
+            storage.add_block(np.ones((2, 2)))
+            storage.save_recorder_data()
+            storage.add_block(np.full((2, 3), 2.0))
+            storage.save_recorder_data()
+            storage.add_block(np.full((1, 1), 3.0))
+            storage.save_recorder_data()
+            storage.close()
+        finally:
+            files.CSV_FOLDER = folder
+        self.assertEqual(len(storage.messages), 1, 'Wider samples are reported')
+        reader = ColumnReader(self.folder.name + '/Unnamed.col')
+        np.testing.assert_array_equal(reader.read(), np.ones((2, 2)))
+        reader.close()
+        reader = ColumnReader(self.folder.name + '/Unnamed_3ch.col')
+        np.testing.assert_array_equal(reader.read(), [[2, 2, 2], [2, 2, 2], [3, np.nan, np.nan]])
+        reader.close()
+
+    def test_csv_conversion(self):
+        files.CSV_DELIMITER, files.CSV_DECIMAL = ';', ','
+        csv_path = os.path.join(self.folder.name, 'data.csv')
+        copy_path = os.path.join(self.folder.name, 'copy.csv')
+        with open(csv_path, 'w') as csv_file:
+            csv_file.write('0,5;1,0\n-2,25;\n3,0;4,0\n')
+        self.assertEqual(csv_to_columns(csv_path, self.file_path, ['x', 'y'], 'float32'), 0)
+
+        reader = ColumnReader(self.file_path)
+        self.assertEqual(reader.chunks.dtype, np.float32)
+        np.testing.assert_array_equal(reader.read(), [[0.5, 1], [-2.25, np.nan], [3, 4]])
+        reader.close()
+        columns_to_csv(self.file_path, copy_path)
+        with open(copy_path) as csv_file:
+            self.assertEqual(csv_file.read(), '0,5;1,0\n-2,25;\n3,0;4,0\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from SerialPlotter import files
+from SerialPlotter.device import SerialThread
+from SerialPlotter.recording import ColumnWriter
+from SerialPlotter.replay import Replayer, load_recording
+
+
+class TestReplay(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.folder.name, 'data.csv')
+        self.delimiter, self.decimal = files.CSV_DELIMITER, files.CSV_DECIMAL
+
+    def tearDown(self):
+        files.CSV_DELIMITER, files.CSV_DECIMAL = self.delimiter, self.decimal
+        self.folder.cleanup()
+
+    def test_load_csv(self):
+        files.CSV_DELIMITER, files.CSV_DECIMAL = ';', ','
+        data = np.arange(3000, dtype=np.float64).reshape(1000, 3) / 4
+        files.csv_writer(self.file_path, data, 'w')
+        files.CSV_DELIMITER, files.CSV_DECIMAL = ',', '.'
+        progress = []
+        loaded = load_recording(self.file_path, progress.append, rows=300, delimiter=';', decimal=',')
+        np.testing.assert_array_equal(loaded, data)
+        self.assertEqual(len(progress), 4)
+        self.assertEqual(progress[-1], 1.0)
+
+    def test_load_binary(self):
+        data = np.arange(20, dtype=np.float64).reshape(10, 2)
+        writer = ColumnWriter(os.path.join(self.folder.name, 'data.col'), ['a', 'b'])
+        writer.write(data)
+        writer.close()
+        replay = Replayer(self.file_path, speed=0)
+        self.assertTrue(replay.file_path.endswith('.col'), 'Binary file is preferred')
+        frames = replay.read()
+        self.assertEqual(len(frames), 1)
+        np.testing.assert_array_equal(frames[0][1], data)
+        self.assertEqual(replay.read(), [])
+        self.assertTrue(replay.is_done)
+
+    def test_speed(self):
+        # Timestamps of 10 ms, at 10x the 100 samples take 0.1 s
+        times = 1.7e9 + np.arange(100) / 100
+        files.csv_writer(self.file_path, np.column_stack((times, np.arange(100))), 'w')
+        replay = Replayer(self.file_path, speed=10)
+        samples = 0
+        while not replay.is_done:
+            for block_times, block in replay.read():
+                self.assertEqual(block.shape[1], 1, 'Timestamp column is removed')
+                self.assertLessEqual(block_times[-1], time.monotonic_ns())
+                samples += len(block)
+            time.sleep(replay.next_due())
+        seconds = (time.monotonic_ns() - replay.time_start) / 1e9
+        self.assertEqual(samples, 100)
+        self.assertTrue(replay.is_timestamp)
+        self.assertGreater(seconds, 0.09)
+        self.assertLess(seconds, 0.5)
+
+    def test_serial_thread(self):
+        data = np.arange(30000, dtype=np.float64).reshape(10000, 3)
+        files.csv_writer(self.file_path, data, 'w')
+        running = threading.Event()
+        thread = SerialThread(running)
+        cursor = thread.interface.create_cursor('graph')
+        status = thread.interface.create_queue('status')
+        thread.process_command(f'replay start max comma dot {self.file_path}')
+        thread.start()
+        received = []
+        deadline = time.monotonic() + 10
+        while sum(len(block) for block in received) < 10000 and time.monotonic() < deadline:
+            received.extend(block for _, block in cursor.read())
+            time.sleep(0.01)
+        running.clear()
+        thread.join(1)
+        np.testing.assert_array_equal(np.concatenate(received), data)
+        messages = []
+        while not status.empty():
+            messages.append(status.get())
+        self.assertTrue(messages[0].startswith('Replaying data.csv'))
+        self.assertTrue(any(message.startswith('Replayed 10000 samples') for message in messages))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from SerialPlotter.device import BufferConverter, SerialThread
+from SerialPlotter.simulator import DeviceSimulator, parse_options
+
+
+class TestSimulator(unittest.TestCase):
+
+    def test_parse_options(self):
+        options = parse_options('debug:rate=250,channels=4,waveform=steps,messages=0.1,chunk=16')
+        check = {'rate': 250.0, 'channels': 4, 'waveform': 'steps', 'messages': 0.1, 'chunk': 16}
+        self.assertDictEqual(check, options)
+        self.assertDictEqual({}, parse_options('debug'))
+        self.assertRaises(ValueError, parse_options, 'debug:speed=1')
+
+    def test_generate_fragments(self):
+        simulator = DeviceSimulator(channels=4, messages=0.1, chunk=7, seed=1)
+        simulator.pending += simulator.generate(1000)
+        converter = BufferConverter()
+        while len(simulator.pending) > 0:
+            buffer = simulator.read(1024)
+            self.assertTrue(0 < len(buffer) <= 7)
+            converter.add(buffer)
+        converter.update_batch()
+        samples = sum(len(block) for block in converter.blocks)
+        self.assertEqual(1000, samples + len(converter.messages))
+        self.assertTrue(50 < len(converter.messages) < 150)
+        self.assertEqual(4, converter.blocks[0].shape[1])
+
+    @unittest.skipUnless(hasattr(os, 'openpty'), 'Pseudo terminals are not supported')
+    def test_thread_pty(self):
+        running = threading.Event()
+        thread = SerialThread(running)
+        cursor = thread.interface.create_cursor('test')
+        status = thread.interface.create_queue('status')
+        command = thread.interface.create_queue('command')
+        thread.start()
+        command.put('connect pty:rate=2000,channels=2')
+        self.assertTrue(status.get(timeout=1).startswith('Successfully connected'))
+        time.sleep(0.3)
+        command.put('disconnect')
+        status.get(timeout=1)
+        running.clear()
+        thread.join(1)
+        block = np.vstack([values for _, values in cursor.read()])
+        self.assertEqual(2, block.shape[1])
+        self.assertTrue(300 < len(block) < 900)
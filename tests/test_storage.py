@@ -0,0 +1,150 @@
+import gzip
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+from SerialPlotter import files
+from SerialPlotter.storage import SqliteSink, StorageHolder, StorageThread, StorageWriter
+
+
+class TestStorageWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.paths = files.CSV_FOLDER, files.CSV_BACKUP, files.CSV_DELIMITER, files.CSV_DECIMAL
+        files.CSV_FOLDER = self.folder.name + '/data/'
+        files.CSV_BACKUP = self.folder.name + '/backup/'
+        files.CSV_DELIMITER, files.CSV_DECIMAL = ',', '.'
+
+    def tearDown(self):
+        files.CSV_FOLDER, files.CSV_BACKUP, files.CSV_DELIMITER, files.CSV_DECIMAL = self.paths
+        self.folder.cleanup()
+
+    def read_backup(self):
+        # The last segment is compressed when the storage closes
+        file_name, = [name for name in os.listdir(files.CSV_BACKUP) if name.endswith(files.CSV_EXTENSION + '.gz')]
+        with gzip.open(files.CSV_BACKUP + file_name, 'rt') as csv_file:
+            return csv_file.read()
+
+    def test_double_buffering(self):
+        writer = StorageWriter(queue.Queue())
+        storage = StorageHolder(writer)
+        storage.backup_size = 2
+        # The writer stays inside its first job, so the queue is not drained during the loop
+        started, gate = threading.Event(), threading.Event()
+        writer.submit(lambda: started.set() or gate.wait())
+        writer.start()
+        started.wait()
+        blocks = []
+        for value in range(6):
+            blocks.append(storage.backup_data)
+            storage.add_block(np.array([[value]], np.float64))
+            storage.update()
+        self.assertEqual(len(set(map(id, blocks))), 3, 'Samples continue in another block during the write')
+        self.assertTrue(storage.is_busy())
+        gate.set()
+        storage.save_backup_data()
+        storage.close()
+        writer.stop()
+        self.assertEqual(self.read_backup(), ''.join(f'{value}.0\n' for value in range(6)))
+        in_use = [storage.backup_data, storage.recorder_data, storage.database_data]
+        self.assertEqual(storage.free_blocks.qsize(), len(storage.blocks) - len(in_use), 'Written blocks are reused')
+
+    def test_backpressure(self):
+        writer = StorageWriter(queue.Queue(), max_jobs=2)
+        storage = StorageHolder(writer)
+        storage.backup_size = 1
+        storage.add_block(np.ones((1, 2)))
+        storage.update()
+        self.assertTrue(storage.is_busy(), 'Writer which is not running falls behind')
+        storage.add_block(np.ones((1, 2)))
+        storage.update()
+        self.assertEqual(writer.jobs.qsize(), 2, 'No jobs are added while busy')
+        self.assertEqual(storage.statistics()['write_queue'], 2)
+        writer.start()
+        storage.close()
+        writer.stop()
+        self.assertFalse(storage.is_busy())
+        self.assertEqual(self.read_backup(), '1.0,1.0\n')
+
+    def test_write_error(self):
+        def fail(block):
+            raise sqlite3.OperationalError('database or disk is full')
+
+        status = queue.Queue()
+        writer = StorageWriter(status, max_jobs=1)
+        storage = StorageHolder(writer)
+        writer.start()
+        storage.database = SqliteSink(os.path.join(self.folder.name, 'samples.sqlite'))
+        storage.database.write = fail
+        for _ in range(3):
+            storage.add_block(np.ones((1, 2)))
+            storage.save_database_data()
+        storage.enable_database(None)
+        writer.stop()
+        self.assertEqual(status.qsize(), 3, 'Writer keeps running after an error')
+        self.assertEqual(status.get(), 'Could not write data: database or disk is full')
+        self.assertEqual(storage.free_blocks.qsize(), len(storage.blocks) - 3, 'Failed blocks are reused')
+
+    def test_command_backpressure(self):
+        thread = StorageThread(threading.Event())
+        thread.writer = thread.storage.writer = StorageWriter(queue.Queue(), max_jobs=1)
+        thread.storage.is_recording = True
+        thread.storage.add_block(np.ones((1, 2)))
+        thread.storage.submit(print)
+        thread.interface.queue_command.put('recorder save')
+        thread.update_request_queues()
+        self.assertEqual(thread.interface.queue_command.qsize(), 1, 'Commands wait while the writer is busy')
+        thread.writer.jobs.get_nowait()
+        thread.update_request_queues()
+        self.assertTrue(thread.interface.queue_command.empty())
+        self.assertEqual(len(thread.storage.recorder_data), 0)
+
+
+class TestSqliteSink(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.folder.name, 'samples.sqlite')
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_query(self):
+        sink = SqliteSink(self.file_path, chunk=4)
+        first = sink.start_session('first')
+        block = np.column_stack((np.arange(10.0), np.arange(10.0) * 2))
+        sink.write(block[:7])
+        sink.write(block[7:])
+        second = sink.start_session('second')
+        sink.write(np.array([[20.0, 1.0, 2.0]]))
+        self.assertEqual([name for _, name, _ in sink.sessions()], ['first', 'second'])
+        np.testing.assert_array_equal(sink.query(first), block)
+        np.testing.assert_array_equal(sink.query(first, 2.5, 5), block[3:6])
+        np.testing.assert_array_equal(sink.query(second, 0, 100), [[20, 1, 2]])
+        self.assertEqual(sink.query(first, 50, 60).size, 0)
+        sink.close()
+
+    def test_storage(self):
+        storage = StorageHolder()
+        storage.database_size = 5
+        storage.enable_database(self.file_path)
+        times = np.arange(12, dtype=np.int64) * 1000000 - storage.time_offset
+        storage.add_block(np.ones((12, 2)), times)
+        storage.update()
+        storage.close()
+        sink = SqliteSink(self.file_path)
+        (session, _, _), = sink.sessions()
+        samples = sink.query(session)
+        np.testing.assert_allclose(samples[:, 0], np.arange(12) / 1000)
+        np.testing.assert_array_equal(samples[:, 1:], np.ones((12, 2)))
+        sink.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,18 +1,62 @@
+import binascii
+import struct
 import threading
+import time
 import unittest
 from time import sleep
 
-from SerialPlotter.device import SerialThread, SerialHandler, BufferConverter
+import numpy as np
+
+from SerialPlotter.buffers import SampleRing
+from SerialPlotter.device import SerialThread, SerialHandler, BufferConverter, SerialInterface, BinaryConverter
+
+
+class FakeSerial:
+    def __init__(self, buffer: bytes):
+        self.buffer = buffer
+        self.reads = 0
+
+    def inWaiting(self):
+        return len(self.buffer)
+
+    def read(self, size=1):
+        self.reads += 1
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
 
 
 class TestSerial(unittest.TestCase):
 
+    def test_handler_read(self):
+        handler = SerialHandler()
+        handler.serial = FakeSerial('25\u00b0C\n'.encode() * 100)
+        handler.is_connected.set()
+        handler.read_size = 256
+        converter = BufferConverter()
+        while handler.available() > 0:
+            converter.add(handler.read())
+        self.assertEqual(3, handler.serial.reads)
+        self.assertEqual(88, handler.read_last)
+        self.assertEqual(600, handler.byte_counter.total)
+        self.assertListEqual(['25\u00b0C\n'] * 100, converter.buffer_lines)
+
     def test_buffer_add(self):
         converter = BufferConverter()
         converter.add('This\tis\ra,string\n5454,353\n535\n')
         check_list = ['This\tis\ra,string\n', '5454,353\n', '535\n']
         self.assertListEqual(check_list, converter.buffer_lines)
 
+    def test_buffer_add_chunks(self):
+        converter = BufferConverter()
+        converter.add(b'12\t3')
+        self.assertListEqual([], converter.buffer_lines)
+        converter.add(b'4\n56\n7')
+        converter.add(b'\xc2')
+        converter.add(b'\xb0C\n')
+        check_list = ['12\t34\n', '56\n', '7\u00b0C\n']
+        self.assertListEqual(check_list, converter.buffer_lines)
+        self.assertEqual(3, converter.line_counter.total)
+
     def test_buffer_update(self):
         converter = BufferConverter()
         converter.add('This\tis\ra,string\n5454,353\n535\n')
@@ -31,6 +75,74 @@ class TestSerial(unittest.TestCase):
         self.assertEqual([[535.0]], converter.data)
         self.assertEqual(check_list, converter.messages)
 
+    def test_buffer_update_batch(self):
+        text = 'This\tis\ra,string\n5454,353\n535\n1\t2\n3\t4\n\n1\t\t2\n5\t6\n7\n'
+        single = BufferConverter()
+        single.add(text)
+        while single.available() > 0:
+            single.update()
+        batch = BufferConverter()
+        batch.add(text)
+        self.assertEqual(9, batch.update_batch())
+        self.assertEqual(single.messages, batch.messages)
+        self.assertEqual(single.lines, batch.lines)
+        self.assertEqual(single.data, [row for block in batch.blocks for row in block.tolist()])
+        self.assertListEqual([(1, 1), (2, 2), (1, 2), (1, 1)], [block.shape for block in batch.blocks])
+
+        # An invalid numeric line in front of a text line is reported first
+        text = '1..2\nHello\n22\t\n\t1\n5\nWorld\n'
+        single = BufferConverter()
+        single.add(text)
+        while single.available() > 0:
+            single.update()
+        batch = BufferConverter()
+        batch.add(text)
+        batch.update_batch()
+        self.assertEqual(['Invalid: ' + str(b'1..2\n'), 'Message: Hello\n'], batch.messages[:2])
+        self.assertEqual(single.messages, batch.messages)
+        self.assertEqual(single.data, [row for block in batch.blocks for row in block.tolist()])
+
+    def test_buffer_update_batch_numerals(self):
+        text = '٣\n1\t٤\n²\n'
+        single = BufferConverter()
+        single.add(text)
+        while single.available() > 0:
+            single.update()
+        batch = BufferConverter()
+        batch.add(text)
+        batch.update_batch()
+        self.assertEqual([[3.0], [1.0, 4.0]], single.data)
+        self.assertEqual(single.messages, batch.messages)
+        self.assertEqual(single.data, [row for block in batch.blocks for row in block.tolist()])
+
+    def test_buffer_update_times(self):
+        converter = BufferConverter()
+        converter.add(b'1\n2\n', 1000)
+        converter.update_batch()
+        converter.add(b'3\nText\n4\n5\n', 2000)
+        converter.update_batch()
+        times = np.concatenate(converter.times).tolist()
+        self.assertListEqual([1000, 1000, 1250, 1750, 2000], times)
+
+    def test_binary_sync_crc16(self):
+        def record(index):
+            payload = struct.pack('<Iff', index, index / 2, -index)
+            return b'\xaa\x55' + payload + struct.pack('<H', binascii.crc_hqx(payload, 0xFFFF))
+
+        broken = bytearray(record(3))
+        broken[4] ^= 0xFF
+        stream = record(0) + record(1) + b'\x13' + record(2) + broken + record(4) + record(5)
+        converter = BinaryConverter('<Iff', 'sync', 'crc16')
+        converter.add(stream[:30])
+        self.assertEqual(1, converter.update_batch())
+        converter.add(stream[30:])
+        self.assertEqual(4, converter.update_batch())
+        block = np.vstack(converter.blocks)
+        self.assertListEqual([0.0, 1.0, 2.0, 4.0, 5.0], block[:, 0].tolist())
+        self.assertListEqual([-4.0, 2.0], block[3, 2:0:-1].tolist())
+        self.assertEqual(2, converter.bad_frames)
+        self.assertEqual(0, converter.available())
+
     def test_buffer_converter_to_data(self):
         converter = BufferConverter()
         converter.convert_to_data('333\t222\r\n')
@@ -39,6 +151,56 @@ class TestSerial(unittest.TestCase):
         converter.convert_to_data('333\t222\r\n')
         self.assertListEqual([check_list, check_list], converter.data)
 
+    def test_interface_frames(self):
+        interface = SerialInterface()
+        queue_frames = interface.create_frame_queue('data')
+        queue_items = interface.create_queue('data')
+        block = np.array([[1.0, 2.0], [3.0, 4.0]])
+        interface.queue_frame('data', block)
+        self.assertIs(block, queue_frames.get_nowait())
+        self.assertTrue(queue_frames.empty())
+        self.assertListEqual([[1.0, 2.0], [3.0, 4.0]], interface.get_items('data'))
+
+    def test_interface_truncated(self):
+        interface = SerialInterface(SampleRing(8, 2, bytearray(SampleRing.nbytes(8, 2))))
+        status = interface.create_queue('status')
+        interface.queue_frame('data', np.ones((2, 3)))
+        interface.queue_frame('data', np.ones((2, 3)))
+        self.assertEqual(4, interface.get_statistics()['truncated'])
+        self.assertEqual(1, status.qsize(), 'Truncation is reported once')
+        interface = SerialInterface()
+        interface.queue_frame('data', np.ones((2, 40)))
+        self.assertEqual(0, interface.get_statistics()['truncated'])
+
+    def test_handler_cancel_wait(self):
+        handler = SerialHandler()
+        handler.timeout = 2.0
+        timer = threading.Timer(0.05, handler.cancel_wait)
+        timer.start()
+        start = time.monotonic()
+        self.assertEqual(b'', handler.wait_read())
+        self.assertLess(time.monotonic() - start, 1.0, 'Waiting ends before the timeout')
+        timer.join()
+
+    def test_thread_wakeup(self):
+        running = threading.Event()
+        thread = SerialThread(running)
+        thread.serial.timeout = 2.0
+        commands = thread.interface.create_queue('command')
+        status = thread.interface.create_queue('status')
+        thread.start()
+        sleep(0.1)
+        # The disconnected thread waits for the timeout, a command wakes it up
+        start = time.monotonic()
+        commands.put('read_size 64')
+        reply = status.get(timeout=2.0)
+        seconds = time.monotonic() - start
+        running.clear()
+        thread.serial.cancel_wait()
+        thread.join(3)
+        self.assertEqual('Read size set to 64 bytes', reply)
+        self.assertLess(seconds, 0.5, 'Commands are handled before the read timeout')
+
     def test_thread_start_exit(self):
         running = threading.Event()
         running.set()